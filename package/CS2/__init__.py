@@ -1,9 +1,18 @@
 from .graph.tabular_graph_snapshot import TabularGraphSnapshot
 from .graph.hetero_graph_snapshot import HeteroGraphSnapshot
+from .graph.map_graph import MapGraph
+from .graph.hetero_graph_data import HeteroGraphData
+from .graph.match_graph_store import MatchGraphStore, MatchGraphDataset
+from .graph.hetero_graph_shard_sink import HeteroGraphShardSink
 from .graph.temporal_hetero_graph_snapshot import TemporalHeteroGraphSnapshot
+from .graph.graph_round_index import GraphRoundIndex
+from .graph.temporal_window_dataset import TemporalWindowDataset
+from .graph.temporal_graph_batch import TemporalGraphBatch
 from .graph.hetero_graph_lime_sampler import HeteroGraphLIMESampler
 
 from .token.tokenizer import Tokenizer
+from .token.token_codec import TokenCodec
+from .token.token_index import TokenIndex
 
 from .preprocess.normalize_position import NormalizePosition
 from .preprocess.normalizer_dictionary import Dictionary
@@ -13,4 +22,12 @@ from .preprocess.impute_tabular_graph_snapshot import ImputeTabularGraphSnapshot
 from .visualize.hetero_graph_visualizer import HeteroGraphVisualizer
 
 from .analyze.snapshot_events import SnapshotEvents
-from .analyze.hetero_gnn_round_analyzer import HeteroGNNRoundAnalyzer
\ No newline at end of file
+from .analyze.hetero_gnn_round_analyzer import HeteroGNNRoundAnalyzer
+from .analyze.inference_engine import InferenceEngine
+from .analyze.hetero_gnn_match_analyzer import HeteroGNNMatchAnalyzer
+from .analyze.hetero_gnn_export import HeterogeneousGNNExport
+from .analyze.hetero_gnn_runtime import HeteroGNNRuntime
+from .analyze.hetero_gnn_lime_explainer import HeteroGNNLIMEExplainer
+
+from .serve.win_probability_server import WinProbabilityServer
+from .serve.micro_batcher import MicroBatcher
\ No newline at end of file
@@ -1,2 +1,7 @@
 from .hetero_gnn_round_analyzer import HeteroGNNRoundAnalyzer
-from .snapshot_events import SnapshotEvents
\ No newline at end of file
+from .snapshot_events import SnapshotEvents
+from .inference_engine import InferenceEngine
+from .hetero_gnn_match_analyzer import HeteroGNNMatchAnalyzer
+from .hetero_gnn_export import HeterogeneousGNNExport
+from .hetero_gnn_runtime import HeteroGNNRuntime
+from .hetero_gnn_lime_explainer import HeteroGNNLIMEExplainer
\ No newline at end of file
@@ -0,0 +1,133 @@
+import torch
+from torch_geometric.data import HeteroData
+
+import numpy as np
+
+from ..graph.hetero_graph_data import HeteroGraphData
+
+
+class HeterogeneousGNNExport(torch.nn.Module):
+    """
+    Export wrapper of a trained HeterogeneousGNN with a fixed tensor signature, traceable with TorchScript:
+    - player_x: the player node features, shape (B, 10, F_player).
+    - map_x: the map node features, shape (B, map_nodes, F_map).
+    - player_map_targets: the map node targets of the player->map edges, shape (B, 10), int64.
+    - graph_features: the graph-level features, shape (B, G), column order is HeteroGraphData.GRAPH_FEATURES.
+    Returns the CT win probabilities, shape (B,). The static map edges are stored in the wrapper, the batched edge
+    indices are built from the inputs, so the exported model does not need PyG batches or y dictionaries.
+    Use export to write the traced model and HeteroGNNRuntime to run it.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, model, map_edge_index, player_self_edges: bool = True):
+        """
+        Parameters:
+        - model: the trained HeterogeneousGNN (with initialized lazy layers).
+        - map_edge_index: the map edges with node ids, shape (2, E), e.g. MapGraph.edge_index.
+        - player_self_edges: whether the model uses the player self edges. Default is True.
+        """
+
+        super().__init__()
+
+        self.model = model
+        self.player_self_edges = player_self_edges
+
+        self.register_buffer('map_edge_index', torch.as_tensor(np.asarray(map_edge_index), dtype=torch.long))
+        self.register_buffer('model_graph_feature_indices', torch.tensor(HeteroGraphData.MODEL_GRAPH_FEATURE_INDICES, dtype=torch.long))
+
+    @classmethod
+    def from_graph(cls, model, graph: HeteroData):
+        """
+        Create the wrapper with the map edges of a graph snapshot.
+        Parameters:
+        - model: the trained HeterogeneousGNN.
+        - graph: a graph snapshot of the map.
+        """
+
+        return cls(
+            model,
+            graph['map', 'connected_to', 'map'].edge_index,
+            player_self_edges=('player', 'is', 'player') in graph.edge_types
+        )
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Forward pass
+    # --------------------------------------------------------------------------------------------
+
+    def forward(self, player_x, map_x, player_map_targets, graph_features):
+
+        batch_size = player_x.shape[0]
+        num_map_nodes = map_x.shape[1]
+
+        # Node features laid out like a PyG batch
+        x_dict = {
+            'player': player_x.reshape(batch_size * 10, -1),
+            'map': map_x.reshape(batch_size * num_map_nodes, -1),
+        }
+
+        # Edges, offset by the node counts of the previous graphs
+        map_offsets = torch.arange(batch_size, device=player_x.device) * num_map_nodes
+        player_ids = torch.arange(batch_size * 10, device=player_x.device)
+
+        edge_index_dict = {
+            ('map', 'connected_to', 'map'): (self.map_edge_index.unsqueeze(1) + map_offsets.view(1, -1, 1)).reshape(2, -1),
+            ('player', 'closest_to', 'map'): torch.stack([player_ids, (player_map_targets + map_offsets.view(-1, 1)).reshape(-1)]),
+        }
+        if self.player_self_edges:
+            edge_index_dict[('player', 'is', 'player')] = torch.stack([player_ids, player_ids])
+
+        # Convolutions, flattening and dense layers
+        x_dict = self.model.convolve(x_dict, edge_index_dict)
+
+        x = torch.cat([
+            x_dict['player'].reshape(batch_size, -1),
+            x_dict['map'].reshape(batch_size, -1),
+            graph_features.index_select(1, self.model_graph_feature_indices).to(x_dict['player'].dtype),
+        ], dim=1)
+
+        return torch.sigmoid(self.model.head(x)).reshape(-1)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def graph_tensors(graphs: list[HeteroData]) -> tuple:
+        """
+        Stack graph snapshots into the (player_x, map_x, player_map_targets, graph_features) input tensors.
+        Parameters:
+        - graphs: the graph snapshots.
+        """
+
+        return (
+            torch.stack([graph['player'].x for graph in graphs]).float(),
+            torch.stack([graph['map'].x for graph in graphs]).float(),
+            torch.stack([graph['player', 'closest_to', 'map'].edge_index[1] for graph in graphs]).long(),
+            torch.cat([HeteroGraphData.collate_graph_features(graph) for graph in graphs]).float(),
+        )
+
+    def export(self, path: str, example_graphs: list[HeteroData]):
+        """
+        Trace the wrapper with TorchScript and save it. The traced model accepts any batch size.
+        Parameters:
+        - path: the path of the TorchScript file.
+        - example_graphs: graph snapshots used as example inputs for tracing, at least two.
+        """
+
+        if len(example_graphs) < 2:
+            raise ValueError('At least two example graphs are needed to trace the batch dimension.')
+
+        self.eval()
+        with torch.no_grad():
+            traced = torch.jit.trace(self, self.graph_tensors(example_graphs), check_trace=False)
+
+        traced.save(path)
+
+        return traced
@@ -0,0 +1,232 @@
+import torch
+from torch_geometric.data import HeteroData
+
+import pandas as pd
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from ..graph.hetero_graph_lime_sampler import HeteroGraphLIMESampler
+from ..graph.graph_round_index import GraphRoundIndex
+from .hetero_gnn_export import HeterogeneousGNNExport
+from .hetero_gnn_runtime import HeteroGNNRuntime
+from .inference_engine import InferenceEngine
+
+
+class HeteroGNNLIMEExplainer:
+    """
+    Streaming LIME explainer of the win probability predictions of graph snapshots. The perturbed samples of a snapshot
+    are generated lazily in batches of batch_size (HeteroGraphLIMESampler.sample_snapshot_batch), scored by the model,
+    and folded into the sufficient statistics of a weighted ridge surrogate, then discarded. The memory footprint of an
+    explanation is one batch and a (d + 1, d + 1) matrix, independent of sample_size.
+    The surrogate features are the changes of the EXPLAINED_PLAYER_COLUMNS of every player and of the burning and
+    smoked map node counts relative to the explained snapshot, the samples are weighted with the LIME exponential kernel
+    of their distance to the snapshot.
+    """
+
+    # Player features of the surrogate, the features perturbed by HeteroGraphLIMESampler
+    EXPLAINED_PLAYER_COLUMNS = [
+        'X', 'Y', 'pitch', 'yaw', 'velocity_X', 'velocity_Y', 'health', 'armor_value', 'is_alive', 'flash_duration',
+        'active_weapon_magazine_ammo_left_%', 'is_shooting', 'is_spotted', 'is_walking', 'is_reloading', 'is_scoped',
+        'is_defusing', 'inventory_C4',
+    ]
+
+    # Map features of the surrogate
+    EXPLAINED_MAP_COLUMNS = ['is_burning', 'is_smoked']
+
+    # Player name prefixes, in player node order
+    PLAYER_PREFIXES = ['CT0', 'CT1', 'CT2', 'CT3', 'CT4', 'T5', 'T6', 'T7', 'T8', 'T9']
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(
+        self,
+        model,
+        sample_size: int = 5000,
+        batch_size: int = 1000,
+        probability: float = 0.1,
+        kernel_width: float = None,
+        alpha: float = 1.0,
+        seed: int = None,
+        player_self_edges: bool = True
+    ):
+        """
+        Parameters:
+        - model: a HeteroGNNRuntime, or a trained HeterogeneousGNN (with initialized lazy layers) run on the CPU in eager mode. \
+          A model on another device is copied to the CPU, the given model is not moved.
+        - sample_size: the number of perturbed samples per snapshot. Default is 5000.
+        - batch_size: the number of samples generated and scored at once. Default is 1000.
+        - probability: the perturbation probability of the sampler. Default is 0.1.
+        - kernel_width: the width of the LIME exponential kernel. Default is None, which uses 0.75 * sqrt(number of features).
+        - alpha: the ridge regularization strength of the surrogate. Must be positive. Default is 1.0.
+        - seed: the seed of the perturbations. Snapshot i of an explain_graphs call gets the i-th child seed, so the results \
+          do not depend on the number of workers. Default is None.
+        - player_self_edges: whether the model uses the player self edges, only used for HeterogeneousGNN models. Default is True.
+        """
+
+        if not isinstance(sample_size, int) or sample_size < 1:
+            raise ValueError('The sample_size must be a positive integer.')
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('The batch_size must be a positive integer.')
+        if alpha <= 0:
+            raise ValueError('The alpha must be positive.')
+
+        self.model = model
+        self.sample_size = sample_size
+        self.batch_size = batch_size
+        self.probability = probability
+        self.alpha = alpha
+        self.seed = seed
+        self.player_self_edges = player_self_edges
+
+        # Surrogate feature layout
+        player_column_index = HeteroGraphLIMESampler.player_column_index
+        self.player_feature_idx = [player_column_index[column] for column in self.EXPLAINED_PLAYER_COLUMNS]
+        self.map_feature_idx = [HeteroGraphLIMESampler.map_columns.index(column) for column in self.EXPLAINED_MAP_COLUMNS]
+
+        self.feature_names = [f'{prefix}_{column}' for prefix in self.PLAYER_PREFIXES for column in self.EXPLAINED_PLAYER_COLUMNS]
+        self.feature_names += [f'map_{column}_nodes' for column in self.EXPLAINED_MAP_COLUMNS]
+
+        self.kernel_width = 0.75 * np.sqrt(len(self.feature_names)) if kernel_width is None else kernel_width
+
+        # Eager models are wrapped for the sample tensors, per map edge layout, the lock guards it across explain workers
+        self._export_models = {}
+        self._export_models_lock = threading.Lock()
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def explain(self, graph: HeteroData, seed=None) -> dict:
+        """
+        Explain the prediction of a snapshot. Returns a dictionary with the surrogate coefficients ('coef', aligned to
+        feature_names), the 'intercept', the weighted R2 'score' of the surrogate on the samples, the model 'prediction'
+        of the snapshot and the number of 'samples'.
+        Parameters:
+        - graph: the snapshot to explain.
+        - seed: the seed of the perturbations (int or numpy SeedSequence). Default is None, which uses the seed of the explainer.
+        """
+
+        sampler = HeteroGraphLIMESampler(seed=self.seed if seed is None else seed)
+        predict = self._predict_function(graph)
+
+        original_tensors = HeterogeneousGNNExport.graph_tensors([graph])
+        original_player = original_tensors[0][0, :, self.player_feature_idx].numpy().astype(np.float64)
+        original_map = original_tensors[1][0, :, self.map_feature_idx].numpy().astype(np.float64).sum(axis=0)
+
+        # Sufficient statistics of the weighted ridge regression, the last column is the intercept
+        num_features = len(self.feature_names) + 1
+        xtwx = np.zeros((num_features, num_features))
+        xtwy = np.zeros(num_features)
+        weight_sum, wy_sum, wyy_sum = 0.0, 0.0, 0.0
+
+        for start in range(0, self.sample_size, self.batch_size):
+
+            # Generate and score a batch, the samples are discarded after the statistics are updated
+            batch = sampler.sample_snapshot_batch(graph, min(self.batch_size, self.sample_size - start), self.probability)
+            y = np.asarray(predict(batch), dtype=np.float64)
+
+            player_changes = batch[0][:, :, self.player_feature_idx].numpy().astype(np.float64) - original_player
+            map_changes = batch[1][:, :, self.map_feature_idx].numpy().astype(np.float64).sum(axis=1) - original_map
+
+            x = np.concatenate([player_changes.reshape(len(y), -1), map_changes, np.ones((len(y), 1))], axis=1)
+            weights = np.exp(-(x[:, :-1] ** 2).sum(axis=1) / self.kernel_width ** 2)
+
+            xtwx += (x * weights[:, None]).T @ x
+            xtwy += x.T @ (weights * y)
+            weight_sum += weights.sum()
+            wy_sum += (weights * y).sum()
+            wyy_sum += (weights * y * y).sum()
+
+        # Ridge solution, the intercept is not penalized
+        penalty = np.full(num_features, self.alpha)
+        penalty[-1] = 0
+        beta = np.linalg.solve(xtwx + np.diag(penalty), xtwy)
+
+        # Weighted R2 of the surrogate
+        residual_sum = wyy_sum - 2 * beta @ xtwy + beta @ xtwx @ beta
+        total_sum = wyy_sum - wy_sum ** 2 / weight_sum
+        score = 1 - residual_sum / total_sum if total_sum > 0 else np.nan
+
+        return {
+            'coef': beta[:-1],
+            'intercept': beta[-1],
+            'score': score,
+            'prediction': float(predict(original_tensors)[0]),
+            'samples': self.sample_size,
+        }
+
+    def explain_graphs(self, graphs: list[HeteroData], workers: int = 1) -> pd.DataFrame:
+        """
+        Explain the predictions of several snapshots. Returns a dataframe with one row per snapshot: the surrogate
+        coefficients (feature_names columns), 'intercept', 'score' and 'prediction'. With several workers the snapshots
+        are explained in parallel threads, at most one batch per worker is held in memory.
+        Parameters:
+        - graphs: the snapshots to explain.
+        - workers: the number of worker threads. Default is 1.
+        """
+
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('The workers should be a positive integer.')
+
+        # Independent perturbation streams per snapshot
+        seeds = np.random.SeedSequence(self.seed).spawn(len(graphs))
+
+        if workers == 1:
+            explanations = [self.explain(graph, seed) for graph, seed in zip(graphs, seeds)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                explanations = list(executor.map(self.explain, graphs, seeds))
+
+        explanations_df = pd.DataFrame(np.stack([explanation['coef'] for explanation in explanations]) if len(explanations) > 0 else None, columns=self.feature_names)
+        for key in ['intercept', 'score', 'prediction']:
+            explanations_df[key] = [explanation[key] for explanation in explanations]
+
+        return explanations_df
+
+    def explain_round(self, graphs: list[HeteroData], round_number: int, workers: int = 1, round_index: GraphRoundIndex = None) -> pd.DataFrame:
+        """
+        Explain the predictions of every snapshot of a round. See explain_graphs.
+        Parameters:
+        - graphs: the graph snapshots of the match.
+        - round_number: the round to explain.
+        - workers: the number of worker threads. Default is 1.
+        - round_index: the GraphRoundIndex of graphs, to avoid indexing the graphs on every call. Default is None, which indexes them.
+        """
+
+        if round_index is None:
+            round_index = GraphRoundIndex(graphs)
+
+        return self.explain_graphs(round_index.select_round(graphs, round_number), workers)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _predict_function(self, graph: HeteroData):
+
+        if isinstance(self.model, HeteroGNNRuntime):
+            return lambda tensors: self.model.predict(*tensors)
+
+        # The eager model is wrapped once per map edge layout
+        map_edge_index = graph['map', 'connected_to', 'map'].edge_index
+        key = (map_edge_index.shape[1], map_edge_index.numpy().tobytes())
+        with self._export_models_lock:
+            if key not in self._export_models:
+                self._export_models[key] = HeterogeneousGNNExport(InferenceEngine.model_on_device(self.model, 'cpu'), map_edge_index, player_self_edges=self.player_self_edges).eval()
+            export_model = self._export_models[key]
+
+        def predict(tensors):
+            with torch.inference_mode():
+                return export_model(*tensors).numpy()
+
+        return predict
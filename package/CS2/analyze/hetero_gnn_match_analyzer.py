@@ -0,0 +1,280 @@
+import torch
+from torch_geometric.data import HeteroData
+
+import numpy as np
+
+from collections import OrderedDict
+import hashlib
+import os
+
+from .inference_engine import InferenceEngine
+from .hetero_gnn_round_analyzer import HeteroGNNRoundAnalyzer
+from ..graph.match_graph_store import MatchGraphDataset
+from ..graph.temporal_window_dataset import TemporalWindowDataset
+from ..graph.graph_round_index import GraphRoundIndex
+
+
+class HeteroGNNMatchAnalyzer:
+    """
+    Match-level win probability analysis. Inference runs once over every window (or snapshot) of the match, the
+    predictions are cached by (model state-dict hash, graph store id, window parameters) in memory (the last
+    PREDICTION_CACHE_SIZE matches) and optionally on disk, and the rounds are handed out as views of the match predictions. Use round_analyzer to get a
+    HeteroGNNRoundAnalyzer of a round that reuses the cached predictions.
+    """
+
+    # Round numbers of the graph snapshots are normalized by the number of regulation rounds
+    ROUND_SCALE = GraphRoundIndex.ROUND_SCALE
+
+    # Number of match predictions kept in memory, older ones are reloaded from the cache_dir or predicted again
+    PREDICTION_CACHE_SIZE = 4
+
+    # In-memory prediction cache shared by the analyzers, cache key -> result dictionary, least recently used first
+    _prediction_cache = OrderedDict()
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(
+        self,
+        graphs,
+        dyn_graphs,
+        model,
+        dictionary=None,
+        batch_size: int = 64,
+        device=None,
+        cache_dir: str = None,
+        graph_store_id: str = None
+    ):
+        """
+        Parameters:
+        - graphs: the graph snapshots of the match.
+        - dyn_graphs: the temporal windows of the match (a list of windows or a TemporalWindowDataset). If None, the \
+          predictions are made on the snapshots.
+        - model: the model to use for the analysis.
+        - dictionary: the normalizing dictionary, passed to the round analyzers. Default is None.
+        - batch_size: the number of snapshots (or windows) in an inference batch. Default is 64.
+        - device: the device to run the model on. Default is None, which uses 'cuda' if available, otherwise 'cpu'.
+        - cache_dir: the directory of the on-disk prediction cache, reused across analyzers and processes. Default is None, \
+          which caches the last PREDICTION_CACHE_SIZE matches in memory only.
+        - graph_store_id: an id identifying the graphs of the match, e.g. a MatchGraphStore path and match id. Default is \
+          None, which derives the id from the match ids, rounds and ticks of the graphs.
+        """
+
+        self.graphs = graphs
+        self.dyn_graphs = dyn_graphs
+        self.model = model
+        self.normalizing_dictionary = dictionary
+        self.cache_dir = cache_dir
+
+        self.engine = InferenceEngine(model, batch_size=batch_size, device=device)
+
+        # Predictions of the whole match
+        data = dyn_graphs if dyn_graphs is not None else graphs
+        self._INIT_lazy_parameters_(data)
+        self.cache_key = self._INIT_cache_key_(data, graph_store_id)
+        self.predictions = self._INIT_predictions_(data)
+
+        # Integer round number -> slice of the round in the match predictions
+        self.round_slices = self._INIT_round_slices_()
+
+        # Round index of the graphs, built on the first round analyzer and shared by the round analyzers
+        self.round_index = None
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def round_numbers(self) -> list:
+        """
+        The round numbers of the match, in order of appearance.
+        """
+        return list(self.round_slices)
+
+    def round_predictions(self, round_number: int) -> dict:
+        """
+        Return the predictions of a round as views of the match prediction arrays (see InferenceEngine).
+        Parameters:
+        - round_number: the round to return.
+        """
+
+        if round_number not in self.round_slices:
+            raise ValueError(f'Round {round_number} is not present in the match.')
+
+        round_slice = self.round_slices[round_number]
+        return {key: values[round_slice] for key, values in self.predictions.items()}
+
+    def round_analyzer(self, round_number: int) -> HeteroGNNRoundAnalyzer:
+        """
+        Return a HeteroGNNRoundAnalyzer of a round, using the cached predictions of the round.
+        Parameters:
+        - round_number: the round to analyze.
+        """
+
+        if self.round_index is None and self.graphs is not None:
+            self.round_index = GraphRoundIndex(self.graphs)
+
+        return HeteroGNNRoundAnalyzer(
+            self.graphs,
+            self.dyn_graphs,
+            self.model,
+            round_number,
+            dictionary=self.normalizing_dictionary,
+            batch_size=self.engine.batch_size,
+            device=self.engine.device,
+            round_result=self.round_predictions(round_number),
+            round_index=self.round_index
+        )
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Clear the in-memory prediction cache.
+        """
+        cls._prediction_cache.clear()
+
+    @staticmethod
+    def model_hash(model) -> str:
+        """
+        Return the SHA-1 hash of the state dict of a model. The lazy parameters of the model must be initialized, e.g.
+        by a forward pass.
+        Parameters:
+        - model: the model.
+        """
+
+        digest = hashlib.sha1()
+        for name, tensor in sorted(model.state_dict().items()):
+
+            # Uninitialized lazy parameters have no values, the hash would change after the first forward pass
+            if torch.nn.parameter.is_lazy(tensor):
+                raise ValueError(f'The model has uninitialized lazy parameters ({name}), run a forward pass before hashing it.')
+
+            digest.update(name.encode())
+            digest.update(str(tensor.dtype).encode())
+            digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+
+        return digest.hexdigest()
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _INIT_lazy_parameters_(self, data):
+
+        # Lazy layers are initialized by a forward pass on the first sample, so the model hash is final
+        if len(data) > 0 and any(torch.nn.parameter.is_lazy(tensor) for tensor in self.engine.model.state_dict().values()):
+            self.engine.predict([data[0]])
+
+    def _INIT_cache_key_(self, data, graph_store_id: str) -> str:
+
+        if graph_store_id is None:
+            graph_store_id = self._EXT_graph_store_id_(data)
+
+        # Window parameters: the (start, length) index of a window dataset, the window lengths of a window list
+        if isinstance(data, TemporalWindowDataset):
+            window_params = hashlib.sha1(np.ascontiguousarray(data.windows).tobytes()).hexdigest()
+        elif len(data) > 0 and not isinstance(data[0], HeteroData):
+            window_params = hashlib.sha1(np.array([len(window) for window in data], dtype=np.int64).tobytes()).hexdigest()
+        else:
+            window_params = 'snapshots'
+
+        key = f'{self.model_hash(self.engine.model)}|{graph_store_id}|{window_params}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _INIT_predictions_(self, data) -> dict:
+
+        # In-memory cache
+        if self.cache_key in self._prediction_cache:
+            self._prediction_cache.move_to_end(self.cache_key)
+            return self._prediction_cache[self.cache_key]
+
+        # On-disk cache
+        cache_path = None if self.cache_dir is None else os.path.join(self.cache_dir, f'{self.cache_key}.npz')
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as cache:
+                predictions = {key: cache[key] for key in cache.files}
+
+        # Single inference pass over the match
+        else:
+            predictions = self.engine.predict(data)
+
+            if cache_path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+
+                # Write to a temporary file first, so a failed write does not corrupt the cache
+                with open(cache_path + '.tmp', 'wb') as cache_file:
+                    np.savez(cache_file, **predictions)
+                os.replace(cache_path + '.tmp', cache_path)
+
+        self._prediction_cache[self.cache_key] = predictions
+        while len(self._prediction_cache) > self.PREDICTION_CACHE_SIZE:
+            self._prediction_cache.popitem(last=False)
+
+        return predictions
+
+    def _INIT_round_slices_(self) -> dict:
+
+        round_slices = {}
+
+        for round_number, round_slice in InferenceEngine.round_slices(self.predictions).items():
+
+            start, end = round_slice.start, round_slice.stop
+
+            # Windows: keep the windows selected by HeteroGNNRoundAnalyzer._EXT_get_round_data_temporal
+            if 'window' in self.predictions:
+                end = start + self._EXT_selected_window_rows_(self.predictions['window'][round_slice], self.predictions['remaining_time'][round_slice])
+
+            round_slices[self._EXT_round_key_(round_number)] = slice(start, end)
+
+        return round_slices
+
+    def _EXT_selected_window_rows_(self, windows: np.ndarray, remaining_time: np.ndarray) -> int:
+
+        # Normalized remaining time at the end of each window of the round
+        window_ends = np.flatnonzero(np.diff(windows, append=-1) != 0)
+        last_remaining_time = (remaining_time[window_ends] + InferenceEngine.BOMB_TIME_OFFSET) / (InferenceEngine.ROUND_TIME + InferenceEngine.BOMB_TIME_OFFSET)
+
+        # Windows are taken while the remaining time decreases (or restarts below 0.9 for overlapping window sets)
+        last_graph_remaining_time = 1
+        selected_windows = 0
+        for remaining_time in last_remaining_time.tolist():
+            if remaining_time < last_graph_remaining_time or (remaining_time > last_graph_remaining_time and remaining_time < 0.9):
+                selected_windows += 1
+                last_graph_remaining_time = remaining_time
+            else:
+                break
+
+        if selected_windows == 0:
+            return 0
+
+        return int(window_ends[selected_windows - 1]) + 1
+
+    def _EXT_graph_store_id_(self, data) -> str:
+
+        # Graphs of a MatchGraphStore are identified by the store and the matches
+        graphs = data.graphs if isinstance(data, TemporalWindowDataset) else data
+        if isinstance(graphs, MatchGraphDataset):
+            return f"{os.path.abspath(graphs.store.root)}:{','.join(match['match_id'] for match in graphs.matches)}"
+
+        # Other graphs are identified by their match ids, rounds and ticks
+        if isinstance(data, TemporalWindowDataset):
+            round_index = data.round_index
+            identity = np.stack([round_index.match_ids, round_index.rounds, round_index.ticks])
+        else:
+            if len(data) > 0 and not isinstance(data[0], HeteroData):
+                graphs = [graph for window in data for graph in window]
+            identity = np.array([[graph.y['numerical_match_id'], graph.y['round'], graph.y['tick']] for graph in graphs], dtype=np.float64)
+
+        return hashlib.sha1(np.ascontiguousarray(identity, dtype=np.float64).tobytes()).hexdigest()
+
+    def _EXT_round_key_(self, round_value: float) -> int:
+
+        # Rounds are matched like in GraphRoundIndex, on the integer round number
+        return int(np.rint(round_value * self.ROUND_SCALE))
@@ -2,20 +2,24 @@ import torch
 from torch_geometric.data import DataLoader, HeteroData
 from torch_geometric.loader import DataLoader
 
-import shap
-shap.initjs()
-
 from sklearn.linear_model import Ridge
 from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error, explained_variance_score
 
 import pandas as pd
 import numpy as np
 from .snapshot_events import SnapshotEvents
+from .inference_engine import InferenceEngine
+from ..graph.temporal_window_dataset import TemporalWindowDataset
+from ..graph.temporal_graph_batch import TemporalGraphBatch
+from ..graph.hetero_graph_data import HeteroGraphData, GraphFeatureView
+from ..graph.graph_round_index import GraphRoundIndex
 
 from matplotlib import pyplot as plt
 import seaborn as sns
 
 from math import ceil
+from concurrent.futures import ThreadPoolExecutor
+import copy
 
 class HeteroGNNRoundAnalyzer:
 
@@ -40,21 +44,67 @@ class HeteroGNNRoundAnalyzer:
     edf_16 = None
     edf_20 = None
 
+    # Event dataset columns that are not surrogate model features
+    SURROGATE_DROP_COLUMNS = ['y', 'y_change', 'round', 'round_change', 'idx']
+
+    # Cached surrogate model inputs and fits, one per previous frame
+    _surrogate_data = None
+    _local_model_fits = None
+
     # --------------------------------------------------------------------------------------------
     # REGION: Constructor
     # --------------------------------------------------------------------------------------------
 
-    def __init__(self, graphs, dyn_graphs, model, round_number, dictionary=None):
+    def __init__(
+        self,
+        graphs,
+        dyn_graphs,
+        model,
+        round_number,
+        dictionary=None,
+        batch_size: int = 64,
+        device=None,
+        round_result: dict = None,
+        n_jobs: int = None,
+        round_index: GraphRoundIndex = None,
+        window_round_index: GraphRoundIndex = None
+    ):
+        """
+        Parameters:
+        - graphs: the graph snapshots of the match.
+        - dyn_graphs: the temporal windows of the match.
+        - model: the model to use for the analysis.
+        - round_number: the round to analyze.
+        - dictionary: the normalizing dictionary. Default is None.
+        - batch_size: the number of snapshots (or windows) in an inference batch. Default is 64.
+        - device: the device to run the model on. Default is None, which uses 'cuda' if available, otherwise 'cpu'.
+        - round_result: precomputed InferenceEngine predictions of the round, e.g. from HeteroGNNMatchAnalyzer.round_predictions. \
+          Default is None, which runs the inference of the round.
+        - n_jobs: the number of threads fitting the local surrogate models. Default is None, which uses one thread per previous frame.
+        - round_index: the GraphRoundIndex of graphs, e.g. shared by the round analyzers of a match. Default is None, which \
+          indexes the graphs when a round is first selected.
+        - window_round_index: the GraphRoundIndex of dyn_graphs (GraphRoundIndex.from_windows). Default is None, which \
+          indexes the windows when a round is first selected.
+        """
 
         self.graphs = graphs
         self.dyn_graphs = dyn_graphs
+        self.round_index = round_index
+        self.window_round_index = window_round_index
         self.model = model
         self.round_number = round_number
 
         if dictionary is not None:
             self.normalizing_dictionary = dictionary
 
-        self.predictions = self._SHAP_EVT_predict_proba(self.dyn_graphs, self.model, self.round_number)
+        self.engine = InferenceEngine(model, batch_size=batch_size, device=device)
+        self.round_result = round_result
+        self.n_jobs = n_jobs
+
+        if round_result is not None:
+            self.predictions = round_result['proba']
+        else:
+            self.predictions = self._SHAP_EVT_predict_proba(self.dyn_graphs, self.model, self.round_number)
         
 
 
@@ -86,10 +136,14 @@ class HeteroGNNRoundAnalyzer:
             exec('model_code')
 
 
-        selected_round = self._EXT_get_round_data_temporal(self.dyn_graphs, self.round_number)
-
-        # Get the predictions
-        predictions, remaining_time = self._EXT_get_round_predictions_temporal(selected_round, self.model)
+        # Get the predictions, precomputed predictions are reused
+        if self.round_result is not None:
+            predictions, remaining_time = self.round_result['proba'], self.round_result['remaining_time']
+            selected_round_length = len(np.unique(self.round_result['window'])) if 'window' in self.round_result else len(predictions)
+        else:
+            selected_round = self._EXT_get_round_data_temporal(self.dyn_graphs, self.round_number)
+            predictions, remaining_time = self._EXT_get_round_predictions_temporal(selected_round, self.model)
+            selected_round_length = len(selected_round)
 
         # If return_predictions is True, return the predictions without plotting
         if return_predictions:
@@ -107,9 +161,9 @@ class HeteroGNNRoundAnalyzer:
 
 
             # Other plot params
-            plt.xticks(range(115 - ceil(len(selected_round)/4), 115), fontsize=8)
+            plt.xticks(range(115 - ceil(selected_round_length/4), 115), fontsize=8)
             plt.ylim(0, 100);
-            plt.xlim(115 - len(selected_round)/4, 115);
+            plt.xlim(115 - selected_round_length/4, 115);
             plt.xlabel('Remaining time (seconds)', fontsize=12)
             plt.ylabel('Win probability (%)', fontsize=12)
             plt.gca().invert_xaxis()
@@ -169,9 +223,9 @@ class HeteroGNNRoundAnalyzer:
         self._SHAP_EXT_process_event_datasets()
 
         models = self._SHAP_train_local_models()
-        explainers, shap_values = self._SHAP_get_explainers_and_shap_values(models)
+        shap_values, expected_values = self._SHAP_get_shap_values(models)
         masked_shap_values = self._SHAP_mask_shap_values(shap_values)
-        agg_shap_values, explainer_expected_value = self._SHAP_aggregate_shap_values(masked_shap_values, explainers)
+        agg_shap_values, explainer_expected_value = self._SHAP_aggregate_shap_values(masked_shap_values, expected_values)
 
         return agg_shap_values, explainer_expected_value
 
@@ -217,45 +271,14 @@ class HeteroGNNRoundAnalyzer:
 
     def _EXT_get_round_data(self, graphs, round_number: int) -> dict:
 
-        selected_round = []
-
-        # Select round data
-        for graph in graphs:
-
-            graph_round = round(graph.y['round'], 2)
-            user_input_round = round(round_number/24, 2)
-
-            if np.float32(graph_round) == np.float32(user_input_round):
-                selected_round.append(graph)
-
-        return selected_round
+        # Select the round data with the round index of the graph list
+        return self._EXT_round_index(graphs).select_round(graphs, round_number)
 
     def _EXT_get_round_predictions(self, selected_round, model) -> dict:
 
-        selected_round_loader = DataLoader(selected_round, batch_size=1, shuffle=False)
-
-        model.eval()
-        pred = []
-        rem_times = []
-        targets = []
-
-        with torch.no_grad():
-            for data in selected_round_loader:
-                rem_times.append(data.y['remaining_time'])
-                data = data.to('cuda')
-                out = model(data.x_dict, data.edge_index_dict, data.y, 1).float()
-                target = torch.tensor(data.y['CT_wins']).float().to('cuda')
-                pred.append(torch.sigmoid(out).float().cpu().numpy())
-                targets.append(target.cpu().numpy())
-
-        predictions = [prediction[0][0] for prediction in pred]
-        rem_times = [time[0] for time in rem_times]
+        result = self._EXT_get_engine(model).predict_graphs(selected_round)
 
-        remaining_times = []
-        for time in rem_times:
-            remaining_times.append(time * (115 + 7.98) - 7.98)
-
-        return predictions, targets, remaining_times
+        return result['proba'], result['target'], result['remaining_time']
 
 
 
@@ -267,51 +290,58 @@ class HeteroGNNRoundAnalyzer:
         # Store the last graph's remaining time, as there might be overlapping dynamic graphs
         last_graph_remaining_time = 1
 
-        # Select round data
-        for dyn_graph in dyn_graphs:
-
-            dyn_graph_round = round(dyn_graph[0].y['round'], 2)
-            user_input_round = round(round_number/24, 2)
+        # Select round data, the windows of the round are found with the round index of the window list
+        for dyn_graph in self._EXT_round_index(dyn_graphs, windows=True).select_round(dyn_graphs, round_number):
 
-            if np.float32(dyn_graph_round) == np.float32(user_input_round):
-                dyn_graph_last_remaining_time = dyn_graph[-1].y['remaining_time']
-                if (dyn_graph_last_remaining_time < last_graph_remaining_time) or \
-                   (dyn_graph_last_remaining_time > last_graph_remaining_time and dyn_graph_last_remaining_time < 0.9):
-                    selected_round.append(dyn_graph)
-                    last_graph_remaining_time = dyn_graph[-1].y['remaining_time']
-                else:
-                    break
+            dyn_graph_last_remaining_time = dyn_graph[-1].y['remaining_time']
+            if (dyn_graph_last_remaining_time < last_graph_remaining_time) or \
+               (dyn_graph_last_remaining_time > last_graph_remaining_time and dyn_graph_last_remaining_time < 0.9):
+                selected_round.append(dyn_graph)
+                last_graph_remaining_time = dyn_graph[-1].y['remaining_time']
+            else:
+                break
 
 
         return selected_round
 
     def _EXT_get_round_predictions_temporal(self, selected_round, model) -> dict:
 
-        selected_round_loader = CSTemporalDataLoader(selected_round, batch_size=1, shuffle=False)
+        result = self._EXT_get_engine(model).predict_windows(selected_round)
 
-        model.eval()
-        predictions = []
-        rem_times = []
+        return result['proba'], result['remaining_time']
 
-        with torch.no_grad():
-            for dyn_graph  in selected_round_loader:
+    def _EXT_round_index(self, graphs, windows: bool = False) -> GraphRoundIndex:
 
-                for graph in dyn_graph[0]:
-                    rem_times.append(graph.y['remaining_time'])
-                
-                out = model(dyn_graph, len(dyn_graph), len(dyn_graph[0])).float()
-                predictions.extend(torch.sigmoid(out.squeeze()).float().cpu().numpy())
+        # The indices of the analyzed graphs and windows are built once and kept by the analyzer
+        if graphs is self.graphs and not windows:
+            if self.round_index is None:
+                self.round_index = GraphRoundIndex(graphs)
+            return self.round_index
 
-        remaining_times = []
-        for time in rem_times:
-            remaining_times.append(time * (115 + 7.98) - 7.98)
+        if graphs is self.dyn_graphs and windows:
+            if self.window_round_index is None:
+                self.window_round_index = GraphRoundIndex.from_windows(graphs)
+            return self.window_round_index
 
-        return predictions, remaining_times
+        return GraphRoundIndex.from_windows(graphs) if windows else GraphRoundIndex(graphs)
+
+    def _EXT_get_engine(self, model) -> InferenceEngine:
+
+        # Models other than the analyzed one get an engine with the same settings
+        if model is self.model:
+            return self.engine
+
+        return InferenceEngine(model, batch_size=self.engine.batch_size, device=self.engine.device)
 
 
 
     def _SHAP_train_local_models(self, print_results=False, plot_results=False, return_models=True):
 
+        # Fit the surrogate models once, in parallel
+        if self._local_model_fits is None:
+            with ThreadPoolExecutor(max_workers=self.n_jobs or len(self.previous_frames)) as executor:
+                self._local_model_fits = list(executor.map(self._SHAP_fit_local_model, self._SHAP_EXT_surrogate_data()))
+
         if plot_results:
             fig, axs = plt.subplots(2, 3, figsize=(7, 5))
 
@@ -319,26 +349,7 @@ class HeteroGNNRoundAnalyzer:
 
         for edf_idx in range(len(self.previous_frames)):
 
-            # Access the correct edf dynamically without using exec
-            edf_name = f'edf_{self.previous_frames[edf_idx]}'
-            edf = getattr(self, edf_name)
-
-            X = edf.drop(columns=['y', 'y_change', 'round', 'round_change', 'idx']).values
-            y = edf['y_change']
-
-            # Ridge regression training
-            local_model = Ridge(random_state=42, alpha=0.1)
-            local_model.fit(X, y)
-
-            # Prediction
-            y_pred = local_model.predict(X)
-            y_true = y
-
-            # Metrics
-            r2  = round(r2_score(y, y_pred), 4)
-            mse = round(mean_squared_error(y, y_pred), 4)
-            mae = round(mean_absolute_error(y, y_pred), 4)
-            evs = round(explained_variance_score(y, y_pred), 4)
+            local_model, y_true, y_pred, r2, mse, mae, evs = self._local_model_fits[edf_idx]
 
             if print_results:
                 print(f'EDF {self.previous_frames[edf_idx]} - R2: {r2}, MSE: {mse}, MAE: {mae}, EVS: {evs}')
@@ -374,10 +385,29 @@ class HeteroGNNRoundAnalyzer:
         if return_models:
             return models
 
+    def _SHAP_fit_local_model(self, surrogate_data):
+
+        X, y, _ = surrogate_data
+
+        # Ridge regression training
+        local_model = Ridge(random_state=42, alpha=0.1)
+        local_model.fit(X, y)
+
+        # Prediction
+        y_pred = local_model.predict(X)
+
+        # Metrics
+        r2  = round(r2_score(y, y_pred), 4)
+        mse = round(mean_squared_error(y, y_pred), 4)
+        mae = round(mean_absolute_error(y, y_pred), 4)
+        evs = round(explained_variance_score(y, y_pred), 4)
+
+        return local_model, y, y_pred, r2, mse, mae, evs
+
     def _SHAP_local_model_feature_importance(self, models, n, agg='mean'):
 
         # Feature list
-        feature_list = self.edf_1.drop(columns=['y', 'y_change', 'round', 'round_change', 'idx']).columns
+        feature_list = self.edf_1.drop(columns=self.SURROGATE_DROP_COLUMNS).columns
 
         # Model coefficients
         model_coefs = np.array([model.coef_ for model in models])
@@ -396,27 +426,25 @@ class HeteroGNNRoundAnalyzer:
 
         return pd.concat([CT_n.reset_index(drop=True), T_n.reset_index(drop=True)], axis=1)
 
-    def _SHAP_get_explainers_and_shap_values(self, models):
-
-        explainers = []
-        shap_values = []
+    def _SHAP_get_shap_values(self, models):
 
-        for idx in range(len(self.previous_frames)):
+        surrogate_data = self._SHAP_EXT_surrogate_data()
 
-            # Data
-            edf_name = f'edf_{self.previous_frames[idx]}'
-            edf = getattr(self, edf_name)
+        # Linear surrogate SHAP values in closed form: coef * (x - mean), with the data mean as the background
+        X_all = np.concatenate([X for X, _, _ in surrogate_data])
+        frame_idx = np.repeat(np.arange(len(models)), [len(X) for X, _, _ in surrogate_data])
 
-            X = edf.drop(columns=['y', 'y_change', 'round', 'round_change', 'idx']).values
+        coefs = np.array([model.coef_ for model in models])
+        means = np.array([X.mean(axis=0) for X, _, _ in surrogate_data])
+        intercepts = np.array([model.intercept_ for model in models])
 
-            # SHAP explainer inicialization
-            explainer = shap.LinearExplainer(models[idx], X)
-            shap_vals = explainer.shap_values(X)
+        shap_values = coefs[frame_idx] * (X_all - means[frame_idx])
+        shap_values = np.split(shap_values, np.cumsum([len(X) for X, _, _ in surrogate_data])[:-1])
 
-            explainers.append(explainer)
-            shap_values.append(shap_vals)
+        # Expected values: the surrogate predictions at the data mean
+        expected_values = intercepts + (coefs * means).sum(axis=1)
 
-        return explainers, shap_values
+        return shap_values, expected_values
 
     def _SHAP_mask_shap_values(self, shap_values):
 
@@ -428,9 +456,9 @@ class HeteroGNNRoundAnalyzer:
             edf = getattr(self, edf_name)
 
             # Get the mask values
-            mask = (edf.drop(columns=['y', 'y_change', 'round', 'round_change', 'idx']) != 0) * 1
+            mask = (edf.drop(columns=self.SURROGATE_DROP_COLUMNS) != 0) * 1
             # Get the column names
-            mask_cols = edf.drop(columns=['y', 'y_change', 'round', 'round_change', 'idx']).columns
+            mask_cols = edf.drop(columns=self.SURROGATE_DROP_COLUMNS).columns
 
             # Create a dataframe with the mask values
             player_mask_df = pd.DataFrame(
@@ -461,7 +489,7 @@ class HeteroGNNRoundAnalyzer:
 
         return masked_shap_values
 
-    def _SHAP_aggregate_shap_values(self, masked_shap_values, explainers, agg='mean'):
+    def _SHAP_aggregate_shap_values(self, masked_shap_values, expected_values, agg='mean'):
 
         # Max row number
         max_rows = max(shap_table.shape[0] for shap_table in masked_shap_values)
@@ -483,17 +511,39 @@ class HeteroGNNRoundAnalyzer:
                 agg_shap_values[-i] = np.mean(rows_to_average, axis=0)
 
 
-        explainer_expected_value = np.mean([explainer.expected_value for explainer in explainers])
+        explainer_expected_value = np.mean(expected_values)
 
         return agg_shap_values, explainer_expected_value
 
 
 
     def _SHAP_EXT_process_event_datasets(self):
-        
-        if self.edf_1 is None or self.edf_4 is None or self.edf_8 is None or self.edf_12 is None or self.edf_16 is None or self.edf_20 is None:
+
+        # The event datasets are computed once per analyzer, the missing frames in a single pass over the round
+        missing_frames = [frame for frame in self.previous_frames if getattr(self, f'edf_{frame}') is None]
+        if len(missing_frames) == 0:
+            return
+
+        round_events = SnapshotEvents().get_round_events_multi(
+            self.graphs, self.predictions, self.round_number, missing_frames,
+            dictionary=self.normalizing_dictionary, round_index=self._EXT_round_index(self.graphs)
+        )
+        for frame in missing_frames:
+            setattr(self, f'edf_{frame}', round_events[frame])
+
+    def _SHAP_EXT_surrogate_data(self):
+
+        # Surrogate model inputs (X, y, feature names) of each previous frame, built once
+        if self._surrogate_data is None:
+            self._SHAP_EXT_process_event_datasets()
+
+            self._surrogate_data = []
             for frame in self.previous_frames:
-                exec(f'self.edf_{frame} = SnapshotEvents().get_round_events(self.graphs, self.predictions, {self.round_number}, shift_rate={frame}, dictionary=self.normalizing_dictionary)')
+                edf = getattr(self, f'edf_{frame}')
+                features = edf.drop(columns=self.SURROGATE_DROP_COLUMNS)
+                self._surrogate_data.append((features.values, edf['y_change'], features.columns))
+
+        return self._surrogate_data
 
 
 
@@ -514,7 +564,7 @@ class HeteroGNNRoundAnalyzer:
        # Check if the dataset is temporal
         IS_TEMPORAL = False
 
-        if graphs is not None and type(graphs[0])!=HeteroData:
+        if graphs is not None and not isinstance(graphs[0], HeteroData):
             IS_TEMPORAL = True
 
 
@@ -746,6 +796,21 @@ class HeterogeneousGNN(torch.nn.Module):
     def forward(self, x_dict, edge_index_dict, y, batch_size):
 
         # Do the convolutions
+        x_dict = self.convolve(x_dict, edge_index_dict)
+
+        # Flatten the graphs of the batch
+        x = self.flatten(x_dict, edge_index_dict, y, batch_size)
+
+        return self.head(x)
+
+    def convolve(self, x_dict, edge_index_dict):
+        """
+        Run the graph convolutions and return the node features of the batch.
+        Parameters:
+        - x_dict: the node features of the batch.
+        - edge_index_dict: the edge indices of the batch.
+        """
+
         conv_idx = 1
         for conv in self.convs:
             temp = conv(x_dict, edge_index_dict)
@@ -760,6 +825,89 @@ class HeterogeneousGNN(torch.nn.Module):
 
             conv_idx += 1
 
+        return x_dict
+
+    def head(self, x):
+        """
+        Run the dense layers on the flattened graphs and return the logits.
+        Parameters:
+        - x: the flattened graphs, shape (batch_size, -1).
+        """
+
+        x = self.linear(x)
+        x = torch.nn.functional.leaky_relu(x)
+        
+        x = self.dense(x)
+        
+        return x
+    
+
+
+
+
+
+
+    # --------------------------------------------------
+    # Quantization
+    # --------------------------------------------------
+
+    def quantize(self):
+        """
+        Return a copy of the model with dynamic int8 quantized dense layers for CPU inference. The flattened input
+        linear layer and the dense layers are quantized, the GATv2 convolutions stay in float32. The model must be
+        trained (its lazy layers initialized), the original model is not modified.
+        """
+
+        if isinstance(self.linear.weight, torch.nn.parameter.UninitializedParameter):
+            raise ValueError('The model must be initialized (run a forward pass or load a state dict) before quantization.')
+
+        quantized_model = copy.deepcopy(self).cpu().eval()
+
+        # The PyG input Linear is replaced by a torch Linear, so it is picked up by quantize_dynamic
+        linear = torch.nn.Linear(self.linear.in_channels, self.linear.out_channels, bias=self.linear.bias is not None)
+        linear.load_state_dict({name: tensor.detach().cpu() for name, tensor in self.linear.state_dict().items()})
+        quantized_model.linear = linear
+
+        # Only the torch Linear layers are quantized, the convolutions use PyG Linear layers
+        return torch.ao.quantization.quantize_dynamic(quantized_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+
+
+
+    # --------------------------------------------------
+    # Helper functions
+    # --------------------------------------------------
+
+    def flatten(self, x_dict, edge_index_dict, y, batch_size):
+        """
+        Flatten the node features and the graph-level features of the batch into a (batch_size, -1) tensor.
+        Every graph has 10 player nodes and the same number of map nodes, so the node features of a node type are
+        flattened with a single reshape. Batches with other node counts fall back to flatten_loop.
+        Parameters:
+        - x_dict: the node features of the batch after the convolutions.
+        - edge_index_dict: the edge indices of the batch, only used by the flatten_loop fallback.
+        - y: the graph-level features of the batch.
+        - batch_size: the number of graphs in the batch.
+        """
+
+        if x_dict['player'].shape[0] != 10 * batch_size or x_dict['map'].shape[0] % batch_size != 0:
+            return self.flatten_loop(x_dict, edge_index_dict, y, batch_size)
+
+        player_x = x_dict['player']
+        graph_data = self.get_graph_data(y).to(device=player_x.device, dtype=player_x.dtype)
+
+        return torch.cat([player_x.reshape(batch_size, -1), x_dict['map'].reshape(batch_size, -1), graph_data], dim=1)
+
+    def flatten_loop(self, x_dict, edge_index_dict, y, batch_size):
+        """
+        Flatten the batch graph by graph. Reference implementation of flatten, used for batches with varying node counts.
+        Parameters:
+        - x_dict: the node features of the batch after the convolutions.
+        - edge_index_dict: the edge indices of the batch.
+        - y: the graph-level features of the batch.
+        - batch_size: the number of graphs in the batch.
+        """
 
         # Container for the flattened graphs after the convolutions
         flattened_graphs = []
@@ -800,7 +948,7 @@ class HeterogeneousGNN(torch.nn.Module):
                 y['bomb_mx_pos7'][graph_idx],
                 y['bomb_mx_pos8'][graph_idx],
                 y['bomb_mx_pos9'][graph_idx],
-            ]).to('cuda')
+            ]).to(x_dict['player'].device)
 
             # Create the flattened input tensor and append it to the container
             x = torch.cat([torch.flatten(actual_x_dict['player']), torch.flatten(actual_x_dict['map']), torch.flatten(graph_data)])
@@ -808,24 +956,20 @@ class HeterogeneousGNN(torch.nn.Module):
             flattened_graphs.append(x)
 
         # Stack the flattened graphs
-        x = torch.stack(flattened_graphs).to('cuda')
-
-        x = self.linear(x)
-        x = torch.nn.functional.leaky_relu(x)
-        
-        x = self.dense(x)
-        
-        return x
-    
-
-
+        return torch.stack(flattened_graphs)
 
+    def get_graph_data(self, y):
+        """
+        Return the (batch_size, 28) tensor of the graph-level features used by the model, column order is
+        HeteroGraphData.MODEL_GRAPH_FEATURES.
+        Parameters:
+        - y: the graph-level features of the batch, a y dictionary or the y accessor of a HeteroGraphData batch.
+        """
 
+        if isinstance(y, GraphFeatureView):
+            return y.stack(HeteroGraphData.MODEL_GRAPH_FEATURES)
 
-
-    # --------------------------------------------------
-    # Helper functions
-    # --------------------------------------------------
+        return torch.stack([torch.as_tensor(y[feature], dtype=torch.float32).reshape(-1) for feature in HeteroGraphData.MODEL_GRAPH_FEATURES], dim=1)
 
     def get_actual_graph(self, x_dict, edge_index_dict, graph_idx, batch_size):
 
@@ -852,36 +996,104 @@ class HeterogeneousGNN(torch.nn.Module):
         actual_edge_index_dict[('player', 'closest_to', 'map')] = edge_index_dict[('player', 'closest_to', 'map')] \
             [:, graph_idx*single_player_to_map_edge_size:(graph_idx+1)*single_player_to_map_edge_size]
         
-        actual_edge_index_dict_correction_tensor = torch.tensor([single_player_node_size*graph_idx, single_map_node_size*graph_idx]).to('cuda')
+        actual_edge_index_dict_correction_tensor = torch.tensor([single_player_node_size*graph_idx, single_map_node_size*graph_idx], device=x_dict['player'].device)
         actual_edge_index_dict[('player', 'closest_to', 'map')] = actual_edge_index_dict[('player', 'closest_to', 'map')] - actual_edge_index_dict_correction_tensor.view(-1, 1)
 
         
         return actual_x_dict, actual_edge_index_dict
     
-class CSTemporalDataLoader(DataLoader):
+# Collate a batch of temporal windows into a list of windows (picklable for the worker processes)
+def _collate_window_list(batch):
+    return batch
 
-    def __init__(self, dataset, batch_size=1, shuffle=False, *args, **kwargs):
-        super().__init__(dataset, batch_size=batch_size, shuffle=shuffle, *args, **kwargs)
+class LengthGroupedBatchSampler(torch.utils.data.Sampler):
+    """
+    Batch sampler grouping the temporal windows by length, so every batch holds windows of the same length and
+    needs no padding. With shuffling, the windows of each length and the order of the batches are shuffled.
+    """
 
-        self._dataset = dataset
-        self._batch_size = batch_size
-        self._shuffle = shuffle
+    def __init__(self, lengths, batch_size: int, shuffle: bool = False, drop_last: bool = False, generator: torch.Generator = None):
+        """
+        Parameters:
+        - lengths: the length of every window of the dataset.
+        - batch_size: the number of windows in a batch.
+        - shuffle: whether to shuffle the windows and batches. Default is False.
+        - drop_last: whether to drop the last smaller batch of each length. Default is False.
+        - generator: the random generator used for shuffling. Default is None.
+        """
+
+        self.lengths = torch.as_tensor(np.asarray(lengths), dtype=torch.long)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
 
     def __iter__(self):
-        # Optionally shuffle the dataset
-        indices = list(range(len(self._dataset)))
-        if self._shuffle:
-            torch.random.manual_seed(42)  # Ensure reproducibility if needed
-            indices = torch.randperm(len(self._dataset)).tolist()
-
-        # Yield batches of DTDGs
-        batch = []
-        for idx in indices:
-            batch.append(self._dataset[idx])
-            if len(batch) == self._batch_size:
-                yield batch
-                batch = []
-
-        # Yield the last smaller batch if it exists
-        if batch:
-            yield batch
+
+        batches = []
+        for length in torch.unique(self.lengths).tolist():
+
+            # Windows of the actual length
+            indices = torch.nonzero(self.lengths == length).flatten()
+            if self.shuffle:
+                indices = indices[torch.randperm(len(indices), generator=self.generator)]
+
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start:start + self.batch_size].tolist()
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch)
+
+        # Shuffle the batch order, otherwise the batches are ordered by window length
+        if self.shuffle:
+            batches = [batches[batch_idx] for batch_idx in torch.randperm(len(batches), generator=self.generator).tolist()]
+
+        return iter(batches)
+
+    def __len__(self):
+        counts = torch.unique(self.lengths, return_counts=True)[1]
+        if self.drop_last:
+            return int((counts // self.batch_size).sum())
+        return int(((counts + self.batch_size - 1) // self.batch_size).sum())
+
+class CSTemporalDataLoader(torch.utils.data.DataLoader):
+    """
+    DataLoader over temporal windows (lists of graph snapshots, e.g. a TemporalWindowDataset or the output of
+    TemporalHeteroGraphSnapshot.process_match). Built on the torch DataLoader, so num_workers, prefetch_factor and
+    pin_memory are honored. By default the batches are lists of windows, with collate='tensor' they are TemporalGraphBatch objects.
+    """
+
+    def __init__(self, dataset, batch_size=1, shuffle=False, seed=42, group_by_length=False, collate='list', drop_last=False, **kwargs):
+        """
+        Parameters:
+        - dataset: the temporal windows.
+        - batch_size: the number of windows in a batch. Default is 1.
+        - shuffle: whether to shuffle the windows. Default is False.
+        - seed: the seed of the random generator of the loader, used for shuffling. Default is 42.
+        - group_by_length: whether to batch windows of the same length together to avoid padding. Default is False.
+        - collate: 'list' yields lists of windows, 'tensor' yields TemporalGraphBatch objects. Default is 'list'.
+        - drop_last: whether to drop the last smaller batch. Default is False.
+        - kwargs: other DataLoader parameters, e.g. num_workers, prefetch_factor, pin_memory, persistent_workers.
+        """
+
+        if collate not in ['list', 'tensor']:
+            raise ValueError("The collate must be one of the following: 'list', 'tensor'.")
+
+        # Per loader random generator, shuffling does not touch the global torch RNG
+        generator = torch.Generator()
+        generator.manual_seed(seed)
+
+        collate_fn = TemporalGraphBatch.collate if collate == 'tensor' else _collate_window_list
+
+        if group_by_length:
+
+            # Window lengths, read from the window index if available
+            if isinstance(dataset, TemporalWindowDataset):
+                lengths = dataset.window_lengths()
+            else:
+                lengths = [len(window) for window in dataset]
+
+            batch_sampler = LengthGroupedBatchSampler(lengths, batch_size, shuffle=shuffle, drop_last=drop_last, generator=generator)
+            super().__init__(dataset, batch_sampler=batch_sampler, generator=generator, collate_fn=collate_fn, **kwargs)
+
+        else:
+            super().__init__(dataset, batch_size=batch_size, shuffle=shuffle, drop_last=drop_last, generator=generator, collate_fn=collate_fn, **kwargs)
@@ -0,0 +1,96 @@
+import torch
+from torch_geometric.data import HeteroData
+
+import numpy as np
+
+from .hetero_gnn_export import HeterogeneousGNNExport
+
+
+class HeteroGNNRuntime:
+    """
+    CPU runtime of a HeterogeneousGNN exported with HeterogeneousGNNExport.export. Loads the TorchScript model,
+    optionally freezes it for inference, and runs batched inference on the fixed tensor signature
+    (player_x, map_x, player_map_targets, graph_features) or directly on graph snapshots.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, path: str, batch_size: int = 256, num_threads: int = None, optimize: bool = True):
+        """
+        Parameters:
+        - path: the path of the exported TorchScript model.
+        - batch_size: the maximum number of snapshots in an inference batch. Default is 256.
+        - num_threads: the number of intra-op threads of torch. The setting is process-wide. Default is None, which keeps the torch default.
+        - optimize: whether to freeze the model and apply the TorchScript inference optimizations. Default is True.
+        """
+
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('The batch size must be a positive integer.')
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        self.batch_size = batch_size
+        self.num_threads = torch.get_num_threads()
+
+        model = torch.jit.load(path, map_location='cpu')
+        model.eval()
+
+        if optimize:
+            model = torch.jit.optimize_for_inference(model)
+
+        self.model = model
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def predict(self, player_x, map_x, player_map_targets, graph_features) -> np.ndarray:
+        """
+        Predict the CT win probabilities of a batch of snapshots given as tensors (or numpy arrays). Batches larger
+        than batch_size are split. Returns a numpy array of shape (B,).
+        Parameters:
+        - player_x: the player node features, shape (B, 10, F_player).
+        - map_x: the map node features, shape (B, map_nodes, F_map).
+        - player_map_targets: the map node targets of the player->map edges, shape (B, 10).
+        - graph_features: the graph-level features, shape (B, G), column order is HeteroGraphData.GRAPH_FEATURES.
+        """
+
+        inputs = (
+            torch.as_tensor(player_x, dtype=torch.float32),
+            torch.as_tensor(map_x, dtype=torch.float32),
+            torch.as_tensor(player_map_targets, dtype=torch.long),
+            torch.as_tensor(graph_features, dtype=torch.float32),
+        )
+
+        probas = []
+        with torch.inference_mode():
+            for start in range(0, len(inputs[0]), self.batch_size):
+                probas.append(self.model(*[tensor[start:start + self.batch_size] for tensor in inputs]))
+
+        if len(probas) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        return torch.cat(probas).numpy()
+
+    def predict_graphs(self, graphs: list[HeteroData]) -> np.ndarray:
+        """
+        Predict the CT win probabilities of graph snapshots in batches of batch_size graphs. Returns a numpy array
+        aligned to the graphs.
+        Parameters:
+        - graphs: the graph snapshots.
+        """
+
+        probas = [
+            self.predict(*HeterogeneousGNNExport.graph_tensors(graphs[start:start + self.batch_size]))
+            for start in range(0, len(graphs), self.batch_size)
+        ]
+
+        if len(probas) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        return np.concatenate(probas)
@@ -0,0 +1,254 @@
+import torch
+from torch_geometric.data import HeteroData
+from torch_geometric.loader import DataLoader
+
+import numpy as np
+
+import copy
+
+from ..graph.hetero_graph_data import HeteroGraphData
+from ..graph.temporal_window_dataset import TemporalWindowDataset
+
+
+class InferenceEngine:
+    """
+    Batched win probability inference over the graph snapshots of a match.
+    Snapshots (HeterogeneousGNN) are collated into batches of batch_size graphs, temporal windows
+    (TemporalHeterogeneousGNN) are grouped by length into batches of batch_size windows. The model runs under
+    torch.inference_mode on the chosen device, and the results are returned as numpy arrays aligned to the snapshots:
+    - proba: the CT win probability of each snapshot.
+    - target: the CT_wins label of each snapshot.
+    - tick, round: the tick and (normalized) round number of each snapshot.
+    - remaining_time: the remaining time of the round in seconds.
+    - window, step: the window index and the time step in the window (temporal models only).
+    """
+
+    # Remaining time normalization of the graph snapshots, seconds = value * (ROUND_TIME + BOMB_TIME_OFFSET) - BOMB_TIME_OFFSET
+    ROUND_TIME = 115
+    BOMB_TIME_OFFSET = 7.98
+
+    # Graph-level features returned with the predictions
+    RESULT_FEATURES = ['tick', 'round', 'remaining_time']
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, model, batch_size: int = 64, device=None, quantize: bool = False):
+        """
+        Parameters:
+        - model: the model to run. HeterogeneousGNN models are called with (x_dict, edge_index_dict, y, batch_size), \
+          temporal models with (windows, batch_size, window_length).
+        - batch_size: the number of snapshots (or windows for temporal models) in a batch. Default is 64.
+        - device: the device to run the model on. Default is None, which uses 'cuda' if available, otherwise 'cpu'.
+        - quantize: whether to run a dynamic int8 quantized copy of the model (see HeterogeneousGNN.quantize). Only \
+          supported on the CPU. Default is False.
+        """
+
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('The batch size must be a positive integer.')
+
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+        self.device = torch.device(device)
+        self.batch_size = batch_size
+        self.quantize = quantize
+
+        # Quantized models run on the CPU only
+        if quantize:
+            if self.device.type != 'cpu':
+                raise ValueError('Quantized inference is only supported on the CPU.')
+            model = model.quantize()
+
+        # The caller's model is not moved, other engines may run it on another device
+        self.model = self.model_on_device(model, self.device)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def model_on_device(model, device):
+        """
+        Returns the model if all of its parameters and buffers are on the device, otherwise a copy of the model moved to
+        the device. The given model is never moved.
+        Parameters:
+        - model: the model.
+        - device: the target device.
+        """
+
+        device = torch.device(device)
+        tensors = list(model.parameters()) + list(model.buffers())
+
+        # CUDA tensors without an index are on the current device
+        def on_device(tensor):
+            return tensor.device.type == device.type and (device.index is None or tensor.device.index == device.index)
+
+        if all(on_device(tensor) for tensor in tensors):
+            return model
+
+        return copy.deepcopy(model).to(device)
+
+    def predict(self, data) -> dict:
+        """
+        Predict the win probabilities of graph snapshots or temporal windows.
+        Parameters:
+        - data: a list (or dataset) of graph snapshots, a list of windows or a TemporalWindowDataset.
+        """
+
+        if isinstance(data, TemporalWindowDataset) or (len(data) > 0 and not isinstance(data[0], HeteroData)):
+            return self.predict_windows(data)
+
+        return self.predict_graphs(data)
+
+    def predict_graphs(self, graphs) -> dict:
+        """
+        Predict the win probabilities of graph snapshots in batches of batch_size graphs.
+        Parameters:
+        - graphs: a list of graph snapshots or a MatchGraphDataset.
+        """
+
+        loader = DataLoader(graphs, batch_size=self.batch_size, shuffle=False)
+
+        probas, graph_features, targets = [], [], []
+
+        self.model.eval()
+        with torch.inference_mode():
+            for batch in loader:
+
+                # Graph-level features are read on the CPU before the transfer
+                graph_features.append(HeteroGraphData.collate_graph_features(batch, self.RESULT_FEATURES))
+                targets.append(HeteroGraphData.collate_label(batch))
+
+                batch = batch.to(self.device)
+                out = self.model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs)
+                probas.append(torch.sigmoid(out.float()).reshape(-1).cpu())
+
+        if len(probas) == 0:
+            return self._EXT_result_(np.empty(0), np.empty((0, len(self.RESULT_FEATURES))), np.empty(0))
+
+        return self._EXT_result_(torch.cat(probas).numpy(), torch.cat(graph_features).numpy(), torch.cat(targets).numpy())
+
+    def predict_windows(self, windows) -> dict:
+        """
+        Predict the win probabilities of every time step of temporal windows. Windows of the same length are batched
+        together, the results follow the order of the windows and of the snapshots in the windows.
+        Parameters:
+        - windows: a list of windows (lists of graph snapshots) or a TemporalWindowDataset.
+        """
+
+        # Window lengths, read from the window index if available
+        if isinstance(windows, TemporalWindowDataset):
+            lengths = windows.window_lengths()
+        else:
+            lengths = np.array([len(window) for window in windows], dtype=np.int64)
+
+        # Result offset of each window
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        probas = np.empty(offsets[-1], dtype=np.float32)
+        graph_features = np.empty((offsets[-1], len(self.RESULT_FEATURES)), dtype=np.float64)
+        targets = np.empty(offsets[-1], dtype=np.float32)
+
+        self.model.eval()
+        with torch.inference_mode():
+            for length in np.unique(lengths).tolist():
+
+                # Windows of the actual length, in their original order
+                window_indices = np.flatnonzero(lengths == length)
+
+                for start in range(0, len(window_indices), self.batch_size):
+                    batch_indices = window_indices[start:start + self.batch_size]
+                    batch = [windows[int(window_idx)] for window_idx in batch_indices]
+
+                    out = self.model(batch, len(batch), length)
+                    out = torch.sigmoid(out.float()).reshape(len(batch), length).cpu().numpy()
+
+                    # Scatter the (window, step) predictions to the result positions
+                    positions = offsets[batch_indices][:, None] + np.arange(length)
+                    probas[positions] = out
+
+                    for window_idx, window in zip(batch_indices, batch):
+                        graph_features[offsets[window_idx]:offsets[window_idx + 1]] = self._EXT_window_features_(window)
+                        targets[offsets[window_idx]:offsets[window_idx + 1]] = [HeteroGraphData.collate_label(graph).item() for graph in window]
+
+        result = self._EXT_result_(probas, graph_features, targets)
+        result['window'] = np.repeat(np.arange(len(lengths)), lengths)
+        result['step'] = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+
+        return result
+
+    def predict_rounds(self, data) -> dict:
+        """
+        Predict the win probabilities of every round of a match in a single pass. Returns a dictionary of round number
+        -> result dictionary, holding views of the arrays of the match result.
+        Parameters:
+        - data: the snapshots or windows of the match, see predict.
+        """
+
+        return self.split_rounds(self.predict(data))
+
+    @staticmethod
+    def split_rounds(result: dict) -> dict:
+        """
+        Split a result dictionary by rounds. Returns a dictionary of round number -> result dictionary holding views
+        of the arrays of the result.
+        Parameters:
+        - result: the result dictionary of a predict method.
+        """
+
+        return {
+            round_number: {key: values[round_slice] for key, values in result.items()}
+            for round_number, round_slice in InferenceEngine.round_slices(result).items()
+        }
+
+    @staticmethod
+    def round_slices(result: dict) -> dict:
+        """
+        Return the round number -> slice of the rows of the round in a result dictionary. Rounds are the runs of equal
+        round numbers, a round number appearing in several runs is represented by its first run.
+        Parameters:
+        - result: the result dictionary of a predict method.
+        """
+
+        rounds = result['round']
+        run_starts = np.flatnonzero(np.diff(rounds, prepend=np.nan) != 0)
+        run_ends = np.append(run_starts[1:], len(rounds))
+
+        round_slices = {}
+        for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+            round_number = float(rounds[start])
+            if round_number not in round_slices:
+                round_slices[round_number] = slice(start, end)
+
+        return round_slices
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _EXT_window_features_(self, window) -> np.ndarray:
+
+        return np.concatenate([HeteroGraphData.collate_graph_features(graph, self.RESULT_FEATURES).numpy() for graph in window])
+
+    def _EXT_result_(self, probas: np.ndarray, graph_features: np.ndarray, targets: np.ndarray) -> dict:
+
+        result = {
+            'proba': np.asarray(probas, dtype=np.float32),
+            'target': np.asarray(targets, dtype=np.float32),
+        }
+
+        for col_idx, feature in enumerate(self.RESULT_FEATURES):
+            result[feature] = np.asarray(graph_features[:, col_idx], dtype=np.float64)
+
+        # Remaining time in seconds
+        result['remaining_time'] = result['remaining_time'] * (self.ROUND_TIME + self.BOMB_TIME_OFFSET) - self.BOMB_TIME_OFFSET
+
+        return result
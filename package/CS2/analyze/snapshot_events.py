@@ -6,6 +6,9 @@ import numpy as np
 
 import random
 
+from ..graph.map_graph import MapGraph
+from ..graph.graph_round_index import GraphRoundIndex
+
 
 class SnapshotEvents:
 
@@ -17,8 +20,16 @@ class SnapshotEvents:
     # REGION: Constructor
     # --------------------------------------------------------------------------------------------
 
-    def __init__(self):
-        pass 
+    def __init__(self, map_graph: MapGraph = None):
+        """
+        Parameters:
+        - map_graph: the MapGraph artifact of the map, providing the position groups of the map nodes. Default is None, which uses the de_inferno positions.
+        """
+
+        self.map_graph = map_graph
+
+        # Position group lookups of the maps, keyed by the pos_id column of the map nodes
+        self._position_lookups = {}
 
 
 
@@ -26,17 +37,38 @@ class SnapshotEvents:
     # REGION: Public methods
     # --------------------------------------------------------------------------------------------
 
-    def get_round_events(self, data, predictions, round_num, shift_rate=1, dictionary=None, keep_universal_intact=False):
+    def get_round_events(self, data, predictions, round_num, shift_rate=1, dictionary=None, keep_universal_intact=False, round_index: GraphRoundIndex = None):
+
+        return self.get_round_events_multi(data, predictions, round_num, [shift_rate], dictionary, keep_universal_intact, round_index)[shift_rate]
+
+    def get_round_events_multi(self, data, predictions, round_num, shift_rates, dictionary=None, keep_universal_intact=False, round_index: GraphRoundIndex = None) -> dict:
+        """
+        Return the event (change) frames of a round for several shift rates. The snapshots of the round are processed
+        once into a single array, which is shared by the change frames of the shift rates.
+        Parameters:
+        - data: the graph snapshots of the match.
+        - predictions: the predictions of the round, the first snapshots without a prediction get zeros.
+        - round_num: the round number.
+        - shift_rates: the shift rates.
+        - dictionary: the normalizing dictionary. Default is None.
+        - keep_universal_intact: whether to add the unchanged universal columns to the frames. Default is False.
+        - round_index: the GraphRoundIndex of data, to avoid indexing the snapshots on every call. Default is None, which indexes them.
+        """
 
         if dictionary is not None:
             self.kills_max = dictionary.loc[dictionary['column'] == '_stat_kills', 'max'].values[0]
             self.damage_max = dictionary.loc[dictionary['column'] == '_stat_damage', 'max'].values[0]
 
-        round_data = self._get_round_data(data, round_num)
-        round_changes = self._shift_round_data(round_data, predictions, shift_rate, keep_universal_intact)
+        round_data = self._get_round_data(data, round_num, round_index)
+        column_names, round_array = self._stack_round_data(round_data, predictions)
 
-        round_changes['idx'] = round_changes.reset_index().index
-        return round_changes
+        round_events = {}
+        for shift_rate in shift_rates:
+            round_changes = self._shift_round_array(column_names, round_array, len(round_data) - len(predictions), shift_rate, keep_universal_intact)
+            round_changes['idx'] = round_changes.reset_index().index
+            round_events[shift_rate] = round_changes
+
+        return round_events
 
 
     # --------------------------------------------------------------------------------------------
@@ -100,18 +132,12 @@ class SnapshotEvents:
         damages = torch.round(graph['player'].x[:, 44] * self.damage_max)
 
         # Actual nearenst map node
-        positions = []
-        for node in graph['map'].x:
-            if str(node[0].tolist())[:2] not in positions:
-                positions.append(str(node[0].tolist())[:2])
-        
-        position_flags = np.zeros([10, len(positions)])
+        player_position_columns, num_positions, _ = self._get_position_lookup(graph)
 
-        nearest_map_node = graph[('player', 'closest_to', 'map')].edge_index[1]
-        for node_id in range(len(nearest_map_node)):
-            position_flags[node_id][int(str(graph['map'].x[nearest_map_node[node_id]][0].tolist())[:2]) - 10] = 1
+        nearest_map_node = graph[('player', 'closest_to', 'map')].edge_index[1].long()
 
-        position_flags = torch.tensor(position_flags)
+        position_flags = torch.zeros([10, num_positions], dtype=torch.float64)
+        position_flags[torch.arange(10), player_position_columns[nearest_map_node]] = 1
 
         # Inventory
         inventory = graph['player'].x[:, 53:95]
@@ -147,29 +173,54 @@ class SnapshotEvents:
         return player_column_names, player_data
 
     def _get_map_data(self, graph):
+
+        # Position names of the map node groups
+        if self.map_graph is not None:
+            original_pos_names = self.map_graph.position_names
+        else:
+            original_pos_names = ['a', 'a_balcony', 'aps', 'arch', 'b', 'back_ally', 'banana', 'bridge', 'ct_start', 'deck', 'graveyard', 'kitchen', 'library', 'lower_mid', 'mid', 'pit', 'quad', 'ruins', 'sec_mid', 'sec_mid_balcony', 't_aps', 't_ramp', 't_spawn', 'top_mid', 'under', 'upstairs',]
         
-        positions = {}
-        for node in graph['map'].x:
-            if str(node[0].tolist())[:2] not in positions:
-                positions[str(node[0].tolist())[:2]] = [node[7].tolist(), node[8].tolist()]
-            else:
-                positions[str(node[0].tolist())[:2]][0] += node[7].tolist()
-                positions[str(node[0].tolist())[:2]][1] += node[8].tolist()
-
-        flattened_positions = []
-        original_pos_names = ['a', 'a_balcony', 'aps', 'arch', 'b', 'back_ally', 'banana', 'bridge', 'ct_start', 'deck', 'graveyard', 'kitchen', 'library', 'lower_mid', 'mid', 'pit', 'quad', 'ruins', 'sec_mid', 'sec_mid_balcony', 't_aps', 't_ramp', 't_spawn', 'top_mid', 'under', 'upstairs',]
-        pos_names = []
+        # Burning and smoked node counts of the position groups, in order of appearance
+        _, num_positions, map_position_groups = self._get_position_lookup(graph)
+
+        map_x = graph['map'].x.numpy()
+        burning_nodes = np.bincount(map_position_groups, weights=map_x[:, 7].astype(np.float64), minlength=num_positions)
+        smoked_nodes = np.bincount(map_position_groups, weights=map_x[:, 8].astype(np.float64), minlength=num_positions)
 
-        pos_name_idx = 0
-        for key in positions:
+        flattened_positions = np.stack([burning_nodes, smoked_nodes], axis=1).ravel().tolist()
+
+        pos_names = []
+        for pos_name_idx in range(num_positions):
             pos_names.append(original_pos_names[pos_name_idx] + '_burning_nodes')
-            flattened_positions.append(positions[key][0])
             pos_names.append(original_pos_names[pos_name_idx] + '_smoked_nodes')
-            flattened_positions.append(positions[key][1])
-            pos_name_idx += 1
 
         return pos_names, flattened_positions
 
+    def _get_position_lookup(self, graph):
+
+        # The map nodes are the same in every graph of a map, so the lookup is built once per map
+        pos_ids = graph['map'].x[:, 0].numpy()
+        lookup_key = pos_ids.tobytes()
+
+        if lookup_key not in self._position_lookups:
+
+            # Position group code of the nodes: the first two digits of the pos_id
+            unique_pos_ids, node_pos_id_idx = np.unique(pos_ids, return_inverse=True)
+            unique_codes = np.array([str(pos_id.tolist())[:2] for pos_id in unique_pos_ids])
+            node_codes = unique_codes[node_pos_id_idx]
+
+            # Position groups in order of first appearance among the nodes
+            _, first_appearance, code_idx = np.unique(node_codes, return_index=True, return_inverse=True)
+            appearance_rank = np.argsort(np.argsort(first_appearance))
+            map_position_groups = appearance_rank[code_idx]
+
+            # Player position flag column of the nodes: the group code offset by the first code (10)
+            player_position_columns = torch.tensor(node_codes.astype(np.int64) - 10)
+
+            self._position_lookups[lookup_key] = (player_position_columns, len(first_appearance), map_position_groups)
+
+        return self._position_lookups[lookup_key]
+
     def _get_universal_data(self, graph):
 
         # Round and remaining time
@@ -228,56 +279,67 @@ class SnapshotEvents:
 
     def _shift_round_data(self, round_graphs, predictions, shift_rate, keep_universal_intact=False):
 
-        graph_infos = []
+        column_names, round_array = self._stack_round_data(round_graphs, predictions)
+
+        return self._shift_round_array(column_names, round_array, len(round_graphs) - len(predictions), shift_rate, keep_universal_intact)
+
+    def _stack_round_data(self, round_graphs, predictions):
+
+        if len(round_graphs) == 0:
+            raise ValueError('The round has no graph snapshots.')
+
         column_names = []
+        round_array = None
+
+        # One (N, F + 1) array of the round, the last column is the prediction
+        for graph_idx, graph in enumerate(round_graphs):
 
-        for graph in round_graphs:
-            
             pn, p = self._get_player_data(graph)
             mn, m = self._get_map_data(graph)
             un, u = self._get_universal_data(graph)
 
-            column_names = pn + mn + un
             graph_concat_data = np.concatenate([p, m, u])
 
-            graph_infos.append(graph_concat_data)
-
-        rdf = pd.DataFrame(graph_infos, columns=column_names)
-        filler_zeros_num = len(rdf) - len(predictions)
-        rdf['y'] = np.zeros(filler_zeros_num).tolist() + predictions
-        round_backup = rdf['round'].copy()
-        y_backup = rdf['y'].copy()
+            if round_array is None:
+                column_names = pn + mn + un + ['y']
+                round_array = np.empty((len(round_graphs), len(graph_concat_data) + 1), dtype=np.float64)
 
-        if keep_universal_intact:
-            universal_df = rdf[['round', 'remaining_time', 'bomb_dropped', 'bomb_being_planted', 'bomb_on_A', 'bomb_on_B',
-                               'ct_alive', 't_alive', 'ct_health', 't_health', 'ct_equipment', 't_equipment']].copy()
+            round_array[graph_idx, :-1] = graph_concat_data
 
-        cdf = rdf.diff().shift(-shift_rate).add_suffix('_change')
+        # The first snapshots without a prediction get zeros
+        filler_zeros_num = len(round_graphs) - len(predictions)
+        round_array[:, -1] = np.concatenate([np.zeros(filler_zeros_num), np.asarray(predictions, dtype=np.float64)])
 
-        cdf['round'] = round_backup[filler_zeros_num:-shift_rate]
+        return column_names, round_array
 
-        cdf['y'] = y_backup[filler_zeros_num:-shift_rate]
-        cdf = cdf[filler_zeros_num:-shift_rate]
+    def _shift_round_array(self, column_names, round_array, filler_zeros_num, shift_rate, keep_universal_intact=False):
 
-        if keep_universal_intact:
-            cdf = pd.concat([cdf, universal_df], axis=1)
+        if not isinstance(shift_rate, (int, np.integer)) or shift_rate < 1:
+            raise ValueError('The shift_rate should be a positive integer.')
 
-        return cdf
+        # Rows of the change frame
+        rows = np.arange(len(round_array))[filler_zeros_num:-shift_rate]
 
+        # Difference to the previous snapshot, taken shift_rate snapshots later (diff().shift(-shift_rate))
+        changes = round_array[rows + shift_rate] - round_array[rows + shift_rate - 1]
 
+        cdf = pd.DataFrame(changes, columns=[column + '_change' for column in column_names], index=rows)
+        cdf['round'] = round_array[rows, column_names.index('round')]
+        cdf['y'] = round_array[rows, -1]
 
-    def _get_round_data(self, graphs, round_number: int):
+        if keep_universal_intact:
+            rdf = pd.DataFrame(round_array, columns=column_names)
+            universal_df = rdf[['round', 'remaining_time', 'bomb_dropped', 'bomb_being_planted', 'bomb_on_A', 'bomb_on_B',
+                               'ct_alive', 't_alive', 'ct_health', 't_health', 'ct_equipment', 't_equipment']].copy()
+            cdf = pd.concat([cdf, universal_df], axis=1)
 
-        selected_round = []
+        return cdf
 
-        # Select round data
-        for graph in graphs:
 
-            graph_round = round(graph.y['round'], 2)
-            user_input_round = round(round_number/24, 2)
 
-            if np.float32(graph_round) == np.float32(user_input_round):
-                selected_round.append(graph)
+    def _get_round_data(self, graphs, round_number: int, round_index: GraphRoundIndex = None):
 
-        return selected_round
+        if round_index is None:
+            round_index = GraphRoundIndex(graphs)
 
+        return round_index.select_round(graphs, round_number)
@@ -1,4 +1,11 @@
 from .tabular_graph_snapshot import TabularGraphSnapshot
 from .hetero_graph_snapshot import HeteroGraphSnapshot
+from .map_graph import MapGraph
+from .hetero_graph_data import HeteroGraphData
+from .match_graph_store import MatchGraphStore, MatchGraphDataset
+from .hetero_graph_shard_sink import HeteroGraphShardSink
 from .temporal_hetero_graph_snapshot import TemporalHeteroGraphSnapshot
+from .graph_round_index import GraphRoundIndex
+from .temporal_window_dataset import TemporalWindowDataset
+from .temporal_graph_batch import TemporalGraphBatch
 from .hetero_graph_lime_sampler import HeteroGraphLIMESampler
\ No newline at end of file
@@ -0,0 +1,241 @@
+from torch_geometric.data import HeteroData
+from .hetero_graph_data import HeteroGraphData
+from .match_graph_store import MatchGraphDataset
+
+import numpy as np
+
+
+class GraphRoundIndex:
+    """
+    Index of the rounds of a list of graph snapshots of a match, built in a single pass over the graphs.
+    - rounds, ticks, match_ids: the round number, tick and numerical match id of each graph as numpy arrays, shape (N,).
+    - round_numbers: the round numbers in order of appearance.
+    - round_slices: round number -> slice of the contiguous graphs of the round in the graph list.
+    - segments: slices of the runs of consecutive graphs of the same match and round. Unlike round_slices, segments
+      also separate the rounds of different matches when the graphs of several matches are indexed together.
+    - round_segments: the first segment of every (match, round) pair, in order of appearance. These are the graphs the
+      temporal windows are built from, lazily (TemporalWindowDataset) and eagerly (TemporalHeteroGraphSnapshot) alike.
+      A round number reappearing later in the same match (a second run) is not windowed, consistently with round_slices.
+    - integer_rounds: the integer round number of each graph, rint(round * round_scale), exact for overtime rounds too.
+    - round_indices: integer round number -> indices of all graphs of the round, in graph order.
+    Windows of consecutive graphs can be validated at once against missing ticks with `valid_windows`. The owner of a graph
+    list indexes it once and passes the index to every round selection of the list (select_round).
+    """
+
+    # Divisor of the round number normalization of NormalizeTabularGraphSnapshot
+    ROUND_SCALE = 24
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, graphs: list[HeteroData], round_scale: float = ROUND_SCALE):
+        """
+        Parameters:
+        - graphs: the list of snapshots of a match, ordered by tick.
+        - round_scale: the round number normalization divisor, use 1 for graphs with unnormalized round numbers. Default is 24.
+        """
+
+        # Collect the round numbers and ticks in a single pass
+        rounds = np.empty(len(graphs), dtype=np.float64)
+        ticks = np.empty(len(graphs), dtype=np.float64)
+        match_ids = np.empty(len(graphs), dtype=np.float64)
+
+        for graph_idx, graph in enumerate(graphs):
+            y = graph.y
+            rounds[graph_idx] = y['round']
+            ticks[graph_idx] = y['tick']
+            match_ids[graph_idx] = y['numerical_match_id']
+
+        self._INIT_index_(rounds, ticks, match_ids, round_scale)
+
+    @classmethod
+    def from_arrays(cls, rounds, ticks, match_ids=None, round_scale: float = ROUND_SCALE):
+        """
+        Build the index from the round number and tick arrays of the graphs, without accessing the graphs.
+        Parameters:
+        - rounds: the round number of each graph.
+        - ticks: the tick of each graph.
+        - match_ids: the numerical match id of each graph. Default is None, which treats the graphs as a single match.
+        - round_scale: the round number normalization divisor, use 1 for unnormalized round numbers. Default is 24.
+        """
+
+        round_index = cls.__new__(cls)
+        round_index._INIT_index_(
+            np.asarray(rounds, dtype=np.float64),
+            np.asarray(ticks, dtype=np.float64),
+            np.zeros(len(rounds), dtype=np.float64) if match_ids is None else np.asarray(match_ids, dtype=np.float64),
+            round_scale,
+        )
+
+        return round_index
+
+    @classmethod
+    def from_windows(cls, windows, round_scale: float = ROUND_SCALE):
+        """
+        Build the index of temporal windows from the first graph of each window. The windows of a TemporalWindowDataset
+        are indexed from its round index, without materializing the windows.
+        Parameters:
+        - windows: a TemporalWindowDataset or a list of windows (lists of graphs).
+        - round_scale: the round number normalization divisor, use 1 for unnormalized round numbers. Default is 24.
+        """
+
+        # Lazy import, the window dataset module imports this module
+        from .temporal_window_dataset import TemporalWindowDataset
+
+        if isinstance(windows, TemporalWindowDataset) and windows.transform is None:
+            starts = windows.windows[:, 0]
+            graph_index = windows.round_index
+            return cls.from_arrays(graph_index.rounds[starts], graph_index.ticks[starts], graph_index.match_ids[starts], round_scale)
+
+        rounds = np.empty(len(windows), dtype=np.float64)
+        ticks = np.empty(len(windows), dtype=np.float64)
+        match_ids = np.empty(len(windows), dtype=np.float64)
+
+        for window_idx, window in enumerate(windows):
+            y = window[0].y
+            rounds[window_idx] = y['round']
+            ticks[window_idx] = y['tick']
+            match_ids[window_idx] = y['numerical_match_id']
+
+        return cls.from_arrays(rounds, ticks, match_ids, round_scale)
+
+    @classmethod
+    def from_match_graph_dataset(cls, dataset: MatchGraphDataset):
+        """
+        Build the index of a MatchGraphDataset from the memory-mapped graph-level feature blocks of its matches,
+        without materializing the graphs.
+        Parameters:
+        - dataset: the MatchGraphDataset.
+        """
+
+        columns = [HeteroGraphData.GRAPH_FEATURE_INDEX[feature] for feature in ['round', 'tick']]
+
+        rounds, ticks, match_ids = [], [], []
+        for match_idx, match in enumerate(dataset.matches):
+            graph_features = dataset.store.load_match(match['match_id'])['graph_features']
+            rounds.append(graph_features[:, columns[0]])
+            ticks.append(graph_features[:, columns[1]])
+            match_ids.append(np.full(match['num_graphs'], match_idx))
+
+        if len(rounds) == 0:
+            return cls.from_arrays([], [])
+
+        return cls.from_arrays(np.concatenate(rounds), np.concatenate(ticks), np.concatenate(match_ids))
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def round_graphs(self, graphs: list[HeteroData], round_number) -> list[HeteroData]:
+        """
+        Return the graphs of a round.
+        Parameters:
+        - graphs: the graph list the index was built from.
+        - round_number: the round number.
+        """
+
+        return graphs[self.round_slices[round_number]]
+
+    def round_graph_indices(self, round_number: int) -> np.ndarray:
+        """
+        Return the indices of all graphs of a round, in graph order. Rounds not in the index give an empty array.
+        Parameters:
+        - round_number: the integer (unnormalized) round number.
+        """
+
+        return self.round_indices.get(int(round_number), np.empty(0, dtype=np.int64))
+
+    def select_round(self, graphs, round_number: int) -> list:
+        """
+        Return all graphs (or windows) of a round as a list.
+        Parameters:
+        - graphs: the graph list (or windows) the index was built from.
+        - round_number: the integer (unnormalized) round number.
+        """
+
+        return [graphs[graph_idx] for graph_idx in self.round_graph_indices(round_number).tolist()]
+
+    def round_length(self, round_number) -> int:
+        """
+        Return the number of graphs of a round.
+        Parameters:
+        - round_number: the round number.
+        """
+
+        round_slice = self.round_slices[round_number]
+        return round_slice.stop - round_slice.start
+
+    def valid_windows(self, starts, length: int, parse_rate: int) -> np.ndarray:
+        """
+        Check whether the windows of consecutive graphs have no missing ticks, i.e. every tick of a window is exactly
+        parse_rate after the previous one. Returns a boolean array with one value per window.
+        Parameters:
+        - starts: the start indices of the windows in the graph list.
+        - length: the number of graphs in a window.
+        - parse_rate: the time between two snapshots in tick number.
+        """
+
+        starts = np.asarray(starts, dtype=np.int64)
+
+        if parse_rate not in self._gap_counts:
+            gaps = np.diff(self.ticks) != parse_rate
+            self._gap_counts[parse_rate] = np.concatenate([[0], np.cumsum(gaps)])
+
+        # A window is valid if there are no gaps between its first and last graph
+        gap_counts = self._gap_counts[parse_rate]
+        return gap_counts[starts + length - 1] - gap_counts[starts] == 0
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _INIT_index_(self, rounds: np.ndarray, ticks: np.ndarray, match_ids: np.ndarray, round_scale: float):
+
+        self.rounds = rounds
+        self.ticks = ticks
+        self.match_ids = match_ids
+        self.round_scale = round_scale
+
+        # Integer round numbers and the indices of the graphs of each round, grouped with a stable sort
+        self.integer_rounds = np.rint(rounds * round_scale).astype(np.int64)
+        order = np.argsort(self.integer_rounds, kind='stable')
+        integer_round_numbers, group_starts = np.unique(self.integer_rounds[order], return_index=True)
+        self.round_indices = {
+            int(round_number): graph_indices
+            for round_number, graph_indices in zip(integer_round_numbers.tolist(), np.split(order, group_starts[1:]))
+        }
+
+        # Start indices of the runs of equal match ids and round numbers
+        run_starts = np.flatnonzero((np.diff(rounds, prepend=np.nan) != 0) | (np.diff(match_ids, prepend=np.nan) != 0))
+        run_ends = np.append(run_starts[1:], len(rounds))
+
+        self.segments = [slice(start, end) for start, end in zip(run_starts.tolist(), run_ends.tolist())]
+
+        # A round is represented by its first run of graphs
+        self.round_numbers = []
+        self.round_slices = {}
+        for segment in self.segments:
+            round_number = float(rounds[segment.start])
+            if round_number not in self.round_slices:
+                self.round_numbers.append(round_number)
+                self.round_slices[round_number] = segment
+
+        # The round of a match is represented by its first run of graphs
+        match_rounds = set()
+        self.round_segments = []
+        for segment in self.segments:
+            match_round = (float(match_ids[segment.start]), float(rounds[segment.start]))
+            if match_round not in match_rounds:
+                match_rounds.add(match_round)
+                self.round_segments.append(segment)
+
+        # Cumulative count of tick gaps, built lazily for each parse rate
+        self._gap_counts = {}
@@ -0,0 +1,158 @@
+import torch
+from torch_geometric.data import HeteroData, Batch
+
+from collections.abc import Mapping
+
+
+class GraphFeatureView(Mapping):
+    """
+    Read-only, dict-like view over the tensorized graph-level features of a HeteroGraphData object.
+    Makes `graph.y['round']` and similar lookups work on graphs that store their graph-level features as a tensor.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, graph_features: torch.Tensor, label: torch.Tensor, batched: bool):
+
+        self._graph_features = graph_features
+        self._label = label
+        self._batched = batched
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Mapping methods
+    # --------------------------------------------------------------------------------------------
+
+    def __getitem__(self, key: str):
+
+        # The label is stored in a separate tensor
+        if key == HeteroGraphData.LABEL:
+            value = self._label
+        elif key in HeteroGraphData.GRAPH_FEATURE_INDEX:
+            value = self._graph_features[:, HeteroGraphData.GRAPH_FEATURE_INDEX[key]]
+        else:
+            raise KeyError(key)
+
+        # Batches return a (B,) tensor like the collated y dictionaries, single graphs return a scalar
+        if self._batched:
+            return value
+        return value[0].item()
+
+    def __iter__(self):
+        return iter(HeteroGraphData.GRAPH_FEATURES + [HeteroGraphData.LABEL])
+
+    def __len__(self):
+        return len(HeteroGraphData.GRAPH_FEATURES) + 1
+
+    def copy(self):
+        return {key: self[key] for key in self}
+
+    def stack(self, features: list) -> torch.Tensor:
+        """
+        Return the selected graph-level features as a (B, F) tensor with a single indexing operation.
+        Parameters:
+        - features: the graph-level features to select, in column order.
+        """
+        return self._graph_features[:, [HeteroGraphData.GRAPH_FEATURE_INDEX[feature] for feature in features]]
+
+
+
+class HeteroGraphData(HeteroData):
+    """
+    HeteroData storing the graph-level features as a single float32 tensor instead of a y dictionary of numpy scalars.
+    - graph_features: tensor of shape (1, F), batches get a (B, F) tensor. Column order is GRAPH_FEATURES.
+    - label: tensor of shape (1,) holding the CT_wins value, batches get a (B,) tensor.
+    The `y` attribute is kept as a read-only compatibility accessor, so `graph.y['round']` keeps working.
+    """
+
+    # Graph-level feature order of the graph_features tensor
+    GRAPH_FEATURES = [
+        'numerical_match_id', 'tick', 'round', 'time', 'remaining_time', 'freeze_end', 'end',
+        'CT_score', 'T_score', 'CT_alive_num', 'T_alive_num', 'CT_total_hp', 'T_total_hp',
+        'CT_equipment_value', 'T_equipment_value', 'CT_losing_streak', 'T_losing_streak',
+        'is_bomb_dropped', 'is_bomb_being_planted', 'is_bomb_being_defused', 'is_bomb_defused',
+        'is_bomb_planted_at_A_site', 'is_bomb_planted_at_B_site',
+        'bomb_X', 'bomb_Y', 'bomb_Z',
+        'bomb_mx_pos1', 'bomb_mx_pos2', 'bomb_mx_pos3', 'bomb_mx_pos4', 'bomb_mx_pos5', 'bomb_mx_pos6', 'bomb_mx_pos7', 'bomb_mx_pos8', 'bomb_mx_pos9',
+    ]
+
+    # Column index of each graph-level feature
+    GRAPH_FEATURE_INDEX = {feature: idx for idx, feature in enumerate(GRAPH_FEATURES)}
+
+    # Graph-level features used by the HeterogeneousGNN model, in the order of its flattened input
+    MODEL_GRAPH_FEATURES = [
+        'round', 'time', 'remaining_time', 'CT_alive_num', 'T_alive_num', 'CT_total_hp', 'T_total_hp',
+        'CT_equipment_value', 'T_equipment_value', 'CT_losing_streak', 'T_losing_streak',
+        'is_bomb_dropped', 'is_bomb_being_planted', 'is_bomb_being_defused', 'is_bomb_planted_at_A_site', 'is_bomb_planted_at_B_site',
+        'bomb_X', 'bomb_Y', 'bomb_Z',
+        'bomb_mx_pos1', 'bomb_mx_pos2', 'bomb_mx_pos3', 'bomb_mx_pos4', 'bomb_mx_pos5', 'bomb_mx_pos6', 'bomb_mx_pos7', 'bomb_mx_pos8', 'bomb_mx_pos9',
+    ]
+
+    # Column indices of the model graph-level features
+    MODEL_GRAPH_FEATURE_INDICES = list(map(GRAPH_FEATURE_INDEX.get, MODEL_GRAPH_FEATURES))
+
+    # Name of the label in the y compatibility accessor
+    LABEL = 'CT_wins'
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Compatibility accessor
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def y(self):
+
+        # An explicitly set y value takes precedence
+        if 'y' in self._global_store:
+            return self._global_store['y']
+
+        if 'graph_features' not in self._global_store:
+            raise AttributeError("'HeteroGraphData' object has no attribute 'y'")
+
+        return GraphFeatureView(self._global_store['graph_features'], self._global_store['label'], isinstance(self, Batch))
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Collate helpers
+    # --------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def collate_graph_features(batch, features: list = None) -> torch.Tensor:
+        """
+        Return the (B, F) graph-level feature tensor of a collated batch.
+        Batches of HeteroGraphData objects return their graph_features tensor directly, batches of legacy graphs with
+        y dictionaries are stacked column by column.
+        Parameters:
+        - batch: the collated batch (or a single graph).
+        - features: the graph-level features to select. Default is None, which selects all GRAPH_FEATURES.
+        """
+
+        if 'graph_features' in batch._global_store:
+            graph_features = batch._global_store['graph_features']
+            if features is None:
+                return graph_features
+            return graph_features[:, [HeteroGraphData.GRAPH_FEATURE_INDEX[feature] for feature in features]]
+
+        # Legacy y dictionary
+        if features is None:
+            features = HeteroGraphData.GRAPH_FEATURES
+
+        return torch.stack([torch.as_tensor(batch.y[feature], dtype=torch.float32).reshape(-1) for feature in features], dim=1)
+
+    @staticmethod
+    def collate_label(batch) -> torch.Tensor:
+        """
+        Return the (B,) label tensor of a collated batch (or a single graph).
+        Parameters:
+        - batch: the collated batch.
+        """
+
+        if 'label' in batch._global_store:
+            return batch._global_store['label']
+
+        return torch.as_tensor(batch.y[HeteroGraphData.LABEL], dtype=torch.float32).reshape(-1)
@@ -1,5 +1,6 @@
 import torch
 from torch_geometric.data import HeteroData
+from .hetero_graph_data import HeteroGraphData
 
 from matplotlib import pyplot as plt
 import matplotlib.image as mpimg
@@ -8,6 +9,8 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 
+from scipy.spatial import cKDTree
+
 import random
 import os
 
@@ -24,13 +27,31 @@ class HeteroGraphLIMESampler:
         'hltv_DPR', 'hltv_KAST', 'hltv_Impact', 'hltv_ADR', 'hltv_KPR', 'hltv_total_kills', 'hltv_HS%', 'hltv_total_deaths', 'hltv_KD_ratio', 'hltv_dmgPR', 'hltv_grenade_dmgPR', 'hltv_maps_played', 'hltv_saved_by_teammatePR', 'hltv_saved_teammatesPR', 'hltv_opening_kill_rating', 'hltv_team_W%_after_opening', 'hltv_opening_kill_in_W_rounds', 'hltv_rating_1.0_all_Career', 'hltv_clutches_1on1_ratio', 'hltv_clutches_won_1on1', 'hltv_clutches_won_1on2', 'hltv_clutches_won_1on3', 'hltv_clutches_won_1on4', 'hltv_clutches_won_1on5'
     ]
 
+    # Column name -> index of the player tensor
+    player_column_index = dict(zip(player_columns, range(len(player_columns))))
+
+    # Inventory and active weapon columns, the active weapon columns have an extra Knife column after C4
+    inventory_columns = [column for column in player_columns if column.startswith('inventory_')]
+    active_weapon_columns = [column for column in player_columns if column.startswith('active_weapon_') and column not in ['active_weapon_magazine_size', 'active_weapon_ammo', 'active_weapon_magazine_ammo_left_%', 'active_weapon_max_ammo', 'active_weapon_total_ammo_left_%']]
+
+    # Active weapons that can be scoped
+    scoped_weapon_columns = ['active_weapon_AWP', 'active_weapon_SSG 08', 'active_weapon_SG 553', 'active_weapon_G3SG1', 'active_weapon_AUG', 'active_weapon_SCAR-20']
+
+    # Map node columns of the map tensor
+    map_columns = ['posid', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning', 'is_smoked']
+
 
     # --------------------------------------------------------------------------------------------
     # REGION: Constructor
     # --------------------------------------------------------------------------------------------
 
-    def __init__(self):
-        pass
+    def __init__(self, seed: int = None):
+        """
+        Parameters:
+        - seed: the seed of the random generator of the perturbations. Default is None, which uses fresh entropy.
+        """
+
+        self.rng = np.random.default_rng(seed)
 
 
 
@@ -41,11 +62,31 @@ class HeteroGraphLIMESampler:
     # Visualize a heterogeneous graph snapshot
     def sample_snapshot(self, graph: HeteroData, sample_size: int, probability: float = 0.1, normalized: bool = True):
         """
-        Create a LIME sampling for a heterogeneous graph snapshot.
+        Create a LIME sampling for a heterogeneous graph snapshot. Returns a list of sample_size HeteroData graphs.
+        Use sample_snapshot_batch for batched model inference, without creating the graphs.
+        Parameters:
+        - graph: the HeteroData graph to sample.
+        - sample_size: the number of samples to generate.
+        - probability: the probability of perturbing a player feature group. Default is 0.1.
+        - normalized: whether the input graph is normalized. Default is True.
+        """
+
+        batch = self.sample_snapshot_batch(graph, sample_size, probability, normalized)
+
+        return self._samples_to_graphs(graph, batch)
+
+    def sample_snapshot_batch(self, graph: HeteroData, sample_size: int, probability: float = 0.1, normalized: bool = True) -> tuple:
+        """
+        Create a LIME sampling for a heterogeneous graph snapshot as a batch of tensors, in the input signature of
+        HeterogeneousGNNExport and HeteroGNNRuntime.predict:
+        - player_x: the perturbed player node features, shape (S, 10, F_player).
+        - map_x: the perturbed map node features, shape (S, map_nodes, 9).
+        - player_map_targets: the closest map node of each player, shape (S, 10).
+        - graph_features: the graph-level features with the updated player aggregates, shape (S, G), column order is HeteroGraphData.GRAPH_FEATURES.
         Parameters:
         - graph: the HeteroData graph to sample.
         - sample_size: the number of samples to generate.
-        - map: the map on which the match was held.
+        - probability: the probability of perturbing a player feature group. Default is 0.1.
         - normalized: whether the input graph is normalized. Default is True.
         """
 
@@ -56,21 +97,26 @@ class HeteroGraphLIMESampler:
 
         self.validate_inputs(graph, sample_size, normalized)
 
-        
+
         # -------------------------------------------------
         # Create the similar game-state samples
         # -------------------------------------------------
 
-        samples = []
-        for _ in range(sample_size):
-            samples.append(graph.clone())
+        player_x = np.repeat(graph['player'].x.numpy()[None].astype(np.float64), sample_size, axis=0)
+        map_x = np.repeat(graph['map'].x.numpy()[None], sample_size, axis=0)
+        graph_features = np.repeat(HeteroGraphData.collate_graph_features(graph).numpy(), sample_size, axis=0)
 
-        samples = self._update_player_tensor(samples, probability)
-        samples = self._update_player_map_edges(samples)
-        samples = self._update_map_node_burning_smoked_values(samples)
-        samples = self._update_y_values(samples)
+        player_x = self._update_player_tensor(player_x, probability)
+        player_map_targets = self._update_player_map_edges(player_x, map_x)
+        map_x = self._update_map_node_burning_smoked_values(map_x)
+        graph_features = self._update_y_values(graph_features, player_x)
 
-        return samples
+        return (
+            torch.tensor(player_x, dtype=torch.float32),
+            torch.tensor(map_x, dtype=torch.float32),
+            torch.tensor(player_map_targets, dtype=torch.long),
+            torch.tensor(graph_features, dtype=torch.float32),
+        )
 
 
 
@@ -89,6 +135,10 @@ class HeteroGraphLIMESampler:
         if not isinstance(graph, HeteroData):
             raise ValueError('Invalid graph. Must be a HeteroData object.')
 
+        # Validate the player features
+        if graph['player'].x.shape[-1] != len(self.player_columns):
+            raise ValueError(f'Invalid graph. The player nodes must have {len(self.player_columns)} features.')
+
         # Validate normalized
         if not isinstance(normalized, bool):
             raise ValueError('Invalid normalized. Must be a boolean.')
@@ -99,288 +149,247 @@ class HeteroGraphLIMESampler:
 
 
 
-    # Update the player tensor of the graph
-    def _update_player_tensor(self, samples: list, probability: float):
+    # Update the player tensor of the samples
+    def _update_player_tensor(self, player_x: np.ndarray, probability: float) -> np.ndarray:
         """
-        Update the player tensor of the graph.
+        Perturb the player tensors of the samples. Every perturbation is applied to all samples and players at once.
         Parameters:
-        - samples: the list of HeteroData samples to update.
-        - map_name: the name of the map.
-        - normalized: whether the input graph is normalized.
+        - player_x: the player tensors of the samples, shape (S, 10, F_player), updated in place.
+        - probability: the probability of perturbing a player feature group.
         """
 
-        # Update the player tensor for each sample
-        for sample in samples:
-            
-            tpldf = pd.DataFrame(sample.x_dict['player'].numpy(), columns=self.player_columns)
-
-            # ----------- Player coordinates ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['X'] = np.where(random_filter, 
-                                    tpldf['X'] + np.random.normal(0, 0.006, tpldf.shape[0]), 
-                                    tpldf['X'])
-            tpldf['Y'] = np.where(random_filter, 
-                                    tpldf['Y'] + np.random.normal(0, 0.006, tpldf.shape[0]), 
-                                    tpldf['Y'])
-
-
+        rng = self.rng
+        sample_size = player_x.shape[0]
+        columns = self.player_column_index
 
-            # ----------- Player view directions ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['pitch'] = np.where(random_filter, 
-                                        (tpldf['pitch'] + np.random.normal(0, 0.2, tpldf.shape[0])).clip(0, 1), 
-                                        tpldf['pitch'])
-            tpldf['yaw'] = np.where(random_filter, 
-                                        (tpldf['yaw'] + np.random.normal(0, 0.2, tpldf.shape[0])).clip(0, 1), 
-                                        tpldf['yaw'])
+        # Rows are the players of all samples
+        players = player_x.reshape(-1, player_x.shape[-1])
+        n = players.shape[0]
 
+        def column(name):
+            return players[:, columns[name]]
 
+        def set_column(name, values):
+            players[:, columns[name]] = values
 
-            # ----------- Player velocities ------------
-            def adjust_velocity(velocity, random_filter):
-                new_velocity = np.random.normal(velocity, velocity / 1.2)
-                return np.where(random_filter, 
-                                np.clip(new_velocity, 0, velocity),
-                                velocity)
+        def flip(name, random_filter):
+            set_column(name, np.where(random_filter, 1 - column(name), column(name)))
 
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
 
-            tpldf['velocity_X'] = adjust_velocity(tpldf['velocity_X'], random_filter)
-            tpldf['velocity_Y'] = adjust_velocity(tpldf['velocity_Y'], random_filter)
 
+        # ----------- Player coordinates ------------
+        random_filter = rng.random(n) < probability
+        set_column('X', np.where(random_filter, column('X') + rng.normal(0, 0.006, n), column('X')))
+        set_column('Y', np.where(random_filter, column('Y') + rng.normal(0, 0.006, n), column('Y')))
 
 
-            # ----------- Player health ------------
-            tpldf['health'] = np.where(random_filter, 
-                                        (tpldf['health'] + np.random.normal(0, 0.07, tpldf.shape[0])).clip(0, 1).round(2),
-                                        tpldf['health'])
 
-            tpldf.loc[(tpldf['health'] == 0) & (tpldf['is_alive'] == 1), 'is_alive'] = 0
+        # ----------- Player view directions ------------
+        random_filter = rng.random(n) < probability
+        set_column('pitch', np.where(random_filter, (column('pitch') + rng.normal(0, 0.2, n)).clip(0, 1), column('pitch')))
+        set_column('yaw', np.where(random_filter, (column('yaw') + rng.normal(0, 0.2, n)).clip(0, 1), column('yaw')))
 
-            # ----------- Player armor ------------
-            tpldf['armor_value'] = np.where(random_filter, 
-                                        (tpldf['armor_value'] + np.random.normal(0, 0.07, tpldf.shape[0])).clip(0, 1).round(2),
-                                        tpldf['armor_value'])
 
 
+        # ----------- Player velocities ------------
+        random_filter = rng.random(n) < probability
 
-            # ----------- Player is flashed ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['flash_duration'] = np.where(random_filter,
-                                            (tpldf['flash_duration'] + np.random.normal(0, 0.5, tpldf.shape[0])).clip(0, 1).round(4),
-                                            tpldf['flash_duration'])
+        for name in ['velocity_X', 'velocity_Y']:
+            velocity = column(name)
+            new_velocity = velocity + np.abs(velocity / 1.2) * rng.standard_normal(n)
+            set_column(name, np.where(random_filter, np.clip(new_velocity, 0, velocity), velocity))
 
 
 
-            # ----------- Player active weapon magazine ammo left % ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            ammo_filter = (tpldf['active_weapon_Knife'] == 0) & (tpldf['active_weapon_C4'] == 0) & (tpldf['active_weapon_Taser'] == 0)
+        # ----------- Player health ------------
+        set_column('health', np.where(random_filter, (column('health') + rng.normal(0, 0.07, n)).clip(0, 1).round(2), column('health')))
+        set_column('is_alive', np.where((column('health') == 0) & (column('is_alive') == 1), 0, column('is_alive')))
 
-            tpldf['active_weapon_magazine_ammo_left_%'] = np.where(ammo_filter & random_filter, 
-                                            (tpldf['active_weapon_magazine_ammo_left_%'] + np.random.normal(0, 0.1, tpldf.shape[0])).clip(0, 1), 
-                                            tpldf['active_weapon_magazine_ammo_left_%'])
+        # ----------- Player armor ------------
+        set_column('armor_value', np.where(random_filter, (column('armor_value') + rng.normal(0, 0.07, n)).clip(0, 1).round(2), column('armor_value')))
 
 
 
-            # ----------- Player is shooting ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['is_shooting'] = np.where(random_filter,
-                                                1 - tpldf['is_shooting'],  # Flipping the value
-                                                tpldf['is_shooting'])
+        # ----------- Player is flashed ------------
+        random_filter = rng.random(n) < probability
+        set_column('flash_duration', np.where(random_filter, (column('flash_duration') + rng.normal(0, 0.5, n)).clip(0, 1).round(4), column('flash_duration')))
 
-            ammo_filter_shooting = (tpldf['is_shooting'] == 1) & (tpldf['active_weapon_magazine_ammo_left_%'] == 1)
-            tpldf['active_weapon_magazine_ammo_left_%'] = np.where(ammo_filter_shooting,
-                                                                    np.clip(tpldf['active_weapon_magazine_ammo_left_%'] - np.random.uniform(0.02, 0.12, tpldf.shape[0]), 0, 1),
-                                                                    tpldf['active_weapon_magazine_ammo_left_%'])
 
 
+        # ----------- Player active weapon magazine ammo left % ------------
+        random_filter = rng.random(n) < probability
+        ammo_filter = (column('active_weapon_Knife') == 0) & (column('active_weapon_C4') == 0) & (column('active_weapon_Taser') == 0)
 
-            # ----------- Player is spotted ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['is_spotted'] = np.where(random_filter,
-                                            1 - tpldf['is_spotted'],  # Flipping the value
-                                            tpldf['is_spotted'])
+        ammo = column('active_weapon_magazine_ammo_left_%')
+        set_column('active_weapon_magazine_ammo_left_%', np.where(ammo_filter & random_filter, (ammo + rng.normal(0, 0.1, n)).clip(0, 1), ammo))
 
 
 
-            # ----------- Player is walking ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['is_walking'] = np.where(random_filter,
-                                            1 - tpldf['is_walking'],  # Flipping the value
-                                            tpldf['is_walking'])
+        # ----------- Player is shooting ------------
+        flip('is_shooting', rng.random(n) < probability)
 
+        ammo = column('active_weapon_magazine_ammo_left_%')
+        ammo_filter_shooting = (column('is_shooting') == 1) & (ammo == 1)
+        set_column('active_weapon_magazine_ammo_left_%', np.where(ammo_filter_shooting, np.clip(ammo - rng.uniform(0.02, 0.12, n), 0, 1), ammo))
 
 
-            # ----------- Player is reloading ------------
-            reloading_filter = np.random.rand(tpldf.shape[0]) < probability
-            tpldf['is_reloading'] = np.where(reloading_filter,
-                                                1 - tpldf['is_reloading'],  # Flipping the value
-                                                tpldf['is_reloading'])
 
-            tpldf['is_shooting'] = np.where(tpldf['is_reloading'] == 1, 0, tpldf['is_shooting'])
+        # ----------- Player is spotted, walking, reloading ------------
+        flip('is_spotted', rng.random(n) < probability)
+        flip('is_walking', rng.random(n) < probability)
+        flip('is_reloading', rng.random(n) < probability)
 
+        set_column('is_shooting', np.where(column('is_reloading') == 1, 0, column('is_shooting')))
 
 
-            # ----------- Player is scoped ------------
-            random_filter = np.random.rand(tpldf.shape[0]) < probability
-            weapon_columns = ['active_weapon_AWP', 'active_weapon_SSG 08', 'active_weapon_SG 553', 
-                            'active_weapon_G3SG1', 'active_weapon_AUG', 'active_weapon_SCAR-20']
 
-            tpldf['is_scoped'] = np.where(tpldf[weapon_columns].sum(axis=1) > 0,  # Check if any of the weapons are active
-                                            np.where(random_filter, 1 - tpldf['is_scoped'], tpldf['is_scoped']),
-                                            0)
+        # ----------- Player is scoped ------------
+        random_filter = rng.random(n) < probability
+        scoped_weapon = players[:, [columns[name] for name in self.scoped_weapon_columns]].sum(axis=1) > 0
 
-            tpldf['zoom_lvl'] = np.where(tpldf['is_scoped'] == 1, 1, tpldf['zoom_lvl'])
-            tpldf['zoom_lvl'] = np.where(tpldf['is_scoped'] == 0, 0, tpldf['zoom_lvl'])
+        set_column('is_scoped', np.where(scoped_weapon, np.where(random_filter, 1 - column('is_scoped'), column('is_scoped')), 0))
 
+        set_column('zoom_lvl', np.where(column('is_scoped') == 1, 1, column('zoom_lvl')))
+        set_column('zoom_lvl', np.where(column('is_scoped') == 0, 0, column('zoom_lvl')))
 
-            # ----------- Player is defusing ------------
-            tpldf['is_defusing'] = np.where(tpldf['is_defusing'] == 1,
-                                                np.where(np.random.rand(tpldf.shape[0]) < 0.2, 0, 1),
-                                                tpldf['is_defusing'])
 
 
+        # ----------- Player is defusing ------------
+        set_column('is_defusing', np.where(column('is_defusing') == 1, np.where(rng.random(n) < 0.2, 0, 1), column('is_defusing')))
 
-            # ----------- Player has C4 ------------
-            tpldf['inventory_C4'] = np.where(tpldf['inventory_C4'] == 1,
-                                                    np.where(np.random.rand(tpldf.shape[0]) < probability, 0, 1),
-                                                    tpldf['inventory_C4'])
 
 
+        # ----------- Player has C4 ------------
+        set_column('inventory_C4', np.where(column('inventory_C4') == 1, np.where(rng.random(n) < probability, 0, 1), column('inventory_C4')))
 
-            # ----------- Switch active weapon ------------
-            inventory_columns = ['inventory_C4', 'inventory_Taser', 'inventory_USP-S', 'inventory_P2000', 'inventory_Glock-18', 'inventory_Dual Berettas', 'inventory_P250', 'inventory_Tec-9', 'inventory_CZ75 Auto', 'inventory_Five-SeveN', 'inventory_Desert Eagle', 'inventory_R8 Revolver', 'inventory_MAC-10', 'inventory_MP9', 'inventory_MP7', 'inventory_MP5-SD', 'inventory_UMP-45', 'inventory_PP-Bizon', 'inventory_P90', 'inventory_Nova', 'inventory_XM1014', 'inventory_Sawed-Off', 'inventory_MAG-7', 'inventory_M249', 'inventory_Negev', 'inventory_FAMAS', 'inventory_Galil AR', 'inventory_AK-47', 'inventory_M4A4', 'inventory_M4A1-S', 'inventory_SG 553', 'inventory_AUG', 'inventory_SSG 08', 'inventory_AWP', 'inventory_G3SG1', 'inventory_SCAR-20', 'inventory_HE Grenade', 'inventory_Flashbang', 'inventory_Smoke Grenade', 'inventory_Incendiary Grenade', 'inventory_Molotov', 'inventory_Decoy Grenade']
-            active_weapon_columns = ['active_weapon_C4', 'active_weapon_Knife', 'active_weapon_Taser', 'active_weapon_USP-S', 'active_weapon_P2000', 'active_weapon_Glock-18', 'active_weapon_Dual Berettas', 'active_weapon_P250', 'active_weapon_Tec-9', 'active_weapon_CZ75 Auto', 'active_weapon_Five-SeveN', 'active_weapon_Desert Eagle', 'active_weapon_R8 Revolver', 'active_weapon_MAC-10', 'active_weapon_MP9', 'active_weapon_MP7', 'active_weapon_MP5-SD', 'active_weapon_UMP-45', 'active_weapon_PP-Bizon', 'active_weapon_P90', 'active_weapon_Nova', 'active_weapon_XM1014', 'active_weapon_Sawed-Off', 'active_weapon_MAG-7', 'active_weapon_M249', 'active_weapon_Negev', 'active_weapon_FAMAS', 'active_weapon_Galil AR', 'active_weapon_AK-47', 'active_weapon_M4A4', 'active_weapon_M4A1-S', 'active_weapon_SG 553', 'active_weapon_AUG', 'active_weapon_SSG 08', 'active_weapon_AWP', 'active_weapon_G3SG1', 'active_weapon_SCAR-20', 'active_weapon_HE Grenade', 'active_weapon_Flashbang', 'active_weapon_Smoke Grenade', 'active_weapon_Incendiary Grenade', 'active_weapon_Molotov', 'active_weapon_Decoy Grenade']
 
-            def get_inventory_weapons(row):
-                return [col for col in inventory_columns if row[col] == 1]
 
-            def get_active_weapon(row):
-                return [col for col in active_weapon_columns if row[col] == 1]
+        # ----------- Switch active weapon ------------
+        inventory_idx = [columns[name] for name in self.inventory_columns]
+        active_weapon_idx = [columns[name] for name in self.active_weapon_columns]
 
-            def switch_weapon(row):
+        inventory = players[:, inventory_idx] == 1
+        active_weapon = players[:, active_weapon_idx] == 1
 
-                inventory_weapons = get_inventory_weapons(row)
-                active_weapon = get_active_weapon(row)
+        # Players with an active weapon and a non-empty inventory switch with a probability of 0.5
+        switch = inventory.any(axis=1) & active_weapon.any(axis=1) & (rng.random(n) >= 0.5)
 
-                if len(inventory_weapons) == 0:
-                    return row
+        # Uniform choice among the inventory weapons: the largest random key of the inventory mask
+        keys = np.where(inventory[switch], rng.random((switch.sum(), len(inventory_idx))), -1)
+        new_weapon = keys.argmax(axis=1)
 
-                if len(active_weapon) == 0:
-                    return row
-                if len(active_weapon) == 1:
-                    active_weapon = active_weapon[0]
+        # Inventory column -> active weapon column, skipping the Knife
+        new_active_weapon = np.where(new_weapon == 0, 0, new_weapon + 1)
 
-                # Random roll
-                if np.random.rand() < 0.5:
-                    return row
+        switched_players = players[switch]
+        switched_players[:, active_weapon_idx] = 0
+        switched_players[np.arange(len(switched_players)), np.array(active_weapon_idx)[new_active_weapon]] = 1
+        players[switch] = switched_players
 
-                else:
-                    new_active_weapon = random.choice(inventory_weapons)
-                    row[active_weapon] = 0
-                    row[new_active_weapon] = 1
-
-                    return row
-                
-            tpldf = tpldf.apply(switch_weapon, axis=1)
-
-
-            sample['player'].x = torch.tensor(tpldf.values, dtype=torch.float32)
-
-        return samples
+        return players.reshape(sample_size, 10, -1)
     
 
 
-    # Update the player-map edges of the graph
-    def _update_player_map_edges(self, samples: list):
+    # Update the player-map edges of the samples
+    def _update_player_map_edges(self, player_x: np.ndarray, map_x: np.ndarray) -> np.ndarray:
         """
-        Update the player-map edges of the graph.
+        Return the closest map node of each player of the samples, shape (S, 10).
         Parameters:
-        - samples: the list of HeteroData samples to update.
-        - map_name: the name of the map.
-        - normalized: whether the input graph is normalized.
+        - player_x: the player tensors of the samples, shape (S, 10, F_player).
+        - map_x: the map tensors of the samples, shape (S, map_nodes, 9). The map node coordinates are the same in every sample.
         """
 
-        # Update the player-map edges for each sample
-        for sample in samples:
-            
-            player_closest_to_map = []
-
-            for i in range(10):
-                # Get the map node with the closest coordinates to the i-th player
-                player_coords = sample.x_dict['player'][i, 0:3].numpy()
-                map_coords = sample.x_dict['map'][:, 1:4].numpy()
-                distances = np.linalg.norm(map_coords - player_coords, axis=1)
-                closest_node = np.argmin(distances)
-                player_closest_to_map.append(closest_node)
+        # The map node coordinates are taken once, the perturbations do not move the nodes
+        map_coords = map_x[0, :, 1:4].astype(np.float64)
+        player_coords = player_x[..., 0:3].reshape(-1, 3)
 
-            del sample['player', 'closest_to', 'map']
-            sample['player', 'closest_to', 'map'].edge_index = torch.tensor([list(range(10)), player_closest_to_map], dtype=torch.int16)
+        # Nearest map node of all players of all samples in one KD-tree query
+        _, player_closest_to_map = cKDTree(map_coords).query(player_coords)
 
-        return samples
+        return player_closest_to_map.reshape(player_x.shape[:2])
     
 
 
     # Update map node burning and smoked values
-    def _update_map_node_burning_smoked_values(self, samples: list):
+    def _update_map_node_burning_smoked_values(self, map_x: np.ndarray) -> np.ndarray:
         """
-        Update the map node burning and smoked values of the graph.
+        Update the map node burning and smoked values of the samples.
         Parameters:
-        - samples: the list of HeteroData samples to update.
+        - map_x: the map tensors of the samples, shape (S, map_nodes, 9), updated in place.
         """
 
-        # Update the map node burning and smoked values for each sample
-        for sample in samples:
-            
-            mdf = pd.DataFrame(sample['map'].x, columns = ['posid', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning', 'is_smoked'])
-
-            # ---------- Map molotovs ------------
-            random_filter = np.random.rand(mdf.shape[0]) < 0.25
-            burning_filter = (mdf['is_burning'] == 1)
-
-            mdf['is_burning'] = np.where(random_filter & burning_filter,
-                                            1 - mdf['is_burning'],  # Flipping the value
-                                            mdf['is_burning'])
+        burning = self.map_columns.index('is_burning')
+        smoked = self.map_columns.index('is_smoked')
 
-            # ---------- Map smokes ------------
-            random_filter = np.random.rand(mdf.shape[0]) < 0.25
-            smoked_filter = (mdf['is_smoked'] == 1)
+        # ---------- Map molotovs ------------
+        random_filter = self.rng.random(map_x.shape[:2]) < 0.25
+        map_x[..., burning] = np.where(random_filter & (map_x[..., burning] == 1), 1 - map_x[..., burning], map_x[..., burning])
 
-            mdf['is_smoked'] = np.where(random_filter & smoked_filter,
-                                            1 - mdf['is_smoked'],  # Flipping the value
-                                            mdf['is_smoked'])
+        # ---------- Map smokes ------------
+        random_filter = self.rng.random(map_x.shape[:2]) < 0.25
+        map_x[..., smoked] = np.where(random_filter & (map_x[..., smoked] == 1), 1 - map_x[..., smoked], map_x[..., smoked])
 
-            sample['map'].x = torch.tensor(mdf.values, dtype=torch.float32)
-
-        return samples
+        return map_x
     
 
 
-    # Update the y values of the graph
+    # Update the y values of the samples
     def _update_y_values(
             self, 
-            samples: list,
+            graph_features: np.ndarray,
+            player_x: np.ndarray,
             scaling_dict_current_player_equip_value_max: int = 8450, 
             scaling_dict_CT_equip_value_max: int = 35100,
             scaling_dict_T_equip_value_max: int = 31600,):
         """
-        Update the y values of the graph.
+        Update the player aggregate graph-level features of the samples.
         Parameters:
-        - samples: the list of HeteroData samples to update.
+        - graph_features: the graph-level features of the samples, shape (S, G), updated in place.
+        - player_x: the perturbed player tensors of the samples, shape (S, 10, F_player).
         """
 
-        # Update the y values for each sample
-        for sample in samples:
+        columns = self.player_column_index
+        index = HeteroGraphData.GRAPH_FEATURE_INDEX
+
+        ct_players = player_x[:, 0:5]
+        t_players = player_x[:, 5:10]
 
-            tpldf = pd.DataFrame(sample.x_dict['player'].numpy(), columns=self.player_columns)
-            
-            sample.y['CT_alive_num'] = tpldf.iloc[0:5]['is_alive'].sum()
-            sample.y['T_alive_num'] = tpldf.iloc[5:10]['is_alive'].sum()
+        graph_features[:, index['CT_alive_num']] = ct_players[..., columns['is_alive']].sum(axis=1)
+        graph_features[:, index['T_alive_num']] = t_players[..., columns['is_alive']].sum(axis=1)
+
+        graph_features[:, index['CT_total_hp']] = ct_players[..., columns['health']].sum(axis=1)
+        graph_features[:, index['T_total_hp']] = t_players[..., columns['health']].sum(axis=1)
+
+        graph_features[:, index['CT_equipment_value']] = np.round((ct_players[..., columns['current_equip_value']] * scaling_dict_current_player_equip_value_max).sum(axis=1)) / scaling_dict_CT_equip_value_max
+        graph_features[:, index['T_equipment_value']] = np.round((t_players[..., columns['current_equip_value']] * scaling_dict_current_player_equip_value_max).sum(axis=1)) / scaling_dict_T_equip_value_max
+
+        return graph_features
+
+
+
+    # Create the sample graphs from the sample tensors
+    def _samples_to_graphs(self, graph: HeteroData, batch: tuple) -> list:
+
+        player_x, map_x, player_map_targets, graph_features = batch
+
+        samples = []
+        for sample_idx in range(len(player_x)):
+
+            sample = graph.clone()
+
+            sample['player'].x = player_x[sample_idx].clone()
+            sample['map'].x = map_x[sample_idx].clone()
+
+            del sample['player', 'closest_to', 'map']
+            sample['player', 'closest_to', 'map'].edge_index = torch.stack([torch.arange(10), player_map_targets[sample_idx]]).to(torch.int16)
 
-            sample.y['CT_total_hp'] = tpldf.iloc[0:5]['health'].sum()
-            sample.y['T_total_hp'] = tpldf.iloc[5:10]['health'].sum()
+            # Graph-level features
+            if isinstance(sample, HeteroGraphData):
+                sample.graph_features = graph_features[sample_idx:sample_idx + 1].clone()
+            else:
+                for feature in ['CT_alive_num', 'T_alive_num', 'CT_total_hp', 'T_total_hp', 'CT_equipment_value', 'T_equipment_value']:
+                    sample.y[feature] = graph_features[sample_idx, HeteroGraphData.GRAPH_FEATURE_INDEX[feature]].item()
 
-            sample.y['CT_equipment_value'] = round(sum(tpldf.iloc[0:5]['current_equip_value'] * scaling_dict_current_player_equip_value_max)) / scaling_dict_CT_equip_value_max
-            sample.y['T_equipment_value'] = round(sum(tpldf.iloc[5:10]['current_equip_value'] * scaling_dict_current_player_equip_value_max)) / scaling_dict_T_equip_value_max
+            samples.append(sample)
 
         return samples
@@ -0,0 +1,125 @@
+import torch
+from torch_geometric.data import HeteroData
+
+import json
+import os
+
+
+class HeteroGraphShardSink:
+    """
+    Sink writing a stream of graph snapshots (e.g. the output of HeteroGraphSnapshot.iter_snapshots) to disk in shards of
+    a fixed number of graphs, together with an index file. Only one shard is kept in memory at a time.
+    """
+
+    # Index file name
+    INDEX_FILE = 'index.json'
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, path: str, shard_size: int = 1000):
+        """
+        Parameters:
+        - path: the directory to write the shards to. Created if it does not exist.
+        - shard_size: the number of graphs in a shard. Default is 1000.
+        """
+
+        if not isinstance(shard_size, int) or shard_size < 1:
+            raise ValueError('The shard_size should be a positive integer.')
+
+        self.path = path
+        self.shard_size = shard_size
+
+        os.makedirs(self.path, exist_ok=True)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def write(self, graphs, prefix: str = 'shard') -> dict:
+        """
+        Consume an iterable of graphs (or of graph batches) and write them to shards. Returns the updated index.
+        Parameters:
+        - graphs: iterable of HeteroData objects, or of lists of HeteroData objects.
+        - prefix: the file name prefix of the shards, e.g. the match id. Default is 'shard'.
+        """
+
+        index = self.read_index()
+
+        # Do not mix the shards of different writes
+        if any(shard['prefix'] == prefix for shard in index['shards']):
+            raise ValueError(f'Shards with prefix "{prefix}" are already present in {self.path}.')
+
+        shard = []
+        for item in graphs:
+
+            # Batches are flattened into the actual shard
+            for graph in (item if isinstance(item, list) else [item]):
+                shard.append(graph)
+
+                if len(shard) == self.shard_size:
+                    self._WRITE_shard_(shard, prefix, index)
+                    shard = []
+
+        # Write the last smaller shard if it exists
+        if shard:
+            self._WRITE_shard_(shard, prefix, index)
+
+        return index
+
+    def read_index(self) -> dict:
+        """
+        Read the index file, listing the shards and their number of graphs.
+        """
+
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {'num_graphs': 0, 'shards': []}
+
+        with open(index_path, 'r') as index_file:
+            return json.load(index_file)
+
+    def load_shard(self, shard_idx: int) -> list[HeteroData]:
+        """
+        Load a single shard.
+        Parameters:
+        - shard_idx: the position of the shard in the index.
+        """
+
+        shard = self.read_index()['shards'][shard_idx]
+        return torch.load(os.path.join(self.path, shard['file']), weights_only=False)
+
+    def iter_graphs(self):
+        """
+        Iterate over the graphs of every shard, loading one shard at a time.
+        """
+
+        for shard_idx in range(len(self.read_index()['shards'])):
+            for graph in self.load_shard(shard_idx):
+                yield graph
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _WRITE_shard_(self, shard: list, prefix: str, index: dict):
+
+        # Write the shard
+        shard_file = f"{prefix}_{sum(1 for s in index['shards'] if s['prefix'] == prefix):05d}.pt"
+        torch.save(shard, os.path.join(self.path, shard_file))
+
+        # Update the index after every shard, so the index always describes the shards on disk
+        index['shards'].append({'file': shard_file, 'prefix': prefix, 'offset': index['num_graphs'], 'num_graphs': len(shard)})
+        index['num_graphs'] += len(shard)
+
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file, indent=4)
+        os.replace(index_path + '.tmp', index_path)
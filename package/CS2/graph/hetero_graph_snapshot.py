@@ -1,12 +1,19 @@
 import torch
 from torch_geometric.data import HeteroData
+from .hetero_graph_data import HeteroGraphData
+from .map_graph import MapGraph
 
 import pandas as pd
 import numpy as np
 
+import multiprocessing
 import random
 
 
+# Read-only state shared with the graph building worker processes (see HeteroGraphSnapshot._PARALLEL_process_snapshots_)
+_WORKER_STATE = {}
+
+
 class HeteroGraphSnapshot:
 
     # Molotov and incendiary grenade radius values
@@ -44,7 +51,10 @@ class HeteroGraphSnapshot:
         CONFIG_MOLOTOV_RADIUS: dict,
         CONFIG_SMOKE_RADIUS: dict,
         player_edges_num: int = 1,
-        player_self_edges: bool = True
+        player_self_edges: bool = True,
+        graph_features_as_tensor: bool = False,
+        workers: int = 1,
+        map_graph: MapGraph = None
     ):
         """
         Create graphs from the rows of a tabular snapshot dataframe.
@@ -59,20 +69,116 @@ class HeteroGraphSnapshot:
         - CONFIG_MOLOTOV_RADIUS: the molotov and incendiary grenade radius values.
         - CONFIG_SMOKE_RADIUS: the smoke grenade radius values.
         - player_edges_num: the number of closest nodes the player should be connected to in the graph. Default is 1.
+        - player_self_edges: whether to add the player self edges to the graph. Default is True.
+        - graph_features_as_tensor: whether to store the graph-level features as a single float32 tensor (HeteroGraphData.graph_features, \
+          column order is HeteroGraphData.GRAPH_FEATURES) and the label as a separate tensor instead of the y dictionary. Default is False.
+        - workers: the number of worker processes. If greater than 1, the rounds are built in parallel in a process pool, \
+          the output order is the same as with a single worker. Default is 1.
+        - map_graph: a precomputed MapGraph artifact of the map. If set, the nodes and edges dataframes are not used and can be None. Default is None.
         """
 
-
+        # Check the number of workers
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError("The workers should be a positive integer.")
+
+        # Build the rounds in parallel
+        if workers > 1:
+            self._PREP_validate_inputs_(df, nodes, edges_pos_id, CONFIG_MOLOTOV_RADIUS, player_edges_num, map_graph)
+            self._PREP_set_molotov_radius_(CONFIG_MOLOTOV_RADIUS)
+            self._PREP_set_smoke_radius_(CONFIG_SMOKE_RADIUS)
+            nodes, edges = self._PREP_map_graph_(nodes, edges_pos_id, map_graph)
+
+            return self._PARALLEL_process_snapshots_(df, nodes, edges, active_infernos, active_smokes, active_he_explosions, player_self_edges, graph_features_as_tensor, workers)
+
+        return list(self.iter_snapshots(
+            df, 
+            nodes, 
+            edges_pos_id, 
+            active_infernos, 
+            active_smokes, 
+            active_he_explosions, 
+            CONFIG_MOLOTOV_RADIUS, 
+            CONFIG_SMOKE_RADIUS, 
+            player_edges_num=player_edges_num, 
+            player_self_edges=player_self_edges, 
+            graph_features_as_tensor=graph_features_as_tensor,
+            map_graph=map_graph
+        ))
+
+    def iter_snapshots(
+        self, 
+        df: pd.DataFrame, 
+        nodes: pd.DataFrame, 
+        edges_pos_id: pd.DataFrame, 
+        active_infernos: pd.DataFrame,
+        active_smokes: pd.DataFrame,
+        active_he_explosions: pd.DataFrame,
+        CONFIG_MOLOTOV_RADIUS: dict,
+        CONFIG_SMOKE_RADIUS: dict,
+        player_edges_num: int = 1,
+        player_self_edges: bool = True,
+        graph_features_as_tensor: bool = False,
+        batch_size: int = None,
+        map_graph: MapGraph = None
+    ):
+        """
+        Create graphs from the rows of a tabular snapshot dataframe, yielding each graph as soon as it is built.
+        The inputs are validated when the method is called, the graphs are built lazily while the returned generator is consumed.
+        
+        Parameters:
+        - df: the snapshot dataframe.
+        - nodes: the map graph nodes dataframe.
+        - edges: the map graph edges dataframe.
+        - active_infernos: the active infernos dataframe.
+        - active_smokes: the active smokes dataframe.
+        - actigve_he_explosions: the active HE grenade explosions dataframe.
+        - CONFIG_MOLOTOV_RADIUS: the molotov and incendiary grenade radius values.
+        - CONFIG_SMOKE_RADIUS: the smoke grenade radius values.
+        - player_edges_num: the number of closest nodes the player should be connected to in the graph. Default is 1.
+        - player_self_edges: whether to add the player self edges to the graph. Default is True.
+        - graph_features_as_tensor: whether to store the graph-level features as a single float32 tensor. Default is False.
+        - batch_size: if set, lists of (at most) batch_size graphs are yielded instead of single graphs. Default is None.
+        - map_graph: a precomputed MapGraph artifact of the map. If set, the nodes and edges dataframes are not used and can be None. Default is None.
+        """
 
         # ---- 0. Validation, create needed variables ------
 
         # Validate the input paramters and create the accurate edges dataframe
-        self._PREP_validate_inputs_(df, nodes, edges_pos_id, CONFIG_MOLOTOV_RADIUS, player_edges_num)
+        self._PREP_validate_inputs_(df, nodes, edges_pos_id, CONFIG_MOLOTOV_RADIUS, player_edges_num, map_graph)
         self._PREP_set_molotov_radius_(CONFIG_MOLOTOV_RADIUS)
         self._PREP_set_smoke_radius_(CONFIG_SMOKE_RADIUS)
-        edges = self._PREP_create_edges_(nodes, edges_pos_id)
+        nodes, edges = self._PREP_map_graph_(nodes, edges_pos_id, map_graph)
+
+        # Check the batch size
+        if batch_size is not None and (not isinstance(batch_size, int) or batch_size < 1):
+            raise ValueError("The batch_size should be a positive integer.")
+
+        # Create the graph generator
+        graphs = self._BUILD_snapshots_(df, nodes, edges, active_infernos, active_smokes, active_he_explosions, player_self_edges, graph_features_as_tensor)
+
+        if batch_size is None:
+            return graphs
+        
+        return self._BUILD_batches_(graphs, batch_size)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Graph building
+    # --------------------------------------------------------------------------------------------
 
-        # Create a list to store the heterogeneous graph snapshots
-        heterograph_snapshot_list = []
+    # Build the graphs from the rows of the snapshot dataframe
+    def _BUILD_snapshots_(
+        self, 
+        df: pd.DataFrame, 
+        nodes: pd.DataFrame, 
+        edges: pd.DataFrame, 
+        active_infernos: pd.DataFrame, 
+        active_smokes: pd.DataFrame, 
+        active_he_explosions: pd.DataFrame, 
+        player_self_edges: bool, 
+        graph_features_as_tensor: bool
+    ):
 
         # Store the actual round number and the last round number the 'bomb near' value was calculated for
         actual_round_num = 0
@@ -139,7 +245,7 @@ class HeteroGraphSnapshot:
             # ------- 3. Create the heterodata object ----------
 
             # Create a HeteroData object
-            data = HeteroData()
+            data = HeteroGraphData() if graph_features_as_tensor else HeteroData()
 
             # Create node data
             data['player'].x = torch.tensor(player_tensor, dtype=torch.float32)
@@ -152,60 +258,133 @@ class HeteroGraphSnapshot:
                 data['player', 'is', 'player'].edge_index = torch.torch.tensor([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]], dtype=torch.int16)
 
 
+            # Define the graph-level features as tensors
+            if graph_features_as_tensor:
+                data.graph_features = torch.tensor(self._GRAPH_features_array_(row), dtype=torch.float32).view(1, -1)
+                data.label = torch.tensor([row['UNIVERSAL_CT_wins']], dtype=torch.float32)
+
             # Define the graph-level features
-            data.y = {
-                'numerical_match_id': row['NUMERICAL_MATCH_ID'].astype('float32'),
-                'tick': row['UNIVERSAL_tick'].astype('float32'),
-                'round': row['UNIVERSAL_round'].astype('float32'),
-                'time': row['UNIVERSAL_time'].astype('float32'),
-                'remaining_time': row['UNIVERSAL_remaining_time'].astype('float32'),
-                'freeze_end': row['UNIVERSAL_freeze_end'].astype('float32'),
-                'end': row['UNIVERSAL_end'].astype('float32'),
-                'CT_score': row['UNIVERSAL_CT_score'].astype('float32'),
-                'T_score': row['UNIVERSAL_T_score'].astype('float32'),
-                'CT_alive_num': row['UNIVERSAL_CT_alive_num'].astype('float32'),
-                'T_alive_num': row['UNIVERSAL_T_alive_num'].astype('float32'),
-                'CT_total_hp': row['UNIVERSAL_CT_total_hp'].astype('float32'),
-                'T_total_hp': row['UNIVERSAL_T_total_hp'].astype('float32'),
-                'CT_equipment_value': row['UNIVERSAL_CT_equipment_value'].astype('float32'),
-                'T_equipment_value': row['UNIVERSAL_T_equipment_value'].astype('float32'),
-                'CT_losing_streak': row['UNIVERSAL_CT_losing_streak'].astype('float32'),
-                'T_losing_streak': row['UNIVERSAL_T_losing_streak'].astype('float32'),
-                'is_bomb_dropped': row['UNIVERSAL_is_bomb_dropped'].astype('float16'),
-                'is_bomb_being_planted': row['UNIVERSAL_is_bomb_being_planted'].astype('float16'),
-                'is_bomb_being_defused': row['UNIVERSAL_is_bomb_being_defused'].astype('float16'),
-                'is_bomb_defused': row['UNIVERSAL_is_bomb_defused'].astype('float16'),
-                'is_bomb_planted_at_A_site': row['UNIVERSAL_is_bomb_planted_at_A_site'].astype('float16'),
-                'is_bomb_planted_at_B_site': row['UNIVERSAL_is_bomb_planted_at_B_site'].astype('float16'),
-                'bomb_X': row['UNIVERSAL_bomb_X'].astype('float32'),
-                'bomb_Y': row['UNIVERSAL_bomb_Y'].astype('float32'),
-                'bomb_Z': row['UNIVERSAL_bomb_Z'].astype('float32'),
-                'bomb_mx_pos1': row['UNIVERSAL_bomb_mx_pos1'].astype('float16'),
-                'bomb_mx_pos2': row['UNIVERSAL_bomb_mx_pos2'].astype('float16'),
-                'bomb_mx_pos3': row['UNIVERSAL_bomb_mx_pos3'].astype('float16'),
-                'bomb_mx_pos4': row['UNIVERSAL_bomb_mx_pos4'].astype('float16'),
-                'bomb_mx_pos5': row['UNIVERSAL_bomb_mx_pos5'].astype('float16'),
-                'bomb_mx_pos6': row['UNIVERSAL_bomb_mx_pos6'].astype('float16'),
-                'bomb_mx_pos7': row['UNIVERSAL_bomb_mx_pos7'].astype('float16'),
-                'bomb_mx_pos8': row['UNIVERSAL_bomb_mx_pos8'].astype('float16'),
-                'bomb_mx_pos9': row['UNIVERSAL_bomb_mx_pos9'].astype('float16'),
-                'CT_wins': row['UNIVERSAL_CT_wins'].astype('float16'),
-            }
-
-
-
-            # Append the HeteroData object to the list
-            heterograph_snapshot_list.append(data)
+            else:
+                data.y = {
+                    'numerical_match_id': row['NUMERICAL_MATCH_ID'].astype('float32'),
+                    'tick': row['UNIVERSAL_tick'].astype('float32'),
+                    'round': row['UNIVERSAL_round'].astype('float32'),
+                    'time': row['UNIVERSAL_time'].astype('float32'),
+                    'remaining_time': row['UNIVERSAL_remaining_time'].astype('float32'),
+                    'freeze_end': row['UNIVERSAL_freeze_end'].astype('float32'),
+                    'end': row['UNIVERSAL_end'].astype('float32'),
+                    'CT_score': row['UNIVERSAL_CT_score'].astype('float32'),
+                    'T_score': row['UNIVERSAL_T_score'].astype('float32'),
+                    'CT_alive_num': row['UNIVERSAL_CT_alive_num'].astype('float32'),
+                    'T_alive_num': row['UNIVERSAL_T_alive_num'].astype('float32'),
+                    'CT_total_hp': row['UNIVERSAL_CT_total_hp'].astype('float32'),
+                    'T_total_hp': row['UNIVERSAL_T_total_hp'].astype('float32'),
+                    'CT_equipment_value': row['UNIVERSAL_CT_equipment_value'].astype('float32'),
+                    'T_equipment_value': row['UNIVERSAL_T_equipment_value'].astype('float32'),
+                    'CT_losing_streak': row['UNIVERSAL_CT_losing_streak'].astype('float32'),
+                    'T_losing_streak': row['UNIVERSAL_T_losing_streak'].astype('float32'),
+                    'is_bomb_dropped': row['UNIVERSAL_is_bomb_dropped'].astype('float16'),
+                    'is_bomb_being_planted': row['UNIVERSAL_is_bomb_being_planted'].astype('float16'),
+                    'is_bomb_being_defused': row['UNIVERSAL_is_bomb_being_defused'].astype('float16'),
+                    'is_bomb_defused': row['UNIVERSAL_is_bomb_defused'].astype('float16'),
+                    'is_bomb_planted_at_A_site': row['UNIVERSAL_is_bomb_planted_at_A_site'].astype('float16'),
+                    'is_bomb_planted_at_B_site': row['UNIVERSAL_is_bomb_planted_at_B_site'].astype('float16'),
+                    'bomb_X': row['UNIVERSAL_bomb_X'].astype('float32'),
+                    'bomb_Y': row['UNIVERSAL_bomb_Y'].astype('float32'),
+                    'bomb_Z': row['UNIVERSAL_bomb_Z'].astype('float32'),
+                    'bomb_mx_pos1': row['UNIVERSAL_bomb_mx_pos1'].astype('float16'),
+                    'bomb_mx_pos2': row['UNIVERSAL_bomb_mx_pos2'].astype('float16'),
+                    'bomb_mx_pos3': row['UNIVERSAL_bomb_mx_pos3'].astype('float16'),
+                    'bomb_mx_pos4': row['UNIVERSAL_bomb_mx_pos4'].astype('float16'),
+                    'bomb_mx_pos5': row['UNIVERSAL_bomb_mx_pos5'].astype('float16'),
+                    'bomb_mx_pos6': row['UNIVERSAL_bomb_mx_pos6'].astype('float16'),
+                    'bomb_mx_pos7': row['UNIVERSAL_bomb_mx_pos7'].astype('float16'),
+                    'bomb_mx_pos8': row['UNIVERSAL_bomb_mx_pos8'].astype('float16'),
+                    'bomb_mx_pos9': row['UNIVERSAL_bomb_mx_pos9'].astype('float16'),
+                    'CT_wins': row['UNIVERSAL_CT_wins'].astype('float16'),
+                }
+
+
+
+            # Yield the HeteroData object
+            yield data
 
             # Clear the memory
             del data
             del player_tensor
             del player_edges_tensor
 
+    # Group the yielded graphs into lists of batch_size graphs
+    def _BUILD_batches_(self, graphs, batch_size: int):
+
+        batch = []
+        for graph in graphs:
+            batch.append(graph)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+        # Yield the last smaller batch if it exists
+        if batch:
+            yield batch
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Parallel graph building
+    # --------------------------------------------------------------------------------------------
+
+    # Build the graphs of the rounds in a process pool
+    def _PARALLEL_process_snapshots_(
+        self, 
+        df: pd.DataFrame, 
+        nodes: pd.DataFrame, 
+        edges: pd.DataFrame, 
+        active_infernos: pd.DataFrame, 
+        active_smokes: pd.DataFrame, 
+        active_he_explosions: pd.DataFrame, 
+        player_self_edges: bool, 
+        graph_features_as_tensor: bool,
+        workers: int
+    ):
+
+        # Partition the rows into runs of consecutive rows of the same round, so the output order matches the row order
+        round_values = df['UNIVERSAL_round'].values
+        boundaries = [0] + (np.flatnonzero(round_values[1:] != round_values[:-1]) + 1).tolist() + [len(df)]
+        tasks = list(zip(boundaries[:-1], boundaries[1:]))
+
+        # Read-only state of the workers. The tasks only carry row ranges, the state is never pickled per task.
+        state = {
+            'df': df,
+            'nodes': nodes,
+            'edges': edges,
+            'active_infernos': active_infernos,
+            'active_smokes': active_smokes,
+            'active_he_explosions': active_he_explosions,
+            'player_self_edges': player_self_edges,
+            'graph_features_as_tensor': graph_features_as_tensor,
+            'molotov_radius': {'X': self.MOLOTOV_RADIUS_X, 'Y': self.MOLOTOV_RADIUS_Y, 'Z': self.MOLOTOV_RADIUS_Z},
+            'smoke_radius': {'X': self.SMOKE_RADIUS_X, 'Y': self.SMOKE_RADIUS_Y, 'Z': self.SMOKE_RADIUS_Z},
+        }
+
+        # With the 'fork' start method the workers inherit the state through copy-on-write shared memory pages,
+        # otherwise ('spawn', e.g. on Windows) it is sent once to each worker by the pool initializer
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            _WORKER_STATE.update(state)
+            pool_kwargs = {}
+        else:
+            context = multiprocessing.get_context('spawn')
+            pool_kwargs = {'initializer': _PARALLEL_init_worker, 'initargs': (state,)}
 
+        try:
+            with context.Pool(processes=min(workers, len(tasks)), **pool_kwargs) as pool:
+                round_graphs = pool.map(_PARALLEL_build_rows, tasks, chunksize=1)
+        finally:
+            _WORKER_STATE.clear()
 
-        # Return the list of HeteroData objects
-        return heterograph_snapshot_list
+        # Concatenate the graphs of the rounds in the original order
+        return [graph for graphs in round_graphs for graph in graphs]
 
 
 
@@ -214,23 +393,29 @@ class HeteroGraphSnapshot:
     # --------------------------------------------------------------------------------------------
 
     # 0. Validate the input parameters
-    def _PREP_validate_inputs_(self, df: pd.DataFrame, nodes: pd.DataFrame, edges: pd.DataFrame, CONFIG_MOLOTOV_RADIUS: dict, player_edges_num: int):
+    def _PREP_validate_inputs_(self, df: pd.DataFrame, nodes: pd.DataFrame, edges: pd.DataFrame, CONFIG_MOLOTOV_RADIUS: dict, player_edges_num: int, map_graph: MapGraph = None):
 
         # Check if the input parameters are empty
         if df.empty:
             raise ValueError("The snapshot dataframe is empty.")
-        if nodes.empty:
-            raise ValueError("The nodes dataframe is empty.")
-        if edges.empty:
-            raise ValueError("The edges dataframe is empty.")
+
+        # The nodes and edges dataframes are only needed if no map graph artifact is given
+        if map_graph is not None:
+            if not isinstance(map_graph, MapGraph):
+                raise ValueError("The map_graph should be a MapGraph object.")
+        else:
+            if nodes is None or nodes.empty:
+                raise ValueError("The nodes dataframe is empty.")
+            if edges is None or edges.empty:
+                raise ValueError("The edges dataframe is empty.")
         
-        # Check if the nodes dataset containes the required columns
-        if not all(col in nodes.columns for col in ['pos_id', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning']):
-            raise ValueError("The nodes dataframe does not contain the required columns. Required columns are: 'node_id', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning'.")
+            # Check if the nodes dataset containes the required columns
+            if not all(col in nodes.columns for col in ['pos_id', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning']):
+                raise ValueError("The nodes dataframe does not contain the required columns. Required columns are: 'node_id', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning'.")
         
-        # Check if the edges dataset containes the required columns
-        if not all(col in edges.columns for col in ['source_pos_id', 'source_pos_id']):
-            raise ValueError("The edges dataframe does not contain the required columns. Required columns are: 'source', 'target'.")
+            # Check if the edges dataset containes the required columns
+            if not all(col in edges.columns for col in ['source_pos_id', 'source_pos_id']):
+                raise ValueError("The edges dataframe does not contain the required columns. Required columns are: 'source', 'target'.")
         
         # Check if the CONFIG_MOLOTOV_RADIUS is a dictionary
         if not isinstance(CONFIG_MOLOTOV_RADIUS, dict):
@@ -260,28 +445,14 @@ class HeteroGraphSnapshot:
         self.SMOKE_RADIUS_Y = CONFIG_SMOKE_RADIUS['Y']
         self.SMOKE_RADIUS_Z = CONFIG_SMOKE_RADIUS['Z']
 
-    # 0.2 Create the edges dataframe
-    def _PREP_create_edges_(self, nodes: pd.DataFrame, edges_pos_id: pd.DataFrame):
-
-        # Add node_id column to the nodes dataframe by setting the index as the node_id, create a copy of the edges dataframe
-        nodes['node_id'] = nodes.index
-        edges = edges_pos_id.copy()
+    # 0.2 Create the nodes (with node ids) and edges dataframes from the map graph artifact
+    def _PREP_map_graph_(self, nodes: pd.DataFrame, edges_pos_id: pd.DataFrame, map_graph: MapGraph):
 
-        # Merge the nodes dataframe with the edges dataframe to get the source node ids
-        edges = edges.merge(nodes[['pos_id', 'node_id']], left_on='source_pos_id', right_on='pos_id', how='left')
-        edges = edges.drop(columns=['pos_id'])
-        edges = edges.rename(columns={'node_id': 'source'})
+        # Build the artifact from the dataframes if it was not given, the caller's dataframes are not modified
+        if map_graph is None:
+            map_graph = MapGraph.from_dataframes(nodes, edges_pos_id)
 
-        # Merge the nodes dataframe with the edges dataframe to get the target node ids
-        edges = edges.merge(nodes[['pos_id', 'node_id']], left_on='target_pos_id', right_on='pos_id', how='left')
-        edges = edges.drop(columns=['pos_id'])
-        edges = edges.rename(columns={'node_id': 'target'})
-
-        # Delete the source_pos_id and target_pos_id columns
-        del edges['source_pos_id']
-        del edges['target_pos_id']
-
-        return edges
+        return map_graph.nodes_dataframe(), map_graph.edges_dataframe()
 
     # 1.1 Set the 'is_bomb_planted_near' value for the nodes near the bomb
     def _EXT_set_bomb_planted_near_for_nodes_(self, nodes, df, index):
@@ -448,6 +619,14 @@ class HeteroGraphSnapshot:
         ])
         return playerEdges
 
+    # 3.1 Create the graph-level features array in the HeteroGraphData.GRAPH_FEATURES order
+    def _GRAPH_features_array_(self, row):
+
+        # The numerical match id is the only graph-level column without the 'UNIVERSAL_' prefix
+        graph_feature_columns = ['NUMERICAL_MATCH_ID' if feature == 'numerical_match_id' else f'UNIVERSAL_{feature}' for feature in HeteroGraphData.GRAPH_FEATURES]
+
+        return row[graph_feature_columns].values.astype(np.float32)
+
     
 
     # --------------------------------------------------------------------------------------------
@@ -483,3 +662,39 @@ class HeteroGraphSnapshot:
         return nodes.loc[distances.idxmin(), 'node_id']
 
 
+
+# --------------------------------------------------------------------------------------------
+# REGION: Worker process functions
+# --------------------------------------------------------------------------------------------
+
+# Initialize the shared state of a spawned worker process
+def _PARALLEL_init_worker(state: dict):
+    _WORKER_STATE.update(state)
+
+# Build the graphs of a row range of the snapshot dataframe in a worker process
+def _PARALLEL_build_rows(task: tuple):
+
+    start_idx, end_idx = task
+    df = _WORKER_STATE['df'].iloc[start_idx:end_idx]
+
+    # Only the grenades active during the row range can affect its graphs
+    first_tick = df['UNIVERSAL_tick'].min()
+    last_tick = df['UNIVERSAL_tick'].max()
+
+    def tick_range(grenades: pd.DataFrame):
+        return grenades[(grenades['tick'] >= first_tick) & (grenades['tick'] <= last_tick)]
+
+    hgs = HeteroGraphSnapshot()
+    hgs._PREP_set_molotov_radius_(_WORKER_STATE['molotov_radius'])
+    hgs._PREP_set_smoke_radius_(_WORKER_STATE['smoke_radius'])
+
+    return list(hgs._BUILD_snapshots_(
+        df,
+        _WORKER_STATE['nodes'],
+        _WORKER_STATE['edges'],
+        tick_range(_WORKER_STATE['active_infernos']),
+        tick_range(_WORKER_STATE['active_smokes']),
+        tick_range(_WORKER_STATE['active_he_explosions']),
+        _WORKER_STATE['player_self_edges'],
+        _WORKER_STATE['graph_features_as_tensor'],
+    ))
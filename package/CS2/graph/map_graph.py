@@ -0,0 +1,258 @@
+import pandas as pd
+import numpy as np
+
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+import hashlib
+import os
+
+
+class MapGraph:
+    """
+    Precomputed artifact of a map graph, built once from the nodes and edges csv files of data/map_graph_model/<map>
+    and cached to disk as an .npz file (by default in the user cache directory, see default_cache_path). Holds:
+    - pos_ids: the pos_id of each node, shape (N,). The node id of a node is its row in the nodes csv.
+    - pos_names: the position name of each node, shape (N,).
+    - node_features: the static map node features, shape (N, 9), column order is NODE_FEATURES.
+    - edge_index: the map edges with node ids, int64 COO format, shape (2, E).
+    - csr_indptr, csr_indices: the same edges in CSR format (the neighbors of node i are csr_indices[csr_indptr[i]:csr_indptr[i+1]]).
+    - position_names: the names of the position groups (the first two digits of the pos_id), in pos_id order.
+    - position_group: the position group index of each node, shape (N,).
+    - distances: all-pairs shortest path distances along the map edges, weighted by the Euclidean edge lengths, shape (N, N).
+    """
+
+    # Map node feature columns, in the order of the map node tensors of the graph snapshots
+    NODE_FEATURES = ['pos_id', 'X', 'Y', 'Z', 'is_contact', 'is_bombsite', 'is_bomb_planted_near', 'is_burning', 'is_smoked']
+
+    # Arrays saved to the cache file
+    ARRAYS = ['pos_ids', 'pos_names', 'node_features', 'edge_index', 'csr_indptr', 'csr_indices', 'position_names', 'position_group', 'distances']
+
+    # Version of the cache file layout, cache files of other versions are rebuilt
+    CACHE_VERSION = 1
+
+    # Directory of the default cache files, under $XDG_CACHE_HOME (or ~/.cache)
+    CACHE_DIR = os.path.join('cs2', 'map_graph')
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, **arrays):
+        """
+        Use MapGraph.load, MapGraph.from_map_directory or MapGraph.from_dataframes to create a map graph.
+        """
+
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self.position_names = [str(name) for name in self.position_names]
+
+        # pos_id -> node_id mapping
+        self.pos_id_to_node_id = {int(pos_id): node_id for node_id, pos_id in enumerate(self.pos_ids)}
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods - Creation
+    # --------------------------------------------------------------------------------------------
+
+    @classmethod
+    def from_dataframes(cls, nodes: pd.DataFrame, edges_pos_id: pd.DataFrame):
+        """
+        Build the map graph from the nodes and edges dataframes. The input dataframes are not modified.
+        Parameters:
+        - nodes: the map graph nodes dataframe.
+        - edges_pos_id: the map graph edges dataframe with 'source_pos_id' and 'target_pos_id' columns.
+        """
+
+        # Node ids are the row positions of the nodes
+        pos_ids = nodes['pos_id'].to_numpy(dtype=np.int64)
+        pos_id_to_node_id = pd.Series(np.arange(len(nodes), dtype=np.int64), index=pos_ids)
+
+        if not pos_id_to_node_id.index.is_unique:
+            raise ValueError('The pos_id values of the nodes dataframe are not unique.')
+
+        pos_names = nodes['pos_name'].to_numpy(dtype=str) if 'pos_name' in nodes.columns else np.full(len(nodes), '', dtype=str)
+
+        # Static node features, missing dynamic flag columns are zero
+        node_features = np.zeros((len(nodes), len(cls.NODE_FEATURES)), dtype=np.float64)
+        for col_idx, col in enumerate(cls.NODE_FEATURES):
+            if col in nodes.columns:
+                node_features[:, col_idx] = nodes[col].to_numpy(dtype=np.float64)
+
+        # Edges with node ids
+        source = pos_id_to_node_id.reindex(edges_pos_id['source_pos_id'].to_numpy())
+        target = pos_id_to_node_id.reindex(edges_pos_id['target_pos_id'].to_numpy())
+        if source.isna().any() or target.isna().any():
+            raise ValueError('The edges dataframe contains pos_id values missing from the nodes dataframe.')
+
+        edge_index = np.stack([source.to_numpy(dtype=np.int64), target.to_numpy(dtype=np.int64)])
+
+        # CSR adjacency, the edge lengths are the Euclidean distances of the connected nodes
+        positions = node_features[:, 1:4]
+        edge_lengths = np.linalg.norm(positions[edge_index[0]] - positions[edge_index[1]], axis=1)
+        adjacency = csr_matrix((edge_lengths, (edge_index[0], edge_index[1])), shape=(len(nodes), len(nodes)))
+        adjacency.sort_indices()
+
+        # All-pairs shortest path distances
+        distances = shortest_path(adjacency, method='D', directed=False).astype(np.float32)
+
+        # Position groups: the first two digits of the pos_id
+        group_codes, position_group = np.unique(pos_ids // 100, return_inverse=True)
+        position_names = np.array([pos_names[np.argmax(position_group == group_idx)] or str(code) for group_idx, code in enumerate(group_codes)])
+
+        return cls(
+            pos_ids=pos_ids,
+            pos_names=pos_names,
+            node_features=node_features,
+            edge_index=edge_index,
+            csr_indptr=adjacency.indptr.astype(np.int64),
+            csr_indices=adjacency.indices.astype(np.int64),
+            position_names=position_names,
+            position_group=position_group.astype(np.int64),
+            distances=distances,
+        )
+
+    @classmethod
+    def load(cls, nodes_path: str, edges_path: str, cache_path: str = None):
+        """
+        Load the map graph from its cache file, or build it from the csv files and write the cache file.
+        The cache file is rebuilt if it is older than any of the csv files.
+        Parameters:
+        - nodes_path: the path of the nodes csv file.
+        - edges_path: the path of the edges csv file.
+        - cache_path: the path of the cache file. Default is None, which uses default_cache_path, outside of the data directory.
+        """
+
+        if cache_path is None:
+            cache_path = cls.default_cache_path(nodes_path, edges_path)
+
+        # Use the cache if it is up to date
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= max(os.path.getmtime(nodes_path), os.path.getmtime(edges_path)):
+            map_graph = cls.from_file(cache_path)
+            if map_graph is not None:
+                return map_graph
+
+        map_graph = cls.from_dataframes(pd.read_csv(nodes_path), pd.read_csv(edges_path))
+        map_graph.save(cache_path)
+
+        return map_graph
+
+    @classmethod
+    def from_map_directory(cls, map_dir: str, normalized: bool = True, cache_path: str = None):
+        """
+        Load the map graph of a map directory (e.g. data/map_graph_model/de_inferno).
+        Parameters:
+        - map_dir: the map directory containing the nodes.csv, nodes_norm.csv and edges.csv files.
+        - normalized: whether to use the normalized node coordinates. Default is True.
+        - cache_path: the path of the cache file. Default is None, which uses default_cache_path.
+        """
+
+        nodes_file = 'nodes_norm.csv' if normalized else 'nodes.csv'
+        return cls.load(os.path.join(map_dir, nodes_file), os.path.join(map_dir, 'edges.csv'), cache_path)
+
+    @classmethod
+    def default_cache_path(cls, nodes_path: str, edges_path: str) -> str:
+        """
+        Return the default cache file path of a map graph: a file in the user cache directory ($XDG_CACHE_HOME/cs2/map_graph,
+        ~/.cache/cs2/map_graph if XDG_CACHE_HOME is not set), named after the nodes csv file and the hash of the csv paths.
+        Parameters:
+        - nodes_path: the path of the nodes csv file.
+        - edges_path: the path of the edges csv file.
+        """
+
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        source_hash = hashlib.sha1(f'{os.path.abspath(nodes_path)}|{os.path.abspath(edges_path)}'.encode()).hexdigest()[:16]
+        file_name = f'{os.path.splitext(os.path.basename(nodes_path))[0]}_{source_hash}_map_graph.npz'
+
+        return os.path.join(cache_home, cls.CACHE_DIR, file_name)
+
+    @classmethod
+    def from_file(cls, path: str):
+        """
+        Read a map graph cache file. Returns None if the file was written with another cache layout version.
+        Parameters:
+        - path: the path of the cache file.
+        """
+
+        with np.load(path, allow_pickle=False) as cache:
+            if int(cache['cache_version']) != cls.CACHE_VERSION:
+                return None
+            return cls(**{name: cache[name] for name in cls.ARRAYS})
+
+    def save(self, path: str):
+        """
+        Write the map graph to a cache file.
+        Parameters:
+        - path: the path of the cache file.
+        """
+
+        arrays = {name: np.asarray(getattr(self, name)) for name in self.ARRAYS}
+
+        if os.path.dirname(path) != '':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first, so a failed write does not corrupt the cache
+        with open(path + '.tmp', 'wb') as cache_file:
+            np.savez(cache_file, cache_version=self.CACHE_VERSION, **arrays)
+        os.replace(path + '.tmp', path)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods - Access
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.pos_ids)
+
+    @property
+    def node_positions(self) -> np.ndarray:
+        """
+        The X, Y, Z coordinates of the nodes, shape (N, 3).
+        """
+        return self.node_features[:, 1:4]
+
+    def nodes_dataframe(self) -> pd.DataFrame:
+        """
+        Return a new nodes dataframe with the static node features, the position names and the node ids.
+        """
+
+        nodes = pd.DataFrame(self.node_features, columns=self.NODE_FEATURES)
+        nodes['pos_id'] = self.pos_ids
+        nodes.insert(1, 'pos_name', self.pos_names)
+        nodes['node_id'] = np.arange(self.num_nodes, dtype=np.int64)
+
+        return nodes
+
+    def edges_dataframe(self) -> pd.DataFrame:
+        """
+        Return a new edges dataframe with 'source' and 'target' node id columns.
+        """
+
+        return pd.DataFrame({'source': self.edge_index[0], 'target': self.edge_index[1]})
+
+    def neighbors(self, node_id: int) -> np.ndarray:
+        """
+        Return the node ids of the neighbors of a node.
+        Parameters:
+        - node_id: the id of the node.
+        """
+
+        return self.csr_indices[self.csr_indptr[node_id]:self.csr_indptr[node_id + 1]]
+
+    def closest_nodes(self, coords) -> np.ndarray:
+        """
+        Return the node ids of the closest nodes to the given positions (Euclidean distance in X, Y, Z).
+        Parameters:
+        - coords: array of positions of shape (..., 3).
+        """
+
+        coords = np.asarray(coords, dtype=np.float64)
+        distances = ((coords[..., None, :] - self.node_positions) ** 2).sum(axis=-1)
+
+        return distances.argmin(axis=-1)
@@ -0,0 +1,292 @@
+import torch
+from torch_geometric.data import HeteroData, Dataset
+from .hetero_graph_data import HeteroGraphData
+
+import numpy as np
+
+import json
+import os
+
+
+class MatchGraphStore:
+    """
+    Columnar on-disk store for the heterogeneous graph snapshots of matches.
+    Each match is stored as a handful of memory-mappable .npy blocks instead of a pickled list of HeteroData objects:
+    - player_x.npy: player node features, shape (N, 10, F).
+    - map_flags.npy: packed bitsets of the dynamic map node flags, shape (N, ceil(map_nodes * k / 8)).
+    - player_map_targets.npy: the map node targets of the player->map edges, shape (N, 10).
+    - graph_features.npy: graph-level features, shape (N, G), column order is HeteroGraphData.GRAPH_FEATURES.
+    - label.npy: the CT_wins labels, shape (N,).
+    The static map graph (map node features without the dynamic flags and the map edges) is stored once for the whole store.
+    """
+
+    # Map node feature columns changing between snapshots (is_bomb_planted_near, is_burning, is_smoked)
+    MAP_DYNAMIC_COLUMNS = [6, 7, 8]
+
+    # File names
+    INDEX_FILE = 'index.json'
+    MAP_DIR = 'map'
+    MATCHES_DIR = 'matches'
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, root: str):
+        """
+        Parameters:
+        - root: the root directory of the store. Created by the first write_match if it does not exist.
+        """
+
+        self.root = root
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def write_match(self, match_id, graphs: list[HeteroData]):
+        """
+        Write the graph snapshots of a match to the store. An existing match with the same id is overwritten.
+        Parameters:
+        - match_id: the identifier of the match (e.g. the numerical match id).
+        - graphs: the list of HeteroData (or HeteroGraphData) snapshots of the match, as created by HeteroGraphSnapshot.
+        """
+
+        # Validate the input graphs
+        if len(graphs) == 0:
+            raise ValueError('The graph list is empty.')
+
+        match_id = str(match_id)
+
+        # Write the static map graph, or check that the match uses the same one
+        self._WRITE_static_map_graph_(graphs[0])
+
+        # Stack the columns of the match
+        player_x = np.stack([graph['player'].x.numpy() for graph in graphs]).astype(np.float32)
+        map_flags = np.stack([graph['map'].x[:, self.MAP_DYNAMIC_COLUMNS].numpy() for graph in graphs])
+        player_map_targets = np.stack([graph['player', 'closest_to', 'map'].edge_index[1].numpy() for graph in graphs])
+        graph_features = np.concatenate([HeteroGraphData.collate_graph_features(graph).numpy() for graph in graphs]).astype(np.float32)
+        label = np.concatenate([HeteroGraphData.collate_label(graph).numpy() for graph in graphs]).astype(np.float32)
+
+        # The dynamic map flags must be binary to be stored as bitsets
+        if not np.isin(map_flags, [0, 1]).all():
+            raise ValueError('The dynamic map node flags must be binary values.')
+
+        # Pack the dynamic map flags into bitsets
+        map_flags = np.packbits(map_flags.astype(np.uint8).reshape(len(graphs), -1), axis=1)
+
+        # Write the match blocks
+        match_path = os.path.join(self.root, self.MATCHES_DIR, match_id)
+        os.makedirs(match_path, exist_ok=True)
+
+        np.save(os.path.join(match_path, 'player_x.npy'), player_x)
+        np.save(os.path.join(match_path, 'map_flags.npy'), map_flags)
+        np.save(os.path.join(match_path, 'player_map_targets.npy'), player_map_targets)
+        np.save(os.path.join(match_path, 'graph_features.npy'), graph_features)
+        np.save(os.path.join(match_path, 'label.npy'), label)
+
+        # Update the index
+        index = self.read_index()
+        index['matches'] = [match for match in index['matches'] if match['match_id'] != match_id]
+        index['matches'].append({
+            'match_id': match_id,
+            'num_graphs': len(graphs),
+            'player_self_edges': ('player', 'is', 'player') in graphs[0].edge_types,
+        })
+        self._WRITE_index_(index)
+
+    def read_index(self) -> dict:
+        """
+        Read the index of the store, listing the matches and their number of graphs.
+        """
+
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {'graph_features': HeteroGraphData.GRAPH_FEATURES, 'map_dynamic_columns': self.MAP_DYNAMIC_COLUMNS, 'matches': []}
+
+        with open(index_path, 'r') as index_file:
+            return json.load(index_file)
+
+    def load_map_graph(self):
+        """
+        Load the static map graph of the store. Returns the map node features and the map edge index as tensors.
+        """
+
+        map_x = torch.from_numpy(np.load(os.path.join(self.root, self.MAP_DIR, 'map_x.npy')))
+        map_edge_index = torch.from_numpy(np.load(os.path.join(self.root, self.MAP_DIR, 'edge_index.npy')))
+
+        return map_x, map_edge_index
+
+    def load_match(self, match_id) -> dict:
+        """
+        Memory-map the column blocks of a match. Returns a dictionary of read-only numpy memmaps.
+        Parameters:
+        - match_id: the identifier of the match.
+        """
+
+        match_path = os.path.join(self.root, self.MATCHES_DIR, str(match_id))
+        if not os.path.exists(match_path):
+            raise ValueError(f'Match {match_id} is not present in the store.')
+
+        return {
+            'player_x': np.load(os.path.join(match_path, 'player_x.npy'), mmap_mode='r'),
+            'map_flags': np.load(os.path.join(match_path, 'map_flags.npy'), mmap_mode='r'),
+            'player_map_targets': np.load(os.path.join(match_path, 'player_map_targets.npy'), mmap_mode='r'),
+            'graph_features': np.load(os.path.join(match_path, 'graph_features.npy'), mmap_mode='r'),
+            'label': np.load(os.path.join(match_path, 'label.npy'), mmap_mode='r'),
+        }
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _WRITE_static_map_graph_(self, graph: HeteroData):
+
+        # Static map node features: the dynamic flag columns are zeroed
+        map_x = graph['map'].x.numpy().copy()
+        map_x[:, self.MAP_DYNAMIC_COLUMNS] = 0
+        map_edge_index = graph['map', 'connected_to', 'map'].edge_index.numpy()
+
+        map_x_path = os.path.join(self.root, self.MAP_DIR, 'map_x.npy')
+        map_edge_index_path = os.path.join(self.root, self.MAP_DIR, 'edge_index.npy')
+
+        # First match of the store: write the map graph
+        if not os.path.exists(map_x_path):
+            os.makedirs(os.path.join(self.root, self.MAP_DIR), exist_ok=True)
+            np.save(map_x_path, map_x)
+            np.save(map_edge_index_path, map_edge_index)
+            return
+
+        # Other matches must use the same map graph
+        if not np.array_equal(np.load(map_x_path), map_x) or not np.array_equal(np.load(map_edge_index_path), map_edge_index):
+            raise ValueError('The map graph of the match differs from the static map graph of the store. Use a separate store for each map.')
+
+    def _WRITE_index_(self, index: dict):
+
+        # Write to a temporary file first, so a failed write does not corrupt the index
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file, indent=4)
+        os.replace(index_path + '.tmp', index_path)
+
+
+
+class MatchGraphDataset(Dataset):
+    """
+    Dataset streaming the graph snapshots of a MatchGraphStore. The match blocks are memory-mapped and the HeteroGraphData
+    objects are materialized lazily on __getitem__, so loading a dataset takes near-zero time and memory.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, root: str, match_ids: list = None, transform=None):
+        """
+        Parameters:
+        - root: the root directory of the MatchGraphStore.
+        - match_ids: the matches to include. Default is None, which includes every match of the store.
+        - transform: optional transform applied to the materialized graphs.
+        """
+
+        super().__init__(None, transform)
+
+        # The dataset is read-only, a path without a store is an error rather than an empty dataset
+        if not os.path.exists(os.path.join(root, MatchGraphStore.INDEX_FILE)):
+            raise ValueError(f'{root} is not a MatchGraphStore, the {MatchGraphStore.INDEX_FILE} file is missing.')
+
+        self.store = MatchGraphStore(root)
+        index = self.store.read_index()
+
+        # Select the matches
+        matches = index['matches']
+        if match_ids is not None:
+            match_ids = [str(match_id) for match_id in match_ids]
+            missing = set(match_ids) - set(match['match_id'] for match in matches)
+            if len(missing) > 0:
+                raise ValueError(f'Matches {sorted(missing)} are not present in the store.')
+            matches = [match for match in matches if match['match_id'] in match_ids]
+
+        self.matches = matches
+        self.map_dynamic_columns = index['map_dynamic_columns']
+
+        # Global index offsets of the matches
+        self.offsets = np.cumsum([0] + [match['num_graphs'] for match in self.matches])
+
+        # The static map graph is shared by every materialized graph
+        self.map_x, self.map_edge_index = self.store.load_map_graph()
+
+        # Memory-mapped blocks are opened lazily (separately in each DataLoader worker)
+        self._match_blocks = {}
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Dataset methods
+    # --------------------------------------------------------------------------------------------
+
+    def len(self) -> int:
+        return int(self.offsets[-1])
+
+    def get(self, idx: int) -> HeteroGraphData:
+
+        # Locate the match and the position of the graph in the match
+        match_idx = int(np.searchsorted(self.offsets, idx, side='right')) - 1
+        local_idx = idx - int(self.offsets[match_idx])
+
+        match = self.matches[match_idx]
+        blocks = self._EXT_get_match_blocks_(match['match_id'])
+
+        # Unpack the dynamic map flags of the graph
+        num_map_nodes = self.map_x.shape[0]
+        num_flags = num_map_nodes * len(self.map_dynamic_columns)
+        map_flags = np.unpackbits(blocks['map_flags'][local_idx])[:num_flags].reshape(num_map_nodes, -1)
+
+        map_x = self.map_x.clone()
+        map_x[:, self.map_dynamic_columns] = torch.from_numpy(map_flags.astype(np.float32))
+
+        # Player->map edge targets
+        player_map_targets = torch.from_numpy(np.array(blocks['player_map_targets'][local_idx]))
+        player_ids = torch.arange(10, dtype=player_map_targets.dtype)
+
+        # Create the HeteroGraphData object
+        data = HeteroGraphData()
+
+        data['player'].x = torch.from_numpy(np.array(blocks['player_x'][local_idx]))
+        data['map'].x = map_x
+
+        data['map', 'connected_to', 'map'].edge_index = self.map_edge_index
+        data['player', 'closest_to', 'map'].edge_index = torch.stack([player_ids, player_map_targets])
+        if match['player_self_edges']:
+            data['player', 'is', 'player'].edge_index = torch.stack([player_ids, player_ids])
+
+        data.graph_features = torch.from_numpy(np.array(blocks['graph_features'][local_idx])).view(1, -1)
+        data.label = torch.from_numpy(np.array(blocks['label'][local_idx:local_idx + 1]))
+
+        return data
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Other methods
+    # --------------------------------------------------------------------------------------------
+
+    def _EXT_get_match_blocks_(self, match_id: str) -> dict:
+
+        if match_id not in self._match_blocks:
+            self._match_blocks[match_id] = self.store.load_match(match_id)
+
+        return self._match_blocks[match_id]
+
+    def __getstate__(self):
+
+        # Do not pickle the memory-mapped blocks, the worker processes open their own
+        state = self.__dict__.copy()
+        state['_match_blocks'] = {}
+        return state
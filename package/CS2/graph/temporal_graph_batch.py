@@ -0,0 +1,186 @@
+import torch
+from torch_geometric.data import HeteroData
+from .hetero_graph_data import HeteroGraphData
+from .match_graph_store import MatchGraphStore
+
+
+class TemporalGraphBatch:
+    """
+    Batch of B temporal windows of (at most) T graph snapshots, stored as stacked tensors. The windows share the
+    static map graph, only the dynamic parts of the snapshots are stacked:
+    - player_x: player node features, shape (T, B, 10, F).
+    - map_flags: dynamic map node flags (MatchGraphStore.MAP_DYNAMIC_COLUMNS), shape (T, B, map_nodes, k).
+    - player_map_targets: the map node targets of the player->map edges, shape (T, B, 10).
+    - graph_features: graph-level features, shape (T, B, G), column order is HeteroGraphData.GRAPH_FEATURES.
+    - label: the CT_wins labels, shape (T, B).
+    - mask: whether a time step holds a snapshot, shape (T, B). Windows shorter than T are padded at the end.
+    - lengths: the number of snapshots of each window, shape (B,).
+    - map_x: the static map node features (dynamic flags zeroed), shape (map_nodes, F_map).
+    - map_edge_index: the map edges, shape (2, E).
+    Use TemporalGraphBatch.collate as the collate_fn of a DataLoader over a TemporalWindowDataset.
+    """
+
+    # Stacked tensor attributes
+    TENSORS = ['player_x', 'map_flags', 'player_map_targets', 'graph_features', 'label', 'mask', 'lengths', 'map_x', 'map_edge_index']
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, player_self_edges: bool = True, map_dynamic_columns: list = None, **tensors):
+        """
+        Use TemporalGraphBatch.collate to create a batch from a list of windows.
+        Parameters:
+        - player_self_edges: whether the snapshots have player self edges. Default is True.
+        - map_dynamic_columns: the map node feature columns of the map_flags. Default is None, which uses MatchGraphStore.MAP_DYNAMIC_COLUMNS.
+        """
+
+        for name in self.TENSORS:
+            setattr(self, name, tensors[name])
+
+        self.player_self_edges = player_self_edges
+        self.map_dynamic_columns = MatchGraphStore.MAP_DYNAMIC_COLUMNS if map_dynamic_columns is None else map_dynamic_columns
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @classmethod
+    def collate(cls, windows: list) -> 'TemporalGraphBatch':
+        """
+        Collate a list of windows (lists of graph snapshots) into a TemporalGraphBatch.
+        Parameters:
+        - windows: the list of B windows.
+        """
+
+        if len(windows) == 0 or any(len(window) == 0 for window in windows):
+            raise ValueError('The windows list and the windows must not be empty.')
+
+        first_graph = windows[0][0]
+        map_dynamic_columns = MatchGraphStore.MAP_DYNAMIC_COLUMNS
+
+        batch_size = len(windows)
+        max_length = max(len(window) for window in windows)
+
+        num_map_nodes = first_graph['map'].x.shape[0]
+        num_player_features = first_graph['player'].x.shape[1]
+        num_graph_features = len(HeteroGraphData.GRAPH_FEATURES)
+
+        # Padded tensors
+        player_x = torch.zeros((max_length, batch_size, 10, num_player_features), dtype=torch.float32)
+        map_flags = torch.zeros((max_length, batch_size, num_map_nodes, len(map_dynamic_columns)), dtype=torch.float32)
+        player_map_targets = torch.zeros((max_length, batch_size, 10), dtype=torch.long)
+        graph_features = torch.zeros((max_length, batch_size, num_graph_features), dtype=torch.float32)
+        label = torch.zeros((max_length, batch_size), dtype=torch.float32)
+        mask = torch.zeros((max_length, batch_size), dtype=torch.bool)
+
+        # Fill the tensors window by window
+        for window_idx, window in enumerate(windows):
+            length = len(window)
+
+            player_x[:length, window_idx] = torch.stack([graph['player'].x for graph in window])
+            map_flags[:length, window_idx] = torch.stack([graph['map'].x[:, map_dynamic_columns] for graph in window])
+            player_map_targets[:length, window_idx] = torch.stack([graph['player', 'closest_to', 'map'].edge_index[1] for graph in window]).long()
+            graph_features[:length, window_idx] = torch.cat([HeteroGraphData.collate_graph_features(graph) for graph in window])
+            label[:length, window_idx] = torch.cat([HeteroGraphData.collate_label(graph) for graph in window])
+            mask[:length, window_idx] = True
+
+        # Static map graph of the first snapshot
+        map_x = first_graph['map'].x.clone().float()
+        map_x[:, map_dynamic_columns] = 0
+
+        return cls(
+            player_self_edges=('player', 'is', 'player') in first_graph.edge_types,
+            map_dynamic_columns=map_dynamic_columns,
+            player_x=player_x,
+            map_flags=map_flags,
+            player_map_targets=player_map_targets,
+            graph_features=graph_features,
+            label=label,
+            mask=mask,
+            lengths=mask.sum(dim=0),
+            map_x=map_x,
+            map_edge_index=first_graph['map', 'connected_to', 'map'].edge_index.long(),
+        )
+
+    @property
+    def num_steps(self) -> int:
+        return self.player_x.shape[0]
+
+    @property
+    def batch_size(self) -> int:
+        return self.player_x.shape[1]
+
+    def time_step(self, step: int) -> HeteroData:
+        """
+        Return the B snapshots of a time step as one batched HeteroData graph, laid out like a PyG Batch of the snapshots
+        (the nodes and edges of the graphs follow each other), with the batch and ptr vectors of every node type set.
+        The graph-level features and labels are stored in the graph_features (B, G) and label (B,) attributes. Padded
+        time steps hold zero features.
+        Parameters:
+        - step: the time step.
+        """
+
+        batch_size = self.batch_size
+        num_map_nodes = self.map_x.shape[0]
+        device = self.player_x.device
+
+        data = HeteroData()
+
+        # Node features
+        data['player'].x = self.player_x[step].reshape(batch_size * 10, -1)
+
+        map_x = self.map_x.expand(batch_size, -1, -1).clone()
+        map_x[:, :, self.map_dynamic_columns] = self.map_flags[step]
+        data['map'].x = map_x.reshape(batch_size * num_map_nodes, -1)
+
+        # Edges, offset by the node counts of the previous graphs
+        map_offsets = torch.arange(batch_size, device=device) * num_map_nodes
+        player_ids = torch.arange(batch_size * 10, device=device)
+
+        data['map', 'connected_to', 'map'].edge_index = (self.map_edge_index.unsqueeze(1) + map_offsets.view(1, -1, 1)).reshape(2, -1)
+        data['player', 'closest_to', 'map'].edge_index = torch.stack([player_ids, (self.player_map_targets[step] + map_offsets.view(-1, 1)).reshape(-1)])
+        if self.player_self_edges:
+            data['player', 'is', 'player'].edge_index = torch.stack([player_ids, player_ids])
+
+        # Graph assignment vectors of the nodes, as in a PyG Batch, so global pooling and num_graphs work
+        graph_ids = torch.arange(batch_size, device=device)
+        for node_type, num_nodes in [('player', 10), ('map', num_map_nodes)]:
+            data[node_type].batch = graph_ids.repeat_interleave(num_nodes)
+            data[node_type].ptr = torch.arange(batch_size + 1, device=device) * num_nodes
+        data.num_graphs = batch_size
+
+        # Graph-level features and labels
+        data.graph_features = self.graph_features[step]
+        data.label = self.label[step]
+
+        return data
+
+    def to(self, device, non_blocking: bool = False) -> 'TemporalGraphBatch':
+        """
+        Move the tensors of the batch to a device. Returns a new batch.
+        Parameters:
+        - device: the target device.
+        - non_blocking: whether to copy asynchronously from pinned memory. Default is False.
+        """
+
+        return TemporalGraphBatch(
+            player_self_edges=self.player_self_edges,
+            map_dynamic_columns=self.map_dynamic_columns,
+            **{name: getattr(self, name).to(device, non_blocking=non_blocking) for name in self.TENSORS}
+        )
+
+    def pin_memory(self) -> 'TemporalGraphBatch':
+        """
+        Pin the tensors of the batch, called by the DataLoader if pin_memory is set.
+        """
+
+        return TemporalGraphBatch(
+            player_self_edges=self.player_self_edges,
+            map_dynamic_columns=self.map_dynamic_columns,
+            **{name: getattr(self, name).pin_memory() for name in self.TENSORS}
+        )
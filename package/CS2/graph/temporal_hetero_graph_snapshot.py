@@ -2,16 +2,29 @@ import torch
 from torch_geometric.data import HeteroData
 from torch_geometric_temporal.signal import DynamicHeteroGraphTemporalSignal
 from termcolor import colored
+from .graph_round_index import GraphRoundIndex
+from .temporal_window_dataset import TemporalWindowDataset
+from .hetero_graph_data import HeteroGraphData
+
+import numpy as np
 
 class TemporalHeteroGraphSnapshot:
 
+    # Graph-level features of the shared-structure PyG Temporal dynamic graphs, in the column order of their graph_features tensor
+    PYG_TEMPORAL_GRAPH_FEATURES = [feature for feature in HeteroGraphData.GRAPH_FEATURES if feature not in ['time', 'remaining_time']]
+
+    # Store of the graph-level attributes in the time slices of the shared PyG Temporal dynamic graphs
+    PYG_TEMPORAL_GRAPH_STORE = 'graph'
+
 
     # --------------------------------------------------------------------------------------------
     # REGION: Constructor
     # --------------------------------------------------------------------------------------------
 
     def __init__(self):
-        pass 
+
+        # Static tensors shared by the PyG Temporal dynamic graphs (unit edge weights and node targets, map edges)
+        self._shared_tensors = {}
 
 
 
@@ -66,10 +79,10 @@ class TemporalHeteroGraphSnapshot:
             player_player_edge_index = graph_data[('player', 'is', 'player')]['edge_index']
 
             # Time information
-            time = graph_data['y']['remaining_time']
+            time = graph_data.y['remaining_time']
 
             # Grapg level features
-            graph_features = graph_data['y'].copy()
+            graph_features = graph_data.y.copy()
             del graph_features['remaining_time']
             del graph_features['time']
             del graph_features['CT_wins']
@@ -86,11 +99,11 @@ class TemporalHeteroGraphSnapshot:
 
                 # 2. edge_weight_dicts 
                 # Create empty tensors for edge weights as they are not used
-                {torch.ones(map_map_edge_index.shape[1]), torch.ones(player_map_edge_index.shape[1])},
+                {('map', 'connected_to', 'map'): torch.ones(map_map_edge_index.shape[1]), ('player', 'closest_to', 'map'): torch.ones(player_map_edge_index.shape[1])},
 
                 # 3. target_dicts
                 # Create empty tensors for node target feature as they are not used
-                {torch.ones(map_features.shape[0]), torch.ones(player_features.shape[0])},
+                {'map': torch.ones(map_features.shape[0]), 'player': torch.ones(player_features.shape[0])},
 
                 # 4. graph_features
                 graph_features,
@@ -99,7 +112,7 @@ class TemporalHeteroGraphSnapshot:
                 time,  # Time step
 
                 # 6. target
-                graph_data['y']['CT_wins'],  # Label for classification
+                graph_data.y['CT_wins'],  # Label for classification
 
             )
             
@@ -121,6 +134,63 @@ class TemporalHeteroGraphSnapshot:
 
         return dynamic_graph
 
+    def create_dynamic_graph_pyg_temporal_shared(
+        self,
+        graphs: list[HeteroData]
+    ):
+        """
+        Create a PyG Temporal dynamic graph from a list of snapshots, sharing the static structure between the time slices.
+        The map edges, the unit edge weights and the unit node targets are allocated once per map and referenced from
+        every time slice. The graph-level features (column order is PYG_TEMPORAL_GRAPH_FEATURES), the time stamps
+        (remaining_time) and the targets (CT_wins) are stacked into single (T, G) and (T,) arrays, the time slices hold
+        views of their rows. Indexing the dynamic graph returns a HeteroData time slice with the graph_features (G,),
+        time_stamps (1,) and target (1,) attributes in its PYG_TEMPORAL_GRAPH_STORE store.
+        
+        Parameters:
+        - graphs: the list of snapshots.
+        """
+
+        first_graph = graphs[0]
+        num_player_nodes = first_graph['player'].x.shape[0]
+        num_map_nodes = first_graph['map'].x.shape[0]
+
+        # Static map edges and unit tensors, shared by every time slice
+        map_map_edge_index = self._EXT_shared_map_edge_index_(first_graph[('map', 'connected_to', 'map')]['edge_index'])
+        edge_weight_dict = {
+            ('map', 'connected_to', 'map'): self._EXT_shared_ones_('edge', map_map_edge_index.shape[1]),
+            ('player', 'closest_to', 'map'): self._EXT_shared_ones_('edge', first_graph[('player', 'closest_to', 'map')]['edge_index'].shape[1]),
+        }
+        target_dict = {
+            'map': self._EXT_shared_ones_('node', num_map_nodes),
+            'player': self._EXT_shared_ones_('node', num_player_nodes),
+        }
+
+        # Graph-level features, time stamps and targets as stacked arrays
+        graph_features = torch.cat([HeteroGraphData.collate_graph_features(graph_data) for graph_data in graphs]).numpy()
+        time_stamps = graph_features[:, HeteroGraphData.GRAPH_FEATURE_INDEX['remaining_time']]
+        graph_features = graph_features[:, [HeteroGraphData.GRAPH_FEATURE_INDEX[feature] for feature in self.PYG_TEMPORAL_GRAPH_FEATURES]]
+        target = torch.cat([HeteroGraphData.collate_label(graph_data) for graph_data in graphs]).numpy()
+
+        # PyG Temporal indexes the additional features per time slice as {store: array} dictionaries
+        store = self.PYG_TEMPORAL_GRAPH_STORE
+
+        # Create the DTDG using PyG Temporal, only the node features and the player edges differ between the time slices
+        dynamic_graph = DynamicHeteroGraphTemporalSignal(
+            feature_dicts=[{'player': graph_data['player']['x'].float(), 'map': graph_data['map']['x'].float()} for graph_data in graphs],
+            edge_index_dicts=[{
+                ('map', 'connected_to', 'map'): map_map_edge_index,
+                ('player', 'closest_to', 'map'): graph_data[('player', 'closest_to', 'map')]['edge_index'].long()
+            } for graph_data in graphs],
+            edge_weight_dicts=[edge_weight_dict] * len(graphs),
+            target_dicts=[target_dict] * len(graphs),
+
+            graph_features=[{store: graph_features[step]} for step in range(len(graphs))],
+            time_stamps=[{store: time_stamps[step:step + 1]} for step in range(len(graphs))],
+            target=[{store: target[step:step + 1]} for step in range(len(graphs))],
+        )
+
+        return dynamic_graph
+
 
 
 
@@ -131,7 +201,9 @@ class TemporalHeteroGraphSnapshot:
         interval: int = 10,
         round_process_strategy: str = 'default',
         parse_rate: int = 16,
-        use_pyg_temporal: bool = False
+        use_pyg_temporal: bool = False,
+        lazy: bool = False,
+        shared_structure: bool = False
     ):
         """
         Process the rounds of a match and create a dynamic graph with fixed length intervals.
@@ -141,6 +213,12 @@ class TemporalHeteroGraphSnapshot:
         - round_process_strategy: the strategy to use for creating the dynamic graphs. Default is 'default'.
         - parse_rate: the time between two snapshots in tick number. Default is 16 (4 ticks per second).
         - use_pyg_temporal: whether to use PyG Temporal data model for creating the dynamic graphs.
+        - lazy: whether to return a TemporalWindowDataset storing only the window indices instead of the list of dynamic graphs. \
+          The windows are the same, the shifted and start_end windows of a round are ordered by start. Default is False. \
+          In both modes a round is windowed on its first run of snapshots (GraphRoundIndex.round_segments), a later run of \
+          the same round number in the match is skipped.
+        - shared_structure: whether to build the PyG Temporal dynamic graphs with create_dynamic_graph_pyg_temporal_shared, \
+          sharing the static structure between the time slices and stacking the graph-level features. Default is False.
         """
 
         # Check the round process strategy
@@ -160,6 +238,15 @@ class TemporalHeteroGraphSnapshot:
             raise ValueError("The interval must be even when using \"shifted\" temporal concatenation strategy.")
 
 
+        # PyG Temporal builder of the dynamic graphs
+        if shared_structure:
+            self._DYN_pyg_temporal_builder = self.create_dynamic_graph_pyg_temporal_shared
+        else:
+            self._DYN_pyg_temporal_builder = self.create_dynamic_graph_pyg_temporal
+
+        # Lazy window dataset
+        if lazy:
+            return self._DYN_window_dataset(match_graphs, interval, round_process_strategy, parse_rate, use_pyg_temporal)
 
 
         # Default strategy
@@ -195,17 +282,18 @@ class TemporalHeteroGraphSnapshot:
         use_pyg_temporal,
     ):
 
-        # Get round numbers
-        rounds = self._EXT_get_round_number_list_(match_graphs)
+        # Index the rounds of the match
+        round_index = GraphRoundIndex(match_graphs)
 
         # Collect all dynamic graphs here
         dynamic_graphs = []
 
-        # Iterate over the rounds
-        for round_number in rounds:
+        # Iterate over the rounds, each round is windowed on its first run of snapshots (GraphRoundIndex.round_segments)
+        for round_segment in round_index.round_segments:
 
-            # Get the graph snapshots of the round
-            round_graphs = self._EXT_get_round_graphs_(match_graphs, round_number)
+            # Position and length of the round in the match graph list
+            round_start = round_segment.start
+            round_length = round_segment.stop - round_segment.start
 
 
 
@@ -214,36 +302,8 @@ class TemporalHeteroGraphSnapshot:
             # ---------------------------------------------------------------------------
 
             # It is probable that the number of snapshots is not devidable by the interval number, thus drop the first n snapshots to make it devidable
-            default_round_graphs = round_graphs[(len(round_graphs) % interval):]
-
-            # Iterate over the remaining snapshots
-            for snpshot_idx in range(0, len(default_round_graphs), interval):
-
-                # Tick control variables
-                first_tick = default_round_graphs[snpshot_idx].y['tick']
-                last_tick = default_round_graphs[snpshot_idx + interval - 1].y['tick']
-                actual_tick = default_round_graphs[snpshot_idx].y['tick']
-
-                # Skip sequence control variable
-                SKIP_SEQUENCE = False
-
-                # VALIDATION - Check if there are missing ticks in the graph sequence
-                for graph in default_round_graphs[snpshot_idx: snpshot_idx + interval]:
-                    if graph.y['tick'] != actual_tick :
-                        print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {graph.y["numerical_match_id"]} at round \
-                            {graph.y["round"]} between ticks {first_tick}-{last_tick}. Skipping the sequence.')
-                        actual_tick += parse_rate
-                        SKIP_SEQUENCE = True
-                        break
-                    actual_tick += parse_rate
-
-                # Create dynamic graphs and add them to the dynamic_graphs list i
-                if not SKIP_SEQUENCE:
-                    if use_pyg_temporal:
-                        dynamic_graph = self.create_dynamic_graph_pyg_temporal(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    else:
-                        dynamic_graph = self.create_dynamic_graph(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    dynamic_graphs.append(dynamic_graph)
+            starts = np.arange(round_length % interval, round_length - interval + 1, interval)
+            dynamic_graphs += self._DYN_create_windows_(match_graphs, round_index, round_start + starts, interval, parse_rate, use_pyg_temporal)
 
             # ---------------------------------------------------------------------------
             #                        Shifted interval splits
@@ -252,7 +312,7 @@ class TemporalHeteroGraphSnapshot:
             if shifted_intervals and interval % 2 == 0:
 
                 # It is probable that the number of snapshots is not devidable by the interval number, thus drop the first n snapshots to make it devidable
-                remaining_graphs_len = len(round_graphs) % interval
+                remaining_graphs_len = round_length % interval
 
                 if remaining_graphs_len < interval/2:
                     start_idx = int(remaining_graphs_len + interval/2)
@@ -260,36 +320,10 @@ class TemporalHeteroGraphSnapshot:
                 if remaining_graphs_len >= interval/2:
                     start_idx = int(remaining_graphs_len - interval/2)
                 
-                end_idx = int(len(round_graphs) - interval/2)
-
-                # Iterate over the remaining snapshots
-                for snpshot_idx in range(start_idx, end_idx, interval):
-
-                    # Tick control variables
-                    first_tick = round_graphs[snpshot_idx].y['tick']
-                    last_tick = round_graphs[snpshot_idx + interval - 1].y['tick']
-                    actual_tick = round_graphs[snpshot_idx].y['tick']
-
-                    # Skip sequence control variable
-                    SKIP_SEQUENCE = False
-
-                    # VALIDATION - Check if there are missing ticks in the graph sequence
-                    for graph in round_graphs[snpshot_idx: snpshot_idx + interval]:
-                        if graph.y['tick'] != actual_tick :
-                            print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {graph.y["numerical_match_id"]} at round \
-                                {graph.y["round"]} between ticks {first_tick}-{last_tick}. Skipping the sequence.')
-                            actual_tick += parse_rate
-                            SKIP_SEQUENCE = True
-                            break
-                        actual_tick += parse_rate
-
-                    # Create dynamic graphs and add them to the dynamic_graphs list i
-                    if not SKIP_SEQUENCE:
-                        if use_pyg_temporal:
-                            dynamic_graph = self.create_dynamic_graph_pyg_temporal(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                        else:
-                            dynamic_graph = self.create_dynamic_graph(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                        dynamic_graphs.append(dynamic_graph)
+                end_idx = int(round_length - interval/2)
+
+                starts = np.arange(start_idx, end_idx, interval)
+                dynamic_graphs += self._DYN_create_windows_(match_graphs, round_index, round_start + starts, interval, parse_rate, use_pyg_temporal)
                 
 
 
@@ -303,89 +337,34 @@ class TemporalHeteroGraphSnapshot:
         use_pyg_temporal,
     ):
 
-        # Get round numbers
-        rounds = self._EXT_get_round_number_list_(match_graphs)
+        # Index the rounds of the match
+        round_index = GraphRoundIndex(match_graphs)
 
         # Collect all dynamic graphs here
         dynamic_graphs = []
 
-        # Iterate over the rounds
-        for round_number in rounds:
+        # Iterate over the rounds, each round is windowed on its first run of snapshots (GraphRoundIndex.round_segments)
+        for round_segment in round_index.round_segments:
 
-            # Get the graph snapshots of the round
-            round_graphs = self._EXT_get_round_graphs_(match_graphs, round_number)
+            # Position and length of the round in the match graph list
+            round_start = round_segment.start
+            round_length = round_segment.stop - round_segment.start
 
             # ---------------------------------------------------------------------------
             #                        Default interval splits
             # ---------------------------------------------------------------------------
 
             # It is probable that the number of snapshots is not devidable by the interval number, thus drop the first n snapshots to make it devidable
-            default_round_graphs = round_graphs[(len(round_graphs) % interval):]
-
-            # Iterate over the remaining snapshots
-            for snpshot_idx in range(0, len(default_round_graphs), interval):
-
-                # Tick control variables
-                first_tick = default_round_graphs[snpshot_idx].y['tick']
-                last_tick = default_round_graphs[snpshot_idx + interval - 1].y['tick']
-                actual_tick = default_round_graphs[snpshot_idx].y['tick']
-
-                # Skip sequence control variable
-                SKIP_SEQUENCE = False
-
-                # VALIDATION - Check if there are missing ticks in the graph sequence
-                for graph in default_round_graphs[snpshot_idx: snpshot_idx + interval]:
-                    if graph.y['tick'] != actual_tick :
-                        print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {graph.y["numerical_match_id"]} at round \
-                            {graph.y["round"]} between ticks {first_tick}-{last_tick}. Skipping the sequence.')
-                        actual_tick += parse_rate
-                        SKIP_SEQUENCE = True
-                        break
-                    actual_tick += parse_rate
-
-                # Create dynamic graphs and add them to the dynamic_graphs list i
-                if not SKIP_SEQUENCE:
-                    if use_pyg_temporal:
-                        dynamic_graph = self.create_dynamic_graph_pyg_temporal(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    else:
-                        dynamic_graph = self.create_dynamic_graph(default_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    dynamic_graphs.append(dynamic_graph)
+            starts = np.arange(round_length % interval, round_length - interval + 1, interval)
+            dynamic_graphs += self._DYN_create_windows_(match_graphs, round_index, round_start + starts, interval, parse_rate, use_pyg_temporal)
 
             # ---------------------------------------------------------------------------
             #                     Interval splits from the start
             # ---------------------------------------------------------------------------
             
-            # It is probable that the number of snapshots is not devidable by the interval number, thus drop the first n snapshots to make it devidable
-            from_start_round_graphs = round_graphs[:len(round_graphs) - (len(round_graphs) % interval)]
-
-            # Iterate over the remaining snapshots
-            for snpshot_idx in range(0, len(from_start_round_graphs), interval):
-
-                # Tick control variables
-                first_tick = from_start_round_graphs[snpshot_idx].y['tick']
-                last_tick = from_start_round_graphs[snpshot_idx + interval - 1].y['tick']
-                actual_tick = from_start_round_graphs[snpshot_idx].y['tick']
-
-                # Skip sequence control variable
-                SKIP_SEQUENCE = False
-
-                # VALIDATION - Check if there are missing ticks in the graph sequence
-                for graph in from_start_round_graphs[snpshot_idx: snpshot_idx + interval]:
-                    if graph.y['tick'] != actual_tick :
-                        print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {graph.y["numerical_match_id"]} at round \
-                            {graph.y["round"]} between ticks {first_tick}-{last_tick}. Skipping the sequence.')
-                        actual_tick += parse_rate
-                        SKIP_SEQUENCE = True
-                        break
-                    actual_tick += parse_rate
-
-                # Create dynamic graphs and add them to the dynamic_graphs list i
-                if not SKIP_SEQUENCE:
-                    if use_pyg_temporal:
-                        dynamic_graph = self.create_dynamic_graph_pyg_temporal(from_start_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    else:
-                        dynamic_graph = self.create_dynamic_graph(from_start_round_graphs[snpshot_idx: snpshot_idx + interval])
-                    dynamic_graphs.append(dynamic_graph)
+            # It is probable that the number of snapshots is not devidable by the interval number, thus drop the last n snapshots to make it devidable
+            starts = np.arange(0, round_length - interval + 1, interval)
+            dynamic_graphs += self._DYN_create_windows_(match_graphs, round_index, round_start + starts, interval, parse_rate, use_pyg_temporal)
                 
 
 
@@ -399,90 +378,120 @@ class TemporalHeteroGraphSnapshot:
         use_pyg_temporal,
     ):
 
-        # Get round numbers
-        rounds = self._EXT_get_round_number_list_(match_graphs)
+        # Index the rounds of the match
+        round_index = GraphRoundIndex(match_graphs)
 
         # Collect all dynamic graphs here
         dynamic_graphs = []
 
-        # Iterate over the rounds
-        for round_number in rounds:
+        # Iterate over the rounds, each round is windowed on its first run of snapshots (GraphRoundIndex.round_segments)
+        for round_segment in round_index.round_segments:
 
             # Get the graph snapshots of the round
-            round_graphs = self._EXT_get_round_graphs_(match_graphs, round_number)
+            round_graphs = match_graphs[round_segment]
 
             # ---------------------------------------------------------------------------
             #                     Whole rounds as dynamic graphs
             # ---------------------------------------------------------------------------
 
-            # First tick of the round
-            actual_tick = round_graphs[0].y['tick']
-
-            # Skip sequence control variable
-            SKIP_SEQUENCE = False
-
             # VALIDATION - Check if there are missing ticks in the graph sequence
-            for graph in round_graphs:
-                if graph.y['tick'] != actual_tick:
-                    print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {graph.y["numerical_match_id"]} at round \
-                        {graph.y["round"]}. Skipping the round.')
-                    actual_tick += parse_rate
-                    SKIP_SEQUENCE = True
-                    break
-                actual_tick += parse_rate
-
-            # Create dynamic graphs and add them to the dynamic_graphs list i
-            if not SKIP_SEQUENCE:
-                if use_pyg_temporal:
-                    dynamic_graph = self.create_dynamic_graph_pyg_temporal(round_graphs)
-                else:
-                    dynamic_graph = self.create_dynamic_graph(round_graphs)
-                dynamic_graphs.append(dynamic_graph)
+            if not round_index.valid_windows([round_segment.start], len(round_graphs), parse_rate)[0]:
+                print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {round_graphs[0].y["numerical_match_id"]} at round \
+                    {round_graphs[0].y["round"]}. Skipping the round.')
+                continue
+
+            # Create dynamic graphs and add them to the dynamic_graphs list
+            if use_pyg_temporal:
+                dynamic_graph = self._DYN_pyg_temporal_builder(round_graphs)
+            else:
+                dynamic_graph = self.create_dynamic_graph(round_graphs)
+            dynamic_graphs.append(dynamic_graph)
                 
 
 
         return dynamic_graphs
-    
 
+    def _DYN_window_dataset(
+        self,
+        match_graphs,
+        interval,
+        round_process_strategy,
+        parse_rate,
+        use_pyg_temporal,
+    ):
 
-    # --------------------------------------------------------------------------------------------
-    # REGION: Other methods
-    # --------------------------------------------------------------------------------------------
+        # Window parameters of the strategies
+        window_config = {
+            'default': {'length': interval, 'stride': interval, 'align': 'end'},
+            # The default and the shifted splits together are the end aligned windows with half interval stride
+            'shifted': {'length': interval, 'stride': interval // 2, 'align': 'end'},
+            'start_end': {'length': interval, 'stride': interval, 'align': 'both'},
+            'round': {'length': None, 'stride': None, 'align': 'end'},
+        }[round_process_strategy]
+
+        return TemporalWindowDataset(
+            match_graphs,
+            parse_rate=parse_rate,
+            transform=self._DYN_pyg_temporal_builder if use_pyg_temporal else None,
+            **window_config
+        )
 
-    def _EXT_get_round_number_list_(self, graphs):
+    def _DYN_create_windows_(
+        self,
+        match_graphs,
+        round_index,
+        starts,
+        interval,
+        parse_rate,
+        use_pyg_temporal,
+    ):
 
-        # Store the unique round numbers
-        round_numbers = []
+        # VALIDATION - Check every window for missing ticks at once
+        valid = round_index.valid_windows(starts, interval, parse_rate)
 
-        # Check the graphs and add new round numbers
-        for graph in graphs:
-            if (graph.y['round'] not in round_numbers):
-                round_numbers.append(graph.y['round'])
+        # Collect the dynamic graphs of the valid windows
+        dynamic_graphs = []
 
-        return round_numbers
+        for start, is_valid in zip(starts.tolist(), valid.tolist()):
 
-    def _EXT_get_round_graphs_(self, graphs, round_number):
+            window_graphs = match_graphs[start: start + interval]
 
-        # Store the graphs of the round
-        round_graphs = []
+            if not is_valid:
+                first_tick = round_index.ticks[start]
+                last_tick = round_index.ticks[start + interval - 1]
+                print(colored('Error:', "red", attrs=["bold"]) + f'Error: There are missing ticks in the graph sequence. The error occured while parsing match {window_graphs[0].y["numerical_match_id"]} at round \
+                    {window_graphs[0].y["round"]} between ticks {first_tick}-{last_tick}. Skipping the sequence.')
+                continue
 
-        # Iterate over the graphs
-        for graph in graphs:
+            # Create dynamic graphs and add them to the dynamic_graphs list
+            if use_pyg_temporal:
+                dynamic_graph = self._DYN_pyg_temporal_builder(window_graphs)
+            else:
+                dynamic_graph = self.create_dynamic_graph(window_graphs)
+            dynamic_graphs.append(dynamic_graph)
 
-            # If it's not yet the correct round number, continue
-            if graph.y['round'] != round_number and len(round_graphs) == 0:
-                continue
+        return dynamic_graphs
 
-            # If it's the correct number, add the graph to the round_graphs list
-            elif graph.y['round'] == round_number:
-                round_graphs.append(graph)
 
-            # After all graphs were added, break the loop
-            elif graph.y['round'] != round_number and len(round_graphs) != 0:
-                break
 
-        return round_graphs
-    
+    # --------------------------------------------------------------------------------------------
+    # REGION: Other methods
+    # --------------------------------------------------------------------------------------------
+
+    def _EXT_shared_ones_(self, kind: str, size: int):
+
+        # Unit arrays are allocated once per size, as numpy arrays, the dtype of which PyG Temporal inspects on indexing
+        if (kind, size) not in self._shared_tensors:
+            self._shared_tensors[(kind, size)] = np.ones(size, dtype=np.float32)
+
+        return self._shared_tensors[(kind, size)]
 
+    def _EXT_shared_map_edge_index_(self, edge_index: torch.Tensor):
 
+        # The map edges are converted once per map, later windows reuse the tensor if their map edges are the same
+        shared_edge_index = self._shared_tensors.get('map_edge_index')
+        if shared_edge_index is None or shared_edge_index.shape != edge_index.shape or not torch.equal(shared_edge_index, edge_index.long()):
+            shared_edge_index = edge_index.long()
+            self._shared_tensors['map_edge_index'] = shared_edge_index
 
+        return shared_edge_index
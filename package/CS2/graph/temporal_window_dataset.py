@@ -0,0 +1,192 @@
+import torch
+from torch_geometric.data import HeteroData
+from termcolor import colored
+from .graph_round_index import GraphRoundIndex
+from .match_graph_store import MatchGraphDataset
+
+import numpy as np
+
+
+class TemporalWindowDataset(torch.utils.data.Dataset):
+    """
+    Lazy sliding-window dataset over the graph snapshots of one or more matches.
+    Only the (start, length) index pairs of the windows are stored, the windows are materialized as lists of graphs
+    on __getitem__, so the dataset can be used in place of the dynamic graph lists of TemporalHeteroGraphSnapshot.
+    Windows never cross round (or match) boundaries and windows with missing ticks are skipped. The windows of a round
+    of a match are built from its first run of snapshots (GraphRoundIndex.round_segments), like the eager strategies of
+    TemporalHeteroGraphSnapshot, a later run of the same round number is not windowed.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(
+        self,
+        graphs,
+        length=10,
+        stride=None,
+        align: str = 'end',
+        parse_rate: int = 16,
+        transform=None,
+        round_index: GraphRoundIndex = None
+    ):
+        """
+        Parameters:
+        - graphs: the graph snapshots, ordered by match and tick. Can be a list of HeteroData objects or a MatchGraphDataset.
+        - length: the number of snapshots in a window. Can be an integer, None for whole rounds, or a callable receiving \
+          the round number and the number of snapshots of the round and returning the window length of the round. Default is 10.
+        - stride: the number of snapshots between the starts of two windows. Can be an integer, None for the window length \
+          (non-overlapping windows), or a callable like for the length. Default is None.
+        - align: 'end' aligns the windows to the end of the rounds and drops the first snapshots that do not fill a window, \
+          'start' aligns them to the start of the rounds, 'both' creates both window sets. Default is 'end'.
+        - parse_rate: the time between two snapshots in tick number, used to skip windows with missing ticks. Default is 16.
+        - transform: optional callable applied to the list of graphs of a window, e.g. \
+          TemporalHeteroGraphSnapshot().create_dynamic_graph_pyg_temporal. Default is None.
+        - round_index: a GraphRoundIndex of the graphs, to avoid indexing the graphs again. Default is None.
+        """
+
+        # Check the alignment
+        if align not in ['end', 'start', 'both']:
+            raise ValueError("The align must be one of the following: 'end', 'start', 'both'.")
+
+        self.graphs = graphs
+        self.length = length
+        self.stride = stride
+        self.align = align
+        self.parse_rate = parse_rate
+        self.transform = transform
+
+        # Index the rounds of the graphs
+        if round_index is None:
+            if isinstance(graphs, MatchGraphDataset):
+                round_index = GraphRoundIndex.from_match_graph_dataset(graphs)
+            else:
+                round_index = GraphRoundIndex(graphs)
+
+        self.round_index = round_index
+
+        # (start, length) pairs of the windows
+        self.windows = self._INIT_windows_()
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Dataset methods
+    # --------------------------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def __getitem__(self, idx: int) -> list[HeteroData]:
+
+        start, length = self.windows[idx].tolist()
+
+        # Lists are sliced, datasets are indexed graph by graph
+        if isinstance(self.graphs, list):
+            window = self.graphs[start:start + length]
+        else:
+            window = [self.graphs[graph_idx] for graph_idx in range(start, start + length)]
+
+        if self.transform is not None:
+            return self.transform(window)
+
+        return window
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def rewindow(self, length=None, stride=None, align: str = None, parse_rate: int = None):
+        """
+        Return a new TemporalWindowDataset over the same graphs with other window parameters. The round index is reused,
+        so the graphs are not indexed again. Parameters left None keep their current values.
+        Parameters:
+        - length: the new window length.
+        - stride: the new stride.
+        - align: the new alignment.
+        - parse_rate: the new parse rate.
+        """
+
+        return TemporalWindowDataset(
+            self.graphs,
+            length=self.length if length is None else length,
+            stride=self.stride if stride is None else stride,
+            align=self.align if align is None else align,
+            parse_rate=self.parse_rate if parse_rate is None else parse_rate,
+            transform=self.transform,
+            round_index=self.round_index
+        )
+
+    def window_lengths(self) -> np.ndarray:
+        """
+        Return the length of every window.
+        """
+        return self.windows[:, 1]
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _INIT_windows_(self) -> np.ndarray:
+
+        starts = []
+        lengths = []
+
+        for segment in self.round_index.round_segments:
+
+            segment_length = segment.stop - segment.start
+            round_number = float(self.round_index.rounds[segment.start])
+
+            # Window length and stride of the round
+            length = self.__EXT_resolve_(self.length, round_number, segment_length)
+            length = segment_length if length is None else length
+            stride = self.__EXT_resolve_(self.stride, round_number, segment_length)
+            stride = length if stride is None else stride
+
+            if not isinstance(length, (int, np.integer)) or length < 1 or not isinstance(stride, (int, np.integer)) or stride < 1:
+                raise ValueError("The window length and stride must be positive integers.")
+
+            # The round is shorter than a window
+            if segment_length < length:
+                continue
+
+            # Window starts in the round
+            segment_starts = []
+            if self.align in ['end', 'both']:
+                segment_starts.append(np.arange(segment_length - length, -1, -stride)[::-1])
+            if self.align in ['start', 'both']:
+                segment_starts.append(np.arange(0, segment_length - length + 1, stride))
+
+            segment_starts = segment.start + np.concatenate(segment_starts)
+            starts.append(segment_starts)
+            lengths.append(np.full(len(segment_starts), length))
+
+        if len(starts) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        starts = np.concatenate(starts)
+        lengths = np.concatenate(lengths)
+
+        # VALIDATION - Skip the windows with missing ticks
+        valid = np.zeros(len(starts), dtype=bool)
+        for length in np.unique(lengths):
+            mask = lengths == length
+            valid[mask] = self.round_index.valid_windows(starts[mask], int(length), self.parse_rate)
+
+        if not valid.all():
+            print(colored('Warning:', "yellow", attrs=["bold"]) + f' {int((~valid).sum())} windows with missing ticks were skipped.')
+
+        return np.stack([starts[valid], lengths[valid]], axis=1).astype(np.int64)
+
+    def __EXT_resolve_(self, value, round_number: float, round_length: int):
+
+        # Per round values are given by a callable
+        if callable(value):
+            return value(round_number, round_length)
+
+        return value
@@ -16,7 +16,7 @@ import sys
 import os
 
 # CS2
-from CS2.graph import TabularGraphSnapshot, HeteroGraphSnapshot
+from CS2.graph import TabularGraphSnapshot, HeteroGraphSnapshot, MapGraph
 from CS2.token import Tokenizer
 from CS2.preprocess import Dictionary, NormalizePosition, NormalizeTabularGraphSnapshot, ImputeTabularGraphSnapshot
 from CS2.visualize import HeteroGraphVisualizer
@@ -121,15 +121,15 @@ class GraphParser:
         its = ImputeTabularGraphSnapshot()
         df = its.impute(df)
 
-        # Map nodes dataset
+        # Map graph artifact, built from the nodes and edges datasets once and cached in the user cache directory ($XDG_CACHE_HOME)
         if self.NORMALIZE:
-            nodes = pd.read_csv(self.PATH_NODDES_NORM)
+            map_graph = MapGraph.load(self.PATH_NODES_NORM, self.PATH_EDGES)
         else:
-            nodes = pd.read_csv(self.PATH_NODDES)
+            map_graph = MapGraph.load(self.PATH_NODDES, self.PATH_EDGES)
 
         # Tokenize match
         tokenizer = Tokenizer()
-        df = tokenizer.tokenize_match(df, 'de_inferno', nodes)
+        df = tokenizer.tokenize_match(df, 'de_inferno', map_graph)
 
 
 
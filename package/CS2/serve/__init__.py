@@ -0,0 +1,2 @@
+from .micro_batcher import MicroBatcher
+from .win_probability_server import WinProbabilityServer
\ No newline at end of file
@@ -0,0 +1,174 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+import queue
+import threading
+import time
+
+
+class MicroBatcher:
+    """
+    Micro-batching of concurrent prediction requests. Requests (lists of items, e.g. graph snapshots) are queued and
+    a background thread concatenates the queued requests into one batch, waiting at most max_latency_ms after the
+    first request of the batch for more requests, or until max_batch_size items are collected. The batch is passed
+    to predict_fn in a single call and the results are split back to the requests. If a batch of several requests
+    fails, its requests are retried one by one, so an invalid request only fails itself.
+    """
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, predict_fn, max_batch_size: int = 256, max_latency_ms: float = 10.0):
+        """
+        Parameters:
+        - predict_fn: callable receiving a list of items and returning a numpy array with one value per item.
+        - max_batch_size: the maximum number of items in a batch. A single larger request is run as its own batch. Default is 256.
+        - max_latency_ms: the latency budget, the maximum time to wait for more requests after the first request of a batch. Default is 10.0.
+        """
+
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError('The max_batch_size must be a positive integer.')
+        if max_latency_ms < 0:
+            raise ValueError('The max_latency_ms must not be negative.')
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+
+        # Batch statistics
+        self.batches = 0
+        self.items = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    def start(self):
+        """
+        Start the batching thread.
+        """
+
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._RUN_loop_, name='MicroBatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the batching thread after the queued requests are processed.
+        """
+
+        if not self._running:
+            return
+
+        self._running = False
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, items: list) -> Future:
+        """
+        Queue a request. Returns a Future resolving to the numpy array of the predictions of the items.
+        Parameters:
+        - items: the items of the request.
+        """
+
+        if not self._running:
+            raise RuntimeError('The MicroBatcher is not running, call start first.')
+
+        future = Future()
+
+        if len(items) == 0:
+            future.set_result(np.empty(0, dtype=np.float32))
+            return future
+
+        self._queue.put((list(items), future))
+        return future
+
+    def predict(self, items: list, timeout: float = None) -> np.ndarray:
+        """
+        Queue a request and wait for its predictions.
+        Parameters:
+        - items: the items of the request.
+        - timeout: the maximum time to wait in seconds. Default is None, which waits indefinitely.
+        """
+        return self.submit(items).result(timeout)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _RUN_loop_(self):
+
+        pending = None
+
+        while True:
+
+            # First request of the batch, a request left over from the previous batch comes first
+            request = pending if pending is not None else self._queue.get()
+            pending = None
+
+            if request is None:
+                break
+
+            requests = [request]
+            size = len(request[0])
+            deadline = time.perf_counter() + self.max_latency
+
+            # Collect requests until the batch is full or the latency budget is spent
+            while size < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                # Stop signal or a request not fitting into the batch
+                if request is None or size + len(request[0]) > self.max_batch_size:
+                    pending = request
+                    break
+
+                requests.append(request)
+                size += len(request[0])
+
+            self._RUN_batch_(requests)
+
+            if pending is None and not self._running and self._queue.empty():
+                break
+
+    def _RUN_batch_(self, requests: list):
+
+        items = [item for request_items, _ in requests for item in request_items]
+
+        try:
+            predictions = np.asarray(self.predict_fn(items))
+        except Exception as exception:
+
+            # Isolate the failing request
+            if len(requests) > 1:
+                for request in requests:
+                    self._RUN_batch_([request])
+                return
+
+            requests[0][1].set_exception(exception)
+            return
+
+        self.batches += 1
+        self.items += len(items)
+
+        # Split the predictions back to the requests
+        offset = 0
+        for request_items, future in requests:
+            future.set_result(predictions[offset:offset + len(request_items)])
+            offset += len(request_items)
@@ -0,0 +1,325 @@
+import torch
+
+import pandas as pd
+import numpy as np
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import threading
+
+from ..graph.hetero_graph_data import HeteroGraphData
+from ..graph.hetero_graph_lime_sampler import HeteroGraphLIMESampler
+from ..graph.hetero_graph_snapshot import HeteroGraphSnapshot
+from ..graph.map_graph import MapGraph
+from ..analyze.hetero_gnn_export import HeterogeneousGNNExport
+from ..analyze.hetero_gnn_runtime import HeteroGNNRuntime
+from ..analyze.inference_engine import InferenceEngine
+from .micro_batcher import MicroBatcher
+
+
+class WinProbabilityServer:
+    """
+    Local HTTP inference server returning the CT win probabilities of snapshots. Concurrent requests are
+    micro-batched (see MicroBatcher) within the max_latency_ms latency budget. Endpoints:
+    - GET /health: the server status and the batching statistics.
+    - POST /predict/rows: JSON body {"rows": [...], "active_infernos": [...], "active_smokes": [...], "active_he_explosions": [...]}.
+      The rows are normalized tabular snapshot rows (the columns of process_match after normalization), the grenade lists
+      are optional records with 'tick', 'X', 'Y', 'Z' keys. The rows are converted with HeteroGraphSnapshot.
+    - POST /predict/graphs: an .npz body (numpy.savez) with the player_x, map_x, player_map_targets and graph_features
+      arrays of the HeterogeneousGNNExport signature. Only plain arrays are accepted, pickled objects are rejected.
+    Both prediction endpoints return {"proba": [...]}, aligned to the input snapshots. Invalid requests get a 400
+    response with an {"error": ...} body.
+    """
+
+    # Arrays of the /predict/graphs body, in the order of the HeterogeneousGNNExport signature
+    GRAPH_ARRAYS = ['player_x', 'map_x', 'player_map_targets', 'graph_features']
+
+    # Feature widths of the player nodes, map nodes and graph-level features of the snapshots
+    NUM_PLAYER_FEATURES = len(HeteroGraphLIMESampler.player_columns)
+    NUM_MAP_FEATURES = len(MapGraph.NODE_FEATURES)
+    NUM_GRAPH_FEATURES = len(HeteroGraphData.GRAPH_FEATURES)
+
+    # Columns of the grenade records of the /predict/rows body
+    GRENADE_COLUMNS = ['tick', 'X', 'Y', 'Z']
+
+    # Listen backlog of the server socket, concurrent clients beyond the backlog get their connections reset
+    REQUEST_QUEUE_SIZE = 128
+
+    # Maximum size of a request body in bytes
+    MAX_BODY_SIZE = 64 * 2**20
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(
+        self,
+        model,
+        map_graph: MapGraph,
+        CONFIG_MOLOTOV_RADIUS: dict,
+        CONFIG_SMOKE_RADIUS: dict,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        max_batch_size: int = 256,
+        max_latency_ms: float = 10.0,
+        player_self_edges: bool = True
+    ):
+        """
+        Parameters:
+        - model: a HeteroGNNRuntime, or a trained HeterogeneousGNN (with initialized lazy layers) run on the CPU in eager mode. \
+          A model on another device is copied to the CPU, the given model is not moved.
+        - map_graph: the MapGraph artifact of the map.
+        - CONFIG_MOLOTOV_RADIUS: the molotov and incendiary grenade radius values.
+        - CONFIG_SMOKE_RADIUS: the smoke grenade radius values.
+        - host: the host address to bind. Default is '127.0.0.1'.
+        - port: the port to bind, 0 selects a free port. Default is 8000.
+        - max_batch_size: the maximum number of snapshots in an inference batch. Default is 256.
+        - max_latency_ms: the latency budget, the maximum time a request waits for other requests to batch with. Default is 10.0.
+        - player_self_edges: whether the model uses the player self edges, only used for HeterogeneousGNN models. Default is True.
+        """
+
+        if not isinstance(map_graph, MapGraph):
+            raise ValueError('The map_graph should be a MapGraph object.')
+
+        self.map_graph = map_graph
+        self.CONFIG_MOLOTOV_RADIUS = CONFIG_MOLOTOV_RADIUS
+        self.CONFIG_SMOKE_RADIUS = CONFIG_SMOKE_RADIUS
+
+        # Prediction function on the stacked tensors
+        if isinstance(model, HeteroGNNRuntime):
+            self.model = model
+        else:
+            self.model = HeterogeneousGNNExport(InferenceEngine.model_on_device(model, 'cpu'), map_graph.edge_index, player_self_edges=player_self_edges).eval()
+
+        self.batcher = MicroBatcher(self._PREDICT_batch_, max_batch_size=max_batch_size, max_latency_ms=max_latency_ms)
+        self.httpd = ThreadingHTTPServer((host, port), self._HTTP_handler_class_(), bind_and_activate=False)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = self.REQUEST_QUEUE_SIZE
+        try:
+            self.httpd.server_bind()
+            self.httpd.server_activate()
+        except OSError:
+            self.httpd.server_close()
+            raise
+
+        self._thread = None
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def address(self) -> str:
+        """
+        The base URL of the server.
+        """
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+        Start the server in a background thread.
+        """
+
+        self.batcher.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='WinProbabilityServer', daemon=True)
+        self._thread.start()
+
+        return self
+
+    def serve_forever(self):
+        """
+        Run the server in the calling thread until interrupted.
+        """
+
+        self.batcher.start()
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+            self.batcher.stop()
+
+    def shutdown(self):
+        """
+        Stop the server started with start.
+        """
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.stop()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def predict_rows(self, rows: pd.DataFrame, active_infernos: pd.DataFrame = None, active_smokes: pd.DataFrame = None, active_he_explosions: pd.DataFrame = None) -> np.ndarray:
+        """
+        Convert normalized tabular snapshot rows to graphs and predict their CT win probabilities through the batcher.
+        Parameters:
+        - rows: the normalized tabular snapshot rows.
+        - active_infernos: the active infernos of the rows' ticks. Default is None, which means no infernos.
+        - active_smokes: the active smokes of the rows' ticks. Default is None, which means no smokes.
+        - active_he_explosions: the active HE grenade explosions of the rows' ticks. Default is None, which means no explosions.
+        """
+
+        grenades = [
+            pd.DataFrame(columns=self.GRENADE_COLUMNS) if frame is None else frame
+            for frame in [active_infernos, active_smokes, active_he_explosions]
+        ]
+
+        # Live snapshots have no label
+        if 'UNIVERSAL_CT_wins' not in rows.columns:
+            rows = rows.assign(UNIVERSAL_CT_wins=0)
+
+        graphs = HeteroGraphSnapshot().process_snapshots(
+            rows.reset_index(drop=True),
+            None,
+            None,
+            *grenades,
+            self.CONFIG_MOLOTOV_RADIUS,
+            self.CONFIG_SMOKE_RADIUS,
+            graph_features_as_tensor=True,
+            map_graph=self.map_graph
+        )
+
+        return self.predict_arrays(*[tensor.numpy() for tensor in HeterogeneousGNNExport.graph_tensors(graphs)])
+
+    def predict_arrays(self, player_x, map_x, player_map_targets, graph_features) -> np.ndarray:
+        """
+        Predict the CT win probabilities of snapshots given in the HeterogeneousGNNExport signature through the batcher.
+        Parameters:
+        - player_x: the player node features, shape (B, 10, NUM_PLAYER_FEATURES).
+        - map_x: the map node features, shape (B, map_nodes, NUM_MAP_FEATURES).
+        - player_map_targets: the map node targets of the player->map edges, shape (B, 10).
+        - graph_features: the graph-level features, shape (B, NUM_GRAPH_FEATURES), column order is HeteroGraphData.GRAPH_FEATURES.
+        """
+
+        arrays = [np.asarray(player_x), np.asarray(map_x), np.asarray(player_map_targets), np.asarray(graph_features)]
+
+        # Validate the shapes, a malformed request must not fail the batch it is grouped with
+        if arrays[0].ndim != 3 or arrays[1].ndim != 3 or arrays[2].ndim != 2 or arrays[3].ndim != 2:
+            raise ValueError('The arrays should have the shapes (B, 10, F_player), (B, map_nodes, F_map), (B, 10) and (B, G).')
+        if len(set(len(array) for array in arrays)) != 1:
+            raise ValueError('The arrays should have the same number of snapshots.')
+        if arrays[0].shape[1] != 10 or arrays[2].shape[1] != 10:
+            raise ValueError('The snapshots should have 10 player nodes.')
+        if arrays[1].shape[1] != self.map_graph.num_nodes:
+            raise ValueError(f'The snapshots should have {self.map_graph.num_nodes} map nodes.')
+        if arrays[0].shape[2] != self.NUM_PLAYER_FEATURES:
+            raise ValueError(f'The player nodes should have {self.NUM_PLAYER_FEATURES} features.')
+        if arrays[1].shape[2] != self.NUM_MAP_FEATURES:
+            raise ValueError(f'The map nodes should have {self.NUM_MAP_FEATURES} features.')
+        if arrays[3].shape[1] != self.NUM_GRAPH_FEATURES:
+            raise ValueError(f'The graph_features should have {self.NUM_GRAPH_FEATURES} columns.')
+        if arrays[2].size > 0 and (arrays[2].min() < 0 or arrays[2].max() >= self.map_graph.num_nodes):
+            raise ValueError('The player_map_targets should be map node ids.')
+
+        # One batcher item per snapshot
+        return self.batcher.predict(list(zip(*arrays)))
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _PREDICT_batch_(self, items: list) -> np.ndarray:
+
+        player_x, map_x, player_map_targets, graph_features = [np.stack(arrays) for arrays in zip(*items)]
+
+        if isinstance(self.model, HeteroGNNRuntime):
+            return self.model.predict(player_x, map_x, player_map_targets, graph_features)
+
+        with torch.inference_mode():
+            return self.model(
+                torch.as_tensor(player_x, dtype=torch.float32),
+                torch.as_tensor(map_x, dtype=torch.float32),
+                torch.as_tensor(player_map_targets, dtype=torch.long),
+                torch.as_tensor(graph_features, dtype=torch.float32),
+            ).numpy()
+
+    def _PARSE_rows_body_(self, body: bytes) -> np.ndarray:
+
+        request = json.loads(body)
+
+        if not isinstance(request, dict) or not isinstance(request.get('rows'), list) or len(request['rows']) == 0:
+            raise ValueError('The request should be a JSON object with a non-empty "rows" list.')
+
+        grenades = [
+            pd.DataFrame(request.get(key) or [], columns=self.GRENADE_COLUMNS)
+            for key in ['active_infernos', 'active_smokes', 'active_he_explosions']
+        ]
+
+        return self.predict_rows(pd.DataFrame(request['rows']), *grenades)
+
+    def _PARSE_graphs_body_(self, body: bytes) -> np.ndarray:
+
+        with np.load(io.BytesIO(body), allow_pickle=False) as arrays:
+
+            missing = [name for name in self.GRAPH_ARRAYS if name not in arrays.files]
+            if len(missing) > 0:
+                raise ValueError(f'The request is missing the arrays: {missing}.')
+
+            return self.predict_arrays(*[arrays[name] for name in self.GRAPH_ARRAYS])
+
+    def _HTTP_handler_class_(self):
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            # Send the small JSON responses without waiting for the delayed ACKs of the keep-alive connections
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path == '/health':
+                    self._send(200, {'status': 'ok', 'batches': server.batcher.batches, 'snapshots': server.batcher.items})
+                else:
+                    self._send(404, {'error': f'Unknown path: {self.path}'})
+
+            def do_POST(self):
+
+                parsers = {'/predict/rows': server._PARSE_rows_body_, '/predict/graphs': server._PARSE_graphs_body_}
+                if self.path not in parsers:
+                    self._send(404, {'error': f'Unknown path: {self.path}'})
+                    return
+
+                length = int(self.headers.get('Content-Length', 0))
+                if length > server.MAX_BODY_SIZE:
+                    self._send(413, {'error': 'The request body is too large.'})
+                    return
+
+                try:
+                    proba = parsers[self.path](self.rfile.read(length))
+                except (ValueError, KeyError, TypeError, OSError) as exception:
+                    self._send(400, {'error': f'{type(exception).__name__}: {exception}'})
+                    return
+                except Exception as exception:
+                    self._send(500, {'error': f'{type(exception).__name__}: {exception}'})
+                    return
+
+                self._send(200, {'proba': np.asarray(proba, dtype=np.float64).tolist()})
+
+            def _send(self, status: int, content: dict):
+
+                body = json.dumps(content).encode()
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1 +1,3 @@
-from .tokenizer import Tokenizer
\ No newline at end of file
+from .tokenizer import Tokenizer
+from .token_codec import TokenCodec
+from .token_index import TokenIndex
\ No newline at end of file
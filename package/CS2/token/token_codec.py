@@ -0,0 +1,172 @@
+import numpy as np
+
+
+class TokenCodec:
+    """
+    Packed fixed-width binary encoding of the snapshot tokens of the Tokenizer. A token is a (num_bytes,) uint8 row,
+    the fields are stored most significant bit first in the following order, zero padded to whole bytes:
+    - CT_POS, T_POS: the alive player count of the side at each position of position_names, POSITION_BITS bits each.
+    - CT_BUY, T_BUY, CT_SCORE, T_SCORE, A_PLANT, B_PLANT, AFTERPLANT, CT_WINS: the scalar FIELDS.
+    The round outcome (CT_WINS) is the last field, `keys` masks it out by default, so the keys of the same situation
+    are equal regardless of the outcome. Tokens are compared and hashed as fixed-width bytes (see `to_bytes`).
+    """
+
+    # Bits of the alive player count of a side at a position
+    POSITION_BITS = 3
+
+    # Position histogram fields, one value per position
+    POSITION_FIELDS = ['CT_POS', 'T_POS']
+
+    # Scalar fields and their widths in bits, in token order
+    FIELDS = [
+        ('CT_BUY', 2),
+        ('T_BUY', 2),
+        ('CT_SCORE', 6),
+        ('T_SCORE', 6),
+        ('A_PLANT', 1),
+        ('B_PLANT', 1),
+        ('AFTERPLANT', 2),
+        ('CT_WINS', 1),
+    ]
+
+    # Field of the round outcome
+    OUTCOME_FIELD = 'CT_WINS'
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, position_names: list):
+        """
+        Parameters:
+        - position_names: the position names of the position histograms, in token order (e.g. Tokenizer.INFERNO_POSITIONS).
+        """
+
+        self.position_names = [str(pos) for pos in position_names]
+
+        # name -> (first bit, bits per value, number of values)
+        self.layout = {}
+        bit = 0
+        for name in self.POSITION_FIELDS:
+            self.layout[name] = (bit, self.POSITION_BITS, len(self.position_names))
+            bit += self.POSITION_BITS * len(self.position_names)
+        for name, width in self.FIELDS:
+            self.layout[name] = (bit, width, 1)
+            bit += width
+
+        self.num_bits = bit
+        self.num_bytes = (bit + 7) // 8
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def field_names(self) -> list:
+        return list(self.layout.keys())
+
+    def encode(self, fields: dict) -> np.ndarray:
+        """
+        Pack the field values of snapshots into tokens. Returns a uint8 array of shape (rows, num_bytes).
+        Parameters:
+        - fields: field name -> integer values. CT_POS and T_POS have the shape (rows, len(position_names)), the scalar
+          fields the shape (rows,). Every field of field_names is required.
+        """
+
+        missing = [name for name in self.layout if name not in fields]
+        if len(missing) > 0:
+            raise ValueError(f'The fields are missing: {missing}.')
+
+        num_rows = len(np.asarray(fields[self.POSITION_FIELDS[0]]))
+        bits = np.zeros((num_rows, self.num_bytes * 8), dtype=np.uint8)
+
+        for name, (start, width, count) in self.layout.items():
+
+            values = np.asarray(fields[name]).astype(np.int64).reshape(num_rows, count)
+            if values.size > 0 and (values.min() < 0 or values.max() >= 2**width):
+                raise ValueError(f'The {name} values should be between 0 and {2**width - 1}.')
+
+            # Most significant bit first
+            shifts = np.arange(width - 1, -1, -1)
+            bits[:, start:start + width * count] = ((values[:, :, None] >> shifts) & 1).reshape(num_rows, width * count)
+
+        return np.packbits(bits, axis=1)
+
+    def decode(self, tokens: np.ndarray) -> dict:
+        """
+        Unpack tokens into their field values. Returns the field name -> values dictionary of `encode`.
+        Parameters:
+        - tokens: the tokens, uint8 array of shape (rows, num_bytes) or fixed-width bytes of shape (rows,).
+        """
+
+        tokens = self.from_bytes(tokens)
+        bits = np.unpackbits(tokens, axis=1).astype(np.int64)
+
+        fields = {}
+        for name, (start, width, count) in self.layout.items():
+            weights = 1 << np.arange(width - 1, -1, -1)
+            values = (bits[:, start:start + width * count].reshape(len(tokens), count, width) * weights).sum(axis=2)
+            fields[name] = values if name in self.POSITION_FIELDS else values[:, 0]
+
+        return fields
+
+    def mask(self, fields: list) -> np.ndarray:
+        """
+        Returns the (num_bytes,) uint8 bit mask of the given fields.
+        Parameters:
+        - fields: the field names.
+        """
+
+        bits = np.zeros(self.num_bytes * 8, dtype=np.uint8)
+        for name in fields:
+            if name not in self.layout:
+                raise ValueError(f'Unknown token field: {name}. The fields are: {self.field_names}.')
+            start, width, count = self.layout[name]
+            bits[start:start + width * count] = 1
+
+        return np.packbits(bits)
+
+    def keys(self, tokens: np.ndarray, fields: list = None) -> np.ndarray:
+        """
+        Returns the lookup keys of tokens: the tokens with only the bits of the given fields kept, as fixed-width bytes.
+        Parameters:
+        - tokens: the tokens, uint8 array of shape (rows, num_bytes) or fixed-width bytes of shape (rows,).
+        - fields: the fields of the key. Default is None, which uses every field except the OUTCOME_FIELD.
+        """
+
+        if fields is None:
+            fields = [name for name in self.layout if name != self.OUTCOME_FIELD]
+
+        return self.to_bytes(self.from_bytes(tokens) & self.mask(fields))
+
+    def to_bytes(self, tokens: np.ndarray) -> np.ndarray:
+        """
+        Returns the tokens as a fixed-width bytes array of shape (rows,), e.g. to store them in a dataframe column.
+        Parameters:
+        - tokens: the uint8 tokens, shape (rows, num_bytes).
+        """
+
+        tokens = np.ascontiguousarray(tokens, dtype=np.uint8)
+        return tokens.view(f'S{self.num_bytes}').reshape(len(tokens))
+
+    def from_bytes(self, tokens) -> np.ndarray:
+        """
+        Returns the tokens as a uint8 array of shape (rows, num_bytes).
+        Parameters:
+        - tokens: the tokens as fixed-width bytes (a bytes array or a sequence of bytes objects), or already as uint8 rows.
+        """
+
+        tokens = np.asarray(tokens)
+
+        if tokens.dtype == np.uint8:
+            if tokens.ndim != 2 or tokens.shape[1] != self.num_bytes:
+                raise ValueError(f'The tokens should have the shape (rows, {self.num_bytes}).')
+            return tokens
+
+        # Fixed-width bytes, the trailing zero bytes dropped by numpy are padded back
+        tokens = np.ascontiguousarray(tokens.astype(f'S{self.num_bytes}'))
+        return tokens.view(np.uint8).reshape(len(tokens), self.num_bytes)
@@ -0,0 +1,271 @@
+import pandas as pd
+import numpy as np
+
+import os
+
+from .token_codec import TokenCodec
+
+
+class TokenIndex:
+    """
+    Inverted index of packed snapshot tokens (see Tokenizer.tokenize_match_packed) across matches, saved to disk as an
+    .npz file. Maps the key of a token (TokenCodec.keys of the key_fields, by default every field except the CT_WINS
+    outcome) to its occurrences, so the snapshots of a situation and the historical CT win rate of the situation are
+    looked up without reading the snapshot files. Holds:
+    - keys: the unique keys, sorted fixed-width bytes, shape (K,).
+    - indptr: the occurrences of key i are rows indptr[i]:indptr[i+1] of the occurrence arrays, shape (K + 1,).
+    - match_idx, rounds, ticks, ct_wins: the match (index into match_ids), round, tick and round outcome of each
+      occurrence, shape (O,), grouped by key in insertion order.
+    - round_counts, ct_round_wins: the number of distinct (match, round) pairs of each key and the CT wins among them,
+      shape (K,). Win rates are computed over rounds, so long rounds do not weigh more than short ones.
+    - match_ids: the match ids.
+    Matches added with add_match are merged into the arrays on the first lookup or on save.
+    """
+
+    # Arrays saved to the index file
+    ARRAYS = ['keys', 'indptr', 'match_idx', 'rounds', 'ticks', 'ct_wins', 'round_counts', 'ct_round_wins', 'match_ids']
+
+    # Version of the index file layout
+    INDEX_VERSION = 1
+
+    # Columns of the occurrence dataframes, the column names of the tabular snapshots
+    OCCURRENCE_COLUMNS = ['MATCH_ID', 'UNIVERSAL_round', 'UNIVERSAL_tick', 'UNIVERSAL_CT_wins']
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Constructor
+    # --------------------------------------------------------------------------------------------
+
+    def __init__(self, codec: TokenCodec, key_fields: list = None):
+        """
+        Parameters:
+        - codec: the TokenCodec of the indexed tokens (Tokenizer.token_codec).
+        - key_fields: the token fields of the index keys. Leaving out fields groups similar situations together, e.g. \
+          without the scores. Must not contain the outcome field. Default is None, which uses every field except the outcome.
+        """
+
+        if key_fields is None:
+            key_fields = [name for name in codec.field_names if name != codec.OUTCOME_FIELD]
+        if codec.OUTCOME_FIELD in key_fields:
+            raise ValueError(f'The key_fields should not contain the outcome field {codec.OUTCOME_FIELD}.')
+
+        # Validates the field names
+        codec.mask(key_fields)
+
+        self.codec = codec
+        self.key_fields = list(key_fields)
+
+        self.keys = np.empty(0, dtype=f'S{codec.num_bytes}')
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.match_idx = np.empty(0, dtype=np.int32)
+        self.rounds = np.empty(0, dtype=np.int16)
+        self.ticks = np.empty(0, dtype=np.int64)
+        self.ct_wins = np.empty(0, dtype=np.uint8)
+        self.round_counts = np.empty(0, dtype=np.int64)
+        self.ct_round_wins = np.empty(0, dtype=np.int64)
+        self.match_ids = []
+
+        # Occurrences of the matches added since the last merge
+        self._pending = []
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods - Creation
+    # --------------------------------------------------------------------------------------------
+
+    @classmethod
+    def from_matches(cls, matches, codec: TokenCodec, key_fields: list = None):
+        """
+        Build the index of tokenized matches.
+        Parameters:
+        - matches: iterable of the tokenized match dataframes (see add_match), e.g. a generator reading them one by one.
+        - codec: the TokenCodec of the tokens.
+        - key_fields: the token fields of the index keys. Default is None, which uses every field except the outcome.
+        """
+
+        index = cls(codec, key_fields)
+        for df in matches:
+            index.add_match(df)
+        index._INDEX_merge_()
+
+        return index
+
+    def add_match(self, df: pd.DataFrame, match_id: str = None):
+        """
+        Add the snapshots of a tokenized match to the index.
+        Parameters:
+        - df: the dataframe returned by Tokenizer.tokenize_match_packed, with the 'TOKEN_PACKED', 'UNIVERSAL_round' and
+          'UNIVERSAL_tick' columns.
+        - match_id: the id of the match. Default is None, which uses the 'MATCH_ID' column of the dataframe.
+        """
+
+        if match_id is None:
+            if 'MATCH_ID' not in df.columns or df['MATCH_ID'].nunique() > 1:
+                raise ValueError('The match_id should be given if the dataframe does not have a single MATCH_ID.')
+            match_id = df['MATCH_ID'].iloc[0] if len(df) > 0 else ''
+
+        tokens = self.codec.from_bytes(df['TOKEN_PACKED'].values)
+        outcomes = self.codec.decode(tokens)[self.codec.OUTCOME_FIELD]
+
+        self.match_ids.append(str(match_id))
+        self._pending.append((
+            self.codec.keys(tokens, self.key_fields),
+            np.full(len(df), len(self.match_ids) - 1, dtype=np.int32),
+            df['UNIVERSAL_round'].values.astype(np.int16),
+            df['UNIVERSAL_tick'].values.astype(np.int64),
+            outcomes.astype(np.uint8),
+        ))
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Read an index file written by save.
+        Parameters:
+        - path: the path of the index file.
+        """
+
+        with np.load(path, allow_pickle=False) as arrays:
+
+            if int(arrays['index_version']) != cls.INDEX_VERSION:
+                raise ValueError(f'The index file was written with layout version {int(arrays["index_version"])}, the supported version is {cls.INDEX_VERSION}.')
+
+            index = cls(TokenCodec(arrays['position_names'].tolist()), arrays['key_fields'].tolist())
+            for name in cls.ARRAYS:
+                setattr(index, name, arrays[name])
+
+        index.match_ids = index.match_ids.tolist()
+
+        return index
+
+    def save(self, path: str):
+        """
+        Write the index to a file.
+        Parameters:
+        - path: the path of the index file.
+        """
+
+        self._INDEX_merge_()
+
+        arrays = {name: np.asarray(getattr(self, name)) for name in self.ARRAYS}
+        arrays['match_ids'] = np.asarray(self.match_ids, dtype=str)
+
+        # Write to a temporary file first, so a failed write does not corrupt the index
+        with open(path + '.tmp', 'wb') as index_file:
+            np.savez(
+                index_file,
+                index_version=self.INDEX_VERSION,
+                position_names=np.asarray(self.codec.position_names, dtype=str),
+                key_fields=np.asarray(self.key_fields, dtype=str),
+                **arrays
+            )
+        os.replace(path + '.tmp', path)
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Public methods - Lookup
+    # --------------------------------------------------------------------------------------------
+
+    @property
+    def num_keys(self) -> int:
+        self._INDEX_merge_()
+        return len(self.keys)
+
+    @property
+    def num_occurrences(self) -> int:
+        self._INDEX_merge_()
+        return len(self.match_idx)
+
+    def occurrences(self, token) -> pd.DataFrame:
+        """
+        Returns the occurrences of the situation of a token as a dataframe with the OCCURRENCE_COLUMNS columns.
+        Parameters:
+        - token: the token, as bytes or as a (num_bytes,) uint8 array.
+        """
+
+        tokens = token.reshape(1, -1) if isinstance(token, np.ndarray) and token.dtype == np.uint8 else [token]
+        key_idx = self._LOOKUP_key_indices_(tokens)[0]
+
+        if key_idx < 0:
+            return pd.DataFrame(columns=self.OCCURRENCE_COLUMNS)
+
+        rows = slice(self.indptr[key_idx], self.indptr[key_idx + 1])
+        return pd.DataFrame({
+            'MATCH_ID': np.asarray(self.match_ids, dtype=object)[self.match_idx[rows]],
+            'UNIVERSAL_round': self.rounds[rows],
+            'UNIVERSAL_tick': self.ticks[rows],
+            'UNIVERSAL_CT_wins': self.ct_wins[rows],
+        })
+
+    def win_rates(self, tokens) -> pd.DataFrame:
+        """
+        Returns the historical statistics of the situations of tokens, one row per token: the number of 'snapshots'
+        and 'rounds' of the situation, and the 'CT_win_rate' of these rounds (NaN for unseen situations).
+        Parameters:
+        - tokens: the tokens, a fixed-width bytes sequence (e.g. the 'TOKEN_PACKED' column) or a uint8 array of shape (rows, num_bytes).
+        """
+
+        key_idx = self._LOOKUP_key_indices_(tokens)
+        found = key_idx >= 0
+
+        snapshots = np.zeros(len(key_idx), dtype=np.int64)
+        rounds = np.zeros(len(key_idx), dtype=np.int64)
+        ct_round_wins = np.zeros(len(key_idx), dtype=np.int64)
+
+        snapshots[found] = self.indptr[key_idx[found] + 1] - self.indptr[key_idx[found]]
+        rounds[found] = self.round_counts[key_idx[found]]
+        ct_round_wins[found] = self.ct_round_wins[key_idx[found]]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            win_rate = np.where(rounds > 0, ct_round_wins / np.maximum(rounds, 1), np.nan)
+
+        return pd.DataFrame({'snapshots': snapshots, 'rounds': rounds, 'CT_win_rate': win_rate})
+
+
+
+    # --------------------------------------------------------------------------------------------
+    # REGION: Private methods
+    # --------------------------------------------------------------------------------------------
+
+    def _LOOKUP_key_indices_(self, tokens) -> np.ndarray:
+
+        self._INDEX_merge_()
+
+        query_keys = self.codec.keys(self.codec.from_bytes(tokens), self.key_fields)
+
+        # Binary search of the sorted keys, -1 for unseen keys
+        key_idx = np.searchsorted(self.keys, query_keys)
+        found = key_idx < len(self.keys)
+        found[found] = self.keys[key_idx[found]] == query_keys[found]
+
+        return np.where(found, key_idx, -1)
+
+    def _INDEX_merge_(self):
+
+        if len(self._pending) == 0:
+            return
+
+        # Existing occurrences first, then the pending ones, so the occurrences of a key stay in insertion order
+        existing_keys = np.repeat(self.keys, np.diff(self.indptr))
+        pending = [np.concatenate(arrays) for arrays in zip(*self._pending)]
+
+        keys = np.concatenate([existing_keys, pending[0]]).astype(self.keys.dtype)
+        match_idx = np.concatenate([self.match_idx, pending[1]])
+        rounds = np.concatenate([self.rounds, pending[2]])
+        ticks = np.concatenate([self.ticks, pending[3]])
+        ct_wins = np.concatenate([self.ct_wins, pending[4]])
+
+        order = np.argsort(keys, kind='stable')
+        self.keys, key_inverse, key_counts = np.unique(keys[order], return_inverse=True, return_counts=True)
+        self.indptr = np.concatenate([[0], np.cumsum(key_counts)]).astype(np.int64)
+        self.match_idx, self.rounds, self.ticks, self.ct_wins = match_idx[order], rounds[order], ticks[order], ct_wins[order]
+
+        # Distinct (key, match, round) triples, the outcome of a round is the same in all of its snapshots
+        round_rows = pd.DataFrame({'key': key_inverse, 'match': self.match_idx, 'round': self.rounds, 'ct_wins': self.ct_wins})
+        round_rows = round_rows.drop_duplicates(subset=['key', 'match', 'round'])
+        self.round_counts = np.bincount(round_rows['key'].values, minlength=len(self.keys)).astype(np.int64)
+        self.ct_round_wins = np.bincount(round_rows['key'].values, weights=round_rows['ct_wins'].values, minlength=len(self.keys)).astype(np.int64)
+
+        self._pending = []
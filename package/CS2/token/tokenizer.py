@@ -4,6 +4,11 @@ import pandas as pd
 import numpy as np
 import random
 
+from scipy.spatial import cKDTree
+
+from ..graph.map_graph import MapGraph
+from .token_codec import TokenCodec
+
 class Tokenizer:
 
     # Token Version (e. g. 100 for version 1.0.0)
@@ -53,14 +58,14 @@ class Tokenizer:
     # REGION: Public functions - Tokenization
     # --------------------------------------------------------------------------------------------
 
-    def tokenize_match(self, df: pd.DataFrame, map_name: str, map_nodes: pd.DataFrame) -> pd.DataFrame:
+    def tokenize_match(self, df: pd.DataFrame, map_name: str, map_nodes: Union[pd.DataFrame, MapGraph]) -> pd.DataFrame:
         """
         Tokenizes the given snapshots of the given dataframe.
 
         Parameters:
             - df: pd.DataFrame: The dataframe containing the snapshots to tokenize.
             - map: str: The name of the map. Can be one of the following: 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis'.
-            - map_nodes: pd.DataFrame: The dataframe containing the graph nodes of the map.
+            - map_nodes: pd.DataFrame | MapGraph: The dataframe containing the graph nodes of the map, or the MapGraph artifact of the map.
         """
 
         # Validate the map name
@@ -75,66 +80,119 @@ class Tokenizer:
 
         return df
     
+    def tokenize_match_packed(self, df: pd.DataFrame, map_name: str, map_nodes: Union[pd.DataFrame, MapGraph]) -> pd.DataFrame:
+        """
+        Tokenizes the given snapshots of the given dataframe into packed binary tokens (see TokenCodec). Returns the
+        dataframe with a 'TOKEN_PACKED' column of fixed-width bytes tokens, decodable with the codec of token_codec.
+
+        Parameters:
+            - df: pd.DataFrame: The dataframe containing the snapshots to tokenize.
+            - map: str: The name of the map. Can be one of the following: 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis'.
+            - map_nodes: pd.DataFrame | MapGraph: The dataframe containing the graph nodes of the map, or the MapGraph artifact of the map.
+        """
+
+        # Validate the map name
+        if map_name not in ['de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis']:
+            raise ValueError(f"Invalid map name: {map_name}. The map name must be one of the following: 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis'.")
+
+        # 1. Count the players at the positions
+        position_names, position_counts = self._TOKEN_position_counts_(df, map_name, map_nodes)
+
+        # 2. Collect the universal fields
+        fields = self._TOKEN_universal_fields_(df)
+        fields['CT_POS'] = position_counts[:, 0]
+        fields['T_POS'] = position_counts[:, 1]
+
+        codec = TokenCodec(position_names)
+
+        df = df.copy()
+        df['TOKEN_PACKED'] = codec.to_bytes(codec.encode(fields))
+
+        return df
+
+    def token_codec(self, map_name: str, map_nodes: Union[pd.DataFrame, MapGraph] = None) -> TokenCodec:
+        """
+        Returns the TokenCodec of the packed tokens of a map.
+
+        Parameters:
+            - map: str: The name of the map.
+            - map_nodes: pd.DataFrame | MapGraph: The map nodes used for the tokenization. The position names of a MapGraph artifact are used if given. Default is None.
+        """
+
+        if isinstance(map_nodes, MapGraph):
+            return TokenCodec(map_nodes.position_names)
+
+        return TokenCodec(self.__INIT_get_position_names__(map_name))
+    
 
 
     # --------------------------------------------------------------------------------------------
     # REGION: Tokenization Private Functions
     # --------------------------------------------------------------------------------------------
 
-    # 1. Tokenize the positions of the players
-    def _TOKEN_positions_(self, df: pd.DataFrame, map_name: str, map_nodes: pd.DataFrame):
+    # 1. Count the alive players of each side at each position
+    def _TOKEN_position_counts_(self, df: pd.DataFrame, map_name: str, map_nodes: Union[pd.DataFrame, MapGraph]):
         """
-        Encodes player positions in the given dataframe and returns the token.
+        Returns the position names and the alive player counts of each snapshot, side (CT: players 0-4, T: players 5-9)
+        and position, shape (rows, 2, positions).
 
         Parameters:
             - df: pd.DataFrame: The dataframe containing the snapshots to tokenize.
-            - map: str: The name of the map. Can be one of the following: 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis'.
-            - map_nodes: pd.DataFrame: The dataframe containing the graph nodes of the map.
+            - map: str: The name of the map.
+            - map_nodes: pd.DataFrame | MapGraph: The dataframe containing the graph nodes of the map, or the MapGraph artifact of the map.
         """
-        
-        # Get all unique position names
-        position_names = self.__INIT_get_position_names__(map_name)
 
-        # Store new columns
-        new_columns = {}
+        # Get all unique position names and the position name of each map node, the MapGraph artifact provides them with its nodes
+        if isinstance(map_nodes, MapGraph):
+            position_names = map_nodes.position_names
+            node_positions = map_nodes.node_positions
+            node_pos_names = np.asarray(map_nodes.pos_names).astype(str)
+        else:
+            position_names = self.__INIT_get_position_names__(map_name)
+            node_positions = map_nodes[['X', 'Y', 'Z']].values
+            node_pos_names = map_nodes['pos_name'].values.astype(str)
 
-        # Add position names to each player's each snapshot in the dataframe
-        for player_idx in range(0, 10):
-            if player_idx < 5:
-                new_columns[f'CT{player_idx}_pos_name'] = ''
-            else:
-                new_columns[f'T{player_idx}_pos_name'] = ''
+        # Position index of each map node, nodes of other positions are not counted
+        position_index = {pos: pos_idx for pos_idx, pos in enumerate(position_names)}
+        node_position = np.array([position_index.get(pos_name, -1) for pos_name in node_pos_names], dtype=np.int64)
 
-        # Add new position-based player count columns
-        for pos in position_names:
-            new_columns[f"TOKEN_CT_POS_{pos}"] = 0
-            new_columns[f"TOKEN_T_POS_{pos}"] = 0
+        # Closest map node of every player in every snapshot, in a single query
+        player_prefixes = [f'CT{player_idx}' if player_idx < 5 else f'T{player_idx}' for player_idx in range(0, 10)]
+        player_coords = np.stack([df[[f'{prefix}_X', f'{prefix}_Y', f'{prefix}_Z']].values.astype(np.float64) for prefix in player_prefixes], axis=1)
 
-        # Add the new columns to the dataframe
-        new_df = pd.DataFrame(new_columns, index=df.index)
-        df = pd.concat([df, new_df], axis=1)
+        _, closest_nodes = cKDTree(np.asarray(node_positions, dtype=np.float64)).query(player_coords.reshape(-1, 3))
+        player_position = node_position[closest_nodes].reshape(len(df), 10)
 
-        # Add position names to each player's each snapshot in the dataframe
-        for player_idx in range(0, 10):
-            if player_idx < 5:
-                df[f'CT{player_idx}_pos_name'] = df.apply(lambda x: self.__EXT_closest_node_pos_name__(x[f'CT{player_idx}_X'], x[f'CT{player_idx}_Y'], x[f'CT{player_idx}_Z'], map_nodes), axis=1)
-            else:
-                df[f'T{player_idx}_pos_name'] = df.apply(lambda x: self.__EXT_closest_node_pos_name__(x[f'T{player_idx}_X'], x[f'T{player_idx}_Y'], x[f'T{player_idx}_Z'], map_nodes), axis=1)
-
-        # Set the position-based player count columns
-        for pos in position_names:
-            for player_idx in range(0, 10):
-                if player_idx < 5:
-                    df[f"TOKEN_CT_POS_{pos}"] += (df[f'CT{player_idx}_pos_name'] == pos).astype(int) * df[f'CT{player_idx}_is_alive'].astype(int)
-                else:
-                    df[f"TOKEN_T_POS_{pos}"] += (df[f'T{player_idx}_pos_name'] == pos).astype(int) * df[f'T{player_idx}_is_alive'].astype(int)
+        # Alive player count histogram per snapshot, side and position
+        is_alive = np.stack([df[f'{prefix}_is_alive'].values.astype(int) for prefix in player_prefixes], axis=1)
+        side = np.repeat([[0] * 5 + [1] * 5], len(df), axis=0)
+        counted = player_position >= 0
 
-        # Create the CT and T token
-        df['TOKEN_CT_POS'] = df[[f"TOKEN_CT_POS_{pos}" for pos in position_names]].astype(str).apply(lambda x: ''.join(x), axis=1)
-        df['TOKEN_T_POS'] = df[[f"TOKEN_T_POS_{pos}" for pos in position_names]].astype(str).apply(lambda x: ''.join(x), axis=1)
+        histogram_idx = (np.arange(len(df))[:, None] * 2 + side) * len(position_names) + player_position
+        position_counts = np.bincount(
+            histogram_idx[counted], weights=is_alive[counted], minlength=len(df) * 2 * len(position_names)
+        ).astype(np.int64).reshape(len(df), 2, len(position_names))
+
+        return position_names, position_counts
+
+    # 1. Tokenize the positions of the players
+    def _TOKEN_positions_(self, df: pd.DataFrame, map_name: str, map_nodes: Union[pd.DataFrame, MapGraph]):
+        """
+        Encodes player positions in the given dataframe and returns the token.
+
+        Parameters:
+            - df: pd.DataFrame: The dataframe containing the snapshots to tokenize.
+            - map: str: The name of the map. Can be one of the following: 'de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_vertigo', 'de_ancient', 'de_anubis'.
+            - map_nodes: pd.DataFrame | MapGraph: The dataframe containing the graph nodes of the map, or the MapGraph artifact of the map.
+        """
+        
+        # Alive player counts per side and position
+        _, position_counts = self._TOKEN_position_counts_(df, map_name, map_nodes)
 
-        # Drop all new columns except the tokens
-        df = df.drop(columns=new_columns.keys())
+        # Create the CT and T token
+        df = df.copy()
+        df['TOKEN_CT_POS'] = self.__EXT_digit_strings__(position_counts[:, 0])
+        df['TOKEN_T_POS'] = self.__EXT_digit_strings__(position_counts[:, 1])
 
         return df
     
@@ -241,26 +299,58 @@ class Tokenizer:
 
         return df
 
+    # 3. Collect the universal fields of the packed token
+    def _TOKEN_universal_fields_(self, df: pd.DataFrame) -> dict:
+        """
+        Returns the universal fields of the packed token (the scalar fields of TokenCodec) as integer arrays. The values
+        are the same as the ones of the string token.
+
+        Parameters:
+            - df: pd.DataFrame: The dataframe containing the snapshots to tokenize.
+        """
+
+        # Buy levels: below 5000, 10000, 15000 and above
+        buy_thresholds = [5000, 10000, 15000]
+
+        # The plant flags of a round are its last values
+        plants_in_rounds = df[['UNIVERSAL_round', 'UNIVERSAL_is_bomb_planted_at_A_site', 'UNIVERSAL_is_bomb_planted_at_B_site']]
+        plants_in_rounds = plants_in_rounds.drop_duplicates(subset=['UNIVERSAL_round'], keep='last').set_index('UNIVERSAL_round')
+
+        return {
+            'CT_BUY': np.digitize(df['UNIVERSAL_CT_equipment_value'].values, buy_thresholds),
+            'T_BUY': np.digitize(df['UNIVERSAL_T_equipment_value'].values, buy_thresholds),
+            'CT_SCORE': df['UNIVERSAL_CT_score'].values.astype(int),
+            'T_SCORE': df['UNIVERSAL_T_score'].values.astype(int),
+            'A_PLANT': df['UNIVERSAL_round'].map(plants_in_rounds['UNIVERSAL_is_bomb_planted_at_A_site']).values.astype(int),
+            'B_PLANT': df['UNIVERSAL_round'].map(plants_in_rounds['UNIVERSAL_is_bomb_planted_at_B_site']).values.astype(int),
+            'AFTERPLANT': df['UNIVERSAL_is_bomb_planted_at_A_site'].values.astype(int) + df['UNIVERSAL_is_bomb_planted_at_B_site'].values.astype(int),
+            'CT_WINS': df['UNIVERSAL_CT_wins'].values.astype(int),
+        }
+
 
 
     # --------------------------------------------------------------------------------------------
     # REGION: Private functions
     # --------------------------------------------------------------------------------------------
 
-    # Calculate closest graph node to a position
-    def __EXT_closest_node_pos_name__(self, coord_x, coord_y, coord_z, map_nodes):
+    # Join the counts of each row as a digit string
+    def __EXT_digit_strings__(self, counts: np.ndarray) -> np.ndarray:
         """
-        Returns the closest node to a given position.
+        Returns the rows of the counts joined as digit strings, e.g. [0, 2, 1] -> '021'.
         
         Parameters:
-        - coord_x: the x coordinate of the position.
-        - coord_y: the y coordinate of the position.
-        - coord_z: the z coordinate of the position.
-        - nodes: the nodes dataframe.
+        - counts: the integer counts, shape (rows, positions).
         """
 
-        distances = np.sqrt((map_nodes['X'] - coord_x)**2 + (map_nodes['Y'] - coord_y)**2 + (map_nodes['Z'] - coord_z)**2)
-        return map_nodes.loc[distances.idxmin(), 'pos_name']
+        if counts.size == 0:
+            return np.full(len(counts), '', dtype=object)
+
+        # Single digit counts are encoded as bytes in one pass
+        if counts.min() >= 0 and counts.max() <= 9:
+            digits = np.ascontiguousarray((counts + ord('0')).astype(np.uint8))
+            return digits.view(f'S{counts.shape[1]}').ravel().astype(str).astype(object)
+
+        return np.array([''.join(map(str, row)) for row in counts.tolist()], dtype=object)
     
     # Get the position names for the given map
     def __INIT_get_position_names__(self, map):
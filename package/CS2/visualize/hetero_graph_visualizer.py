@@ -11,6 +11,8 @@ import numpy as np
 import random
 import os
 
+from ..graph.map_graph import MapGraph
+
 class HeteroGraphVisualizer:
 
     # OS path for this file
@@ -27,7 +29,14 @@ class HeteroGraphVisualizer:
     # REGION: Constructor
     # --------------------------------------------------------------------------------------------
 
-    def __init__(self):
+    def __init__(self, map_graph: MapGraph = None):
+        """
+        Parameters:
+        - map_graph: the MapGraph artifact of the map. If set, the map nodes and edges are drawn from the artifact instead of the graph snapshots. Default is None.
+        """
+
+        self.map_graph = map_graph
+
         self.INFERNO = self.__file_path + self.INFERNO
         self.INFERNO_LIGHT = self.__file_path + self.INFERNO_LIGHT
         self.INFERNO_DARK = self.__file_path + self.INFERNO_DARK
@@ -61,9 +70,13 @@ class HeteroGraphVisualizer:
         # Get the image
         img = self.__EXT_get_map_radar(map, style)
 
-        # Get the data
-        map_nodes = graph['map'].x[:, 1:4].numpy()
-        map_edges = graph['map', 'connected_to', 'map'].edge_index.numpy()
+        # Get the data, the static map graph comes from the MapGraph artifact if it is set
+        if self.map_graph is not None:
+            map_nodes = self.map_graph.node_positions
+            map_edges = self.map_graph.edge_index
+        else:
+            map_nodes = graph['map'].x[:, 1:4].numpy()
+            map_edges = graph['map', 'connected_to', 'map'].edge_index.numpy()
 
         players = graph['player'].x[:, 0:3].numpy()
         player_edges = graph['player', 'closest_to', 'map'].edge_index.numpy()
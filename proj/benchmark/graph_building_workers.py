@@ -0,0 +1,76 @@
+"""
+Scaling benchmark of HeteroGraphSnapshot.process_snapshots with 1, 2, 4 and 8 worker processes.
+
+Usage:
+    python graph_building_workers.py --df match.pkl --infernos infernos.pkl --smokes smokes.pkl --he he.pkl \
+        --nodes ../../data/map_graph_model/de_inferno/nodes_norm.csv --edges ../../data/map_graph_model/de_inferno/edges.csv \
+        --molotov-radius ../../config/nade_radius/molotov_norm.json --smoke-radius ../../config/nade_radius/smoke_norm.json
+
+The dataframes are the outputs of TabularGraphSnapshot.process_match (after imputation and normalization), saved
+as .pkl, .parquet or .csv files.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.graph import HeteroGraphSnapshot
+
+
+def read_df(path):
+    if path.endswith('.pkl'):
+        return pd.read_pickle(path)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--df', required=True)
+    parser.add_argument('--infernos', required=True)
+    parser.add_argument('--smokes', required=True)
+    parser.add_argument('--he', required=True)
+    parser.add_argument('--nodes', required=True)
+    parser.add_argument('--edges', required=True)
+    parser.add_argument('--molotov-radius', required=True)
+    parser.add_argument('--smoke-radius', required=True)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    df = read_df(args.df)
+    infernos = read_df(args.infernos)
+    smokes = read_df(args.smokes)
+    he = read_df(args.he)
+    edges = pd.read_csv(args.edges)
+
+    with open(args.molotov_radius) as f:
+        molotov_radius = json.load(f)
+    with open(args.smoke_radius) as f:
+        smoke_radius = json.load(f)
+
+    print(f'Snapshots: {len(df)}, rounds: {df["UNIVERSAL_round"].nunique()}, CPUs: {os.cpu_count()}')
+
+    baseline = None
+    for workers in args.workers:
+
+        nodes = pd.read_csv(args.nodes)
+
+        start = time.perf_counter()
+        graphs = HeteroGraphSnapshot().process_snapshots(df, nodes, edges, infernos, smokes, he, molotov_radius, smoke_radius, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = elapsed
+
+        print(f'workers={workers}: {elapsed:.2f} s, {len(graphs) / elapsed:.1f} graphs/s, speedup {baseline / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
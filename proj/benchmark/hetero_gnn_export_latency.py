@@ -0,0 +1,117 @@
+"""
+Latency benchmark (p50/p99) of the exported TorchScript HeterogeneousGNN against eager mode on the CPU.
+
+Usage:
+    python hetero_gnn_export_latency.py --graphs match_graphs.pt --threads 1 4 --repeats 200
+
+The graphs file is a torch-saved list of graph snapshots of a match, as created by HeteroGraphSnapshot.process_snapshots.
+A model with random weights (or the state dict given with --state-dict and the matching --player-dims, --map-dims) is
+exported with HeterogeneousGNNExport and run with HeteroGNNRuntime. Latencies are measured per snapshot (batch of 1)
+and per batch of --batch-size snapshots, from prepared inputs: collated PyG batches for eager mode, stacked tensors
+for the runtime.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+from torch_geometric.loader import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.analyze.hetero_gnn_round_analyzer import HeterogeneousGNN
+from CS2.analyze.hetero_gnn_export import HeterogeneousGNNExport
+from CS2.analyze.hetero_gnn_runtime import HeteroGNNRuntime
+
+
+def create_model(graphs, player_dims, map_dims, state_dict):
+
+    dense_layers = [
+        {'dropout': 0, 'input_neuron_num': 64, 'neuron_num': 32, 'activation_function': torch.nn.LeakyReLU(), 'num_of_layers': 2},
+        {'dropout': 0, 'input_neuron_num': 32, 'neuron_num': 1, 'activation_function': None, 'num_of_layers': 1},
+    ]
+
+    torch.manual_seed(42)
+    model = HeterogeneousGNN(player_dims, map_dims, dense_layers)
+
+    # Initialize the lazy layers
+    batch = next(iter(DataLoader(graphs[:2], batch_size=2)))
+    with torch.no_grad():
+        model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs)
+
+    if state_dict is not None:
+        model.load_state_dict(torch.load(state_dict, map_location='cpu'))
+
+    return model.eval()
+
+
+def percentiles(function, inputs, repeats):
+
+    latencies = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        function(inputs[repeat % len(inputs)])
+        latencies.append(time.perf_counter() - start)
+
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', required=True)
+    parser.add_argument('--state-dict', default=None)
+    parser.add_argument('--player-dims', type=int, nargs='+', default=[20, 20])
+    parser.add_argument('--map-dims', type=int, nargs='+', default=[10, 10])
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, os.cpu_count()])
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    graphs = torch.load(args.graphs, weights_only=False)
+    model = create_model(graphs, args.player_dims, args.map_dims, args.state_dict)
+
+    # Export
+    path = os.path.join(tempfile.mkdtemp(), 'hetero_gnn.pt')
+    HeterogeneousGNNExport.from_graph(model, graphs[0]).export(path, graphs[:2])
+
+    print(f'Graphs: {len(graphs)}, CPUs: {os.cpu_count()}')
+
+    for threads in args.threads:
+
+        runtime = HeteroGNNRuntime(path, batch_size=args.batch_size, num_threads=threads)
+
+        for batch_size in [1, args.batch_size]:
+
+            starts = range(0, max(len(graphs) - batch_size, 0) + 1, batch_size)
+            eager_inputs = [next(iter(DataLoader(graphs[start:start + batch_size], batch_size=batch_size))) for start in starts]
+            runtime_inputs = [HeterogeneousGNNExport.graph_tensors(graphs[start:start + batch_size]) for start in starts]
+
+            def eager(batch):
+                with torch.inference_mode():
+                    return torch.sigmoid(model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs))
+
+            def exported(tensors):
+                return runtime.predict(*tensors)
+
+            # Equivalence on the first batch
+            max_diff = np.abs(eager(eager_inputs[0]).reshape(-1).numpy() - exported(runtime_inputs[0])).max()
+
+            # Warm-up, the TorchScript profiling executor optimizes the graph on the first calls
+            percentiles(eager, eager_inputs, 5)
+            percentiles(exported, runtime_inputs, 5)
+
+            eager_p50, eager_p99 = percentiles(eager, eager_inputs, args.repeats)
+            exported_p50, exported_p99 = percentiles(exported, runtime_inputs, args.repeats)
+
+            print(f'threads {threads}, batch {len(runtime_inputs[0][0])}: max abs diff {max_diff:.2e} | '
+                  f'eager p50 {eager_p50:.2f} ms, p99 {eager_p99:.2f} ms | '
+                  f'torchscript p50 {exported_p50:.2f} ms, p99 {exported_p99:.2f} ms | '
+                  f'p50 speedup {eager_p50 / exported_p50:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Equivalence check and timing of the vectorized HeterogeneousGNN flatten step against the per-graph loop.
+
+Usage:
+    python hetero_gnn_flatten.py --graphs match_graphs.pt --batch-sizes 1 16 64 256 --device cpu
+
+The graphs file is a torch-saved list of graph snapshots of a match, as created by HeteroGraphSnapshot.process_snapshots.
+A model with random weights is run with both flatten implementations on the same batches, the outputs must match
+within --atol, then the forward passes are timed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+from torch_geometric.loader import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.analyze.hetero_gnn_round_analyzer import HeterogeneousGNN
+
+
+class LoopHeterogeneousGNN(HeterogeneousGNN):
+    """
+    HeterogeneousGNN flattening the batch graph by graph, as before the vectorized flatten step.
+    """
+
+    def flatten(self, x_dict, edge_index_dict, y, batch_size):
+        return self.flatten_loop(x_dict, edge_index_dict, y, batch_size)
+
+
+def create_models(device):
+
+    dense_layers = [
+        {'dropout': 0, 'input_neuron_num': 64, 'neuron_num': 32, 'activation_function': torch.nn.LeakyReLU(), 'num_of_layers': 2},
+        {'dropout': 0, 'input_neuron_num': 32, 'neuron_num': 1, 'activation_function': None, 'num_of_layers': 1},
+    ]
+
+    torch.manual_seed(42)
+    model = HeterogeneousGNN([20, 20], [10, 10], dense_layers).to(device)
+    loop_model = LoopHeterogeneousGNN([20, 20], [10, 10], dense_layers).to(device)
+
+    return model, loop_model
+
+
+def forward(model, batch):
+    return model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs)
+
+
+def run(model, batches, device):
+
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for batch in batches:
+            forward(model, batch)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+
+    return time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', required=True)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 256])
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--atol', type=float, default=1e-5)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    graphs = torch.load(args.graphs, weights_only=False)
+
+    model, loop_model = create_models(device)
+
+    # Initialize the lazy layers, then share the weights
+    with torch.inference_mode():
+        forward(model, next(iter(DataLoader(graphs[:2], batch_size=2))).to(device))
+        forward(loop_model, next(iter(DataLoader(graphs[:2], batch_size=2))).to(device))
+    loop_model.load_state_dict(model.state_dict())
+    model.eval()
+    loop_model.eval()
+
+    print(f'Graphs: {len(graphs)}, device: {device}')
+
+    for batch_size in args.batch_sizes:
+
+        batches = [batch.to(device) for batch in DataLoader(graphs, batch_size=batch_size, shuffle=False)]
+
+        # Equivalence
+        max_diff = 0.0
+        with torch.inference_mode():
+            for batch in batches:
+                max_diff = max(max_diff, (forward(model, batch) - forward(loop_model, batch)).abs().max().item())
+
+        if max_diff > args.atol:
+            raise AssertionError(f'batch size {batch_size}: the flatten implementations differ by {max_diff}')
+
+        # Timing
+        loop_time = run(loop_model, batches, device)
+        vectorized_time = run(model, batches, device)
+
+        print(f'batch size {batch_size}: max abs diff {max_diff:.2e}, loop {len(graphs) / loop_time:.1f} graphs/s, '
+              f'vectorized {len(graphs) / vectorized_time:.1f} graphs/s, speedup {loop_time / vectorized_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
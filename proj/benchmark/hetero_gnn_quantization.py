@@ -0,0 +1,122 @@
+"""
+Accuracy-regression check and speed/memory benchmark of the dynamic int8 quantized HeterogeneousGNN against float32.
+
+Usage:
+    python hetero_gnn_quantization.py --graphs match_graphs.pt --state-dict model.pt --holdout 0.2 --max-delta 0.02
+
+The graphs file is a torch-saved list of graph snapshots, as created by HeteroGraphSnapshot.process_snapshots, the
+last --holdout fraction of the graphs is used as the held-out set. The state dict must match --player-dims,
+--map-dims and the dense layers of create_model, without it a model with random weights is used.
+Reports the maximum absolute probability delta and the Brier scores of both models on the held-out set, the inference
+throughput and the serialized model sizes. Exits with an error if the delta exceeds --max-delta.
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from torch_geometric.loader import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.analyze.hetero_gnn_round_analyzer import HeterogeneousGNN
+from CS2.analyze.inference_engine import InferenceEngine
+
+
+def create_model(graphs, player_dims, map_dims, state_dict):
+
+    # Dense layers of the thesis models
+    dense_layers = [
+        {'dropout': 0, 'num_of_layers': 1, 'neuron_num': 24, 'input_neuron_num': 48, 'activation_function': torch.nn.LeakyReLU()},
+        {'dropout': 0.5},
+        {'dropout': 0, 'num_of_layers': 2, 'neuron_num': 8, 'input_neuron_num': 24, 'activation_function': torch.nn.LeakyReLU()},
+        {'dropout': 0.5},
+        {'dropout': 0, 'num_of_layers': 1, 'neuron_num': 1, 'input_neuron_num': 8, 'activation_function': None},
+    ]
+
+    torch.manual_seed(42)
+    model = HeterogeneousGNN(player_dims, map_dims, dense_layers)
+
+    # Initialize the lazy layers
+    batch = next(iter(DataLoader(graphs[:2], batch_size=2)))
+    with torch.no_grad():
+        model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs)
+
+    if state_dict is not None:
+        model.load_state_dict(torch.load(state_dict, map_location='cpu'))
+
+    return model.eval()
+
+
+def model_size(model):
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+
+    return buffer.getbuffer().nbytes / 2**20
+
+
+def throughput(engine, graphs, repeats):
+
+    engine.predict_graphs(graphs[:engine.batch_size])
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        engine.predict_graphs(graphs)
+
+    return repeats * len(graphs) / (time.perf_counter() - start)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', required=True)
+    parser.add_argument('--state-dict', default=None)
+    parser.add_argument('--player-dims', type=int, nargs='+', default=[30, 5])
+    parser.add_argument('--map-dims', type=int, nargs='+', default=[15, 10, 3])
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-delta', type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    graphs = torch.load(args.graphs, weights_only=False)
+    holdout = graphs[int(len(graphs) * (1 - args.holdout)):]
+
+    model = create_model(graphs, args.player_dims, args.map_dims, args.state_dict)
+
+    float_engine = InferenceEngine(model, batch_size=args.batch_size, device='cpu')
+    int8_engine = InferenceEngine(model, batch_size=args.batch_size, device='cpu', quantize=True)
+
+    # Accuracy on the held-out set
+    float_result = float_engine.predict_graphs(holdout)
+    int8_result = int8_engine.predict_graphs(holdout)
+
+    max_delta = np.abs(float_result['proba'] - int8_result['proba']).max()
+    float_brier = np.mean((float_result['proba'] - float_result['target']) ** 2)
+    int8_brier = np.mean((int8_result['proba'] - int8_result['target']) ** 2)
+
+    print(f'Held-out graphs: {len(holdout)}, threads: {torch.get_num_threads()}')
+    print(f'max abs probability delta: {max_delta:.5f}')
+    print(f'Brier score: float32 {float_brier:.5f}, int8 {int8_brier:.5f} (delta {int8_brier - float_brier:+.5f})')
+
+    # Speed and memory
+    float_throughput = throughput(float_engine, holdout, args.repeats)
+    int8_throughput = throughput(int8_engine, holdout, args.repeats)
+
+    print(f'throughput: float32 {float_throughput:.1f} graphs/s, int8 {int8_throughput:.1f} graphs/s, speedup {int8_throughput / float_throughput:.2f}x')
+    print(f'model size: float32 {model_size(float_engine.model):.2f} MB, int8 {model_size(int8_engine.model):.2f} MB')
+
+    if max_delta > args.max_delta:
+        raise AssertionError(f'The quantized model differs from the float32 model by {max_delta:.5f} > {args.max_delta}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Throughput benchmark (windows/sec) of CSTemporalDataLoader against the previous main-process loader.
+
+Usage:
+    python temporal_loader_throughput.py --graphs match_graphs.pt --interval 10 --batch-size 32 --workers 0 2 4
+
+The graphs file is a torch-saved list of graph snapshots of a match, as created by HeteroGraphSnapshot.process_snapshots.
+Every loader is measured until its batches are ready for the model: the previous loader yields lists of windows that
+the temporal model collates into a single PyG Batch, the new loader yields TemporalGraphBatch objects that are split
+into time steps.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+from torch_geometric.loader import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.graph import TemporalWindowDataset
+from CS2.analyze.hetero_gnn_round_analyzer import CSTemporalDataLoader
+
+
+class PreviousCSTemporalDataLoader(DataLoader):
+    """
+    The previous CSTemporalDataLoader, batching in the main process and reseeding the global RNG when shuffling.
+    """
+
+    def __init__(self, dataset, batch_size=1, shuffle=False, *args, **kwargs):
+        super().__init__(dataset, batch_size=batch_size, shuffle=shuffle, *args, **kwargs)
+
+        self._dataset = dataset
+        self._batch_size = batch_size
+        self._shuffle = shuffle
+
+    def __iter__(self):
+        indices = list(range(len(self._dataset)))
+        if self._shuffle:
+            torch.random.manual_seed(42)
+            indices = torch.randperm(len(self._dataset)).tolist()
+
+        batch = []
+        for idx in indices:
+            batch.append(self._dataset[idx])
+            if len(batch) == self._batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+def run_previous(dataset, batch_size, epochs):
+
+    loader = PreviousCSTemporalDataLoader(dataset, batch_size=batch_size, shuffle=True)
+
+    windows = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch in loader:
+            graphs = [graph for window in batch for graph in window]
+            next(iter(DataLoader(graphs, batch_size=len(graphs), shuffle=False)))
+            windows += len(batch)
+
+    return windows / (time.perf_counter() - start)
+
+
+def run_new(dataset, batch_size, epochs, workers, pin_memory):
+
+    loader = CSTemporalDataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=True,
+        group_by_length=True,
+        collate='tensor',
+        num_workers=workers,
+        pin_memory=pin_memory,
+        persistent_workers=workers > 0,
+    )
+
+    windows = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch in loader:
+            for step in range(batch.num_steps):
+                batch.time_step(step)
+            windows += batch.batch_size
+
+    return windows / (time.perf_counter() - start)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', required=True)
+    parser.add_argument('--interval', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+    parser.add_argument('--pin-memory', action='store_true')
+    args = parser.parse_args()
+
+    graphs = torch.load(args.graphs, weights_only=False)
+    dataset = TemporalWindowDataset(graphs, length=args.interval, stride=args.interval // 2)
+
+    print(f'Graphs: {len(graphs)}, windows: {len(dataset)}, CPUs: {os.cpu_count()}')
+
+    baseline = run_previous(dataset, args.batch_size, args.epochs)
+    print(f'previous loader: {baseline:.1f} windows/s')
+
+    for workers in args.workers:
+        throughput = run_new(dataset, args.batch_size, args.epochs, workers, args.pin_memory)
+        print(f'CSTemporalDataLoader workers={workers}: {throughput:.1f} windows/s, speedup {throughput / baseline:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
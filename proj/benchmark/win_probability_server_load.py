@@ -0,0 +1,181 @@
+"""
+Load test of the WinProbabilityServer: throughput and tail latency (p50/p95/p99) under concurrent clients on the CPU.
+
+Usage:
+    python win_probability_server_load.py --graphs match_graphs.pt --map-dir ../../data/map_graph_model/de_inferno --concurrency 1 8 32
+    python win_probability_server_load.py --graphs match_graphs.pt --url http://127.0.0.1:8000
+
+The graphs file is a torch-saved list of graph snapshots, as created by HeteroGraphSnapshot.process_snapshots with
+graph_features_as_tensor=True. Each request posts --snapshots-per-request snapshots to /predict/graphs. Without --url an
+in-process server is started with a model with random weights (or the state dict given with --state-dict and the
+matching --player-dims, --map-dims), run in eager mode or, with --runtime, exported with HeterogeneousGNNExport and
+run with HeteroGNNRuntime.
+"""
+
+import argparse
+import http.client
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+import torch
+from torch_geometric.loader import DataLoader
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../package'))
+from CS2.analyze.hetero_gnn_round_analyzer import HeterogeneousGNN
+from CS2.analyze.hetero_gnn_export import HeterogeneousGNNExport
+from CS2.analyze.hetero_gnn_runtime import HeteroGNNRuntime
+from CS2.graph.map_graph import MapGraph
+from CS2.serve.win_probability_server import WinProbabilityServer
+
+
+def create_model(graphs, player_dims, map_dims, state_dict):
+
+    dense_layers = [
+        {'dropout': 0, 'input_neuron_num': 64, 'neuron_num': 32, 'activation_function': torch.nn.LeakyReLU(), 'num_of_layers': 2},
+        {'dropout': 0, 'input_neuron_num': 32, 'neuron_num': 1, 'activation_function': None, 'num_of_layers': 1},
+    ]
+
+    torch.manual_seed(42)
+    model = HeterogeneousGNN(player_dims, map_dims, dense_layers)
+
+    # Initialize the lazy layers
+    batch = next(iter(DataLoader(graphs[:2], batch_size=2)))
+    with torch.no_grad():
+        model(batch.x_dict, batch.edge_index_dict, batch.y, batch.num_graphs)
+
+    if state_dict is not None:
+        model.load_state_dict(torch.load(state_dict, map_location='cpu'))
+
+    return model.eval()
+
+
+def create_payloads(graphs, snapshots_per_request):
+
+    payloads = []
+    for start in range(0, len(graphs) - snapshots_per_request + 1, snapshots_per_request):
+        tensors = HeterogeneousGNNExport.graph_tensors(graphs[start:start + snapshots_per_request])
+        buffer = io.BytesIO()
+        np.savez(buffer, **{name: tensor.numpy() for name, tensor in zip(WinProbabilityServer.GRAPH_ARRAYS, tensors)})
+        payloads.append(buffer.getvalue())
+
+    return payloads
+
+
+def run_clients(url, payloads, concurrency, requests):
+
+    parsed = urllib.parse.urlparse(url)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port)
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+
+            start = time.perf_counter()
+            connection.request('POST', '/predict/graphs', body=payloads[index % len(payloads)], headers={'Content-Type': 'application/octet-stream'})
+            response = connection.getresponse()
+            response.read()
+            latency = time.perf_counter() - start
+
+            with lock:
+                latencies.append(latency)
+                if response.status != 200:
+                    errors.append(response.status)
+
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return np.array(latencies) * 1000, elapsed, errors
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', required=True)
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--map-dir', default=None)
+    parser.add_argument('--state-dict', default=None)
+    parser.add_argument('--player-dims', type=int, nargs='+', default=[20, 20])
+    parser.add_argument('--map-dims', type=int, nargs='+', default=[10, 10])
+    parser.add_argument('--runtime', action='store_true')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-latency-ms', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--snapshots-per-request', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    graphs = torch.load(args.graphs, weights_only=False)
+    payloads = create_payloads(graphs, args.snapshots_per_request)
+
+    # In-process server
+    server = None
+    url = args.url
+    if url is None:
+
+        if args.map_dir is None:
+            raise ValueError('Either --url or --map-dir is needed.')
+
+        model = create_model(graphs, args.player_dims, args.map_dims, args.state_dict)
+        if args.runtime:
+            path = os.path.join(tempfile.mkdtemp(), 'hetero_gnn.pt')
+            HeterogeneousGNNExport.from_graph(model, graphs[0]).export(path, graphs[:2])
+            model = HeteroGNNRuntime(path, batch_size=args.max_batch_size)
+
+        # The grenade radius values are only used by /predict/rows
+        radius = {'X': 0, 'Y': 0, 'Z': 0}
+        server = WinProbabilityServer(
+            model, MapGraph.from_map_directory(args.map_dir), radius, radius, port=0,
+            max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms
+        ).start()
+        url = server.address
+
+    print(f'Server: {url}, snapshots per request: {args.snapshots_per_request}, CPUs: {os.cpu_count()}, torch threads: {torch.get_num_threads()}')
+
+    # Warm-up
+    run_clients(url, payloads, 1, 10)
+
+    for concurrency in args.concurrency:
+
+        batches, items = (server.batcher.batches, server.batcher.items) if server is not None else (0, 0)
+        latencies, elapsed, errors = run_clients(url, payloads, concurrency, args.requests)
+
+        line = (f'concurrency {concurrency}: {len(latencies) / elapsed:.1f} req/s, {len(latencies) * args.snapshots_per_request / elapsed:.1f} snapshots/s | '
+                f'p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms')
+        if server is not None:
+            line += f' | mean batch {(server.batcher.items - items) / max(server.batcher.batches - batches, 1):.1f} snapshots'
+        if len(errors) > 0:
+            line += f' | {len(errors)} errors'
+        print(line)
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()